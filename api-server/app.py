@@ -1,14 +1,23 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-import httpx
-import uvicorn
-from typing import Optional, List, Dict, Union
-from pydantic import BaseModel
-from win import get_vscode_windows, switch_to_window
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI(title="VS Code Tab Control API")
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.middleware.cors import CORSMiddleware
+import uvicorn
+from typing import Any, Optional, List, Dict, Union
+from pydantic import BaseModel
+import asyncio
+from win import window_backend
+from vscode_client import close_client, start_client
+from vscode_commands import forward_batch_to_vscode, forward_to_vscode
+from health import extension_health, health_for
+from editor_state import get_editor_state, stop_editor_states
+from instances import instance_registry, route_to_window
+from metrics import CONTENT_TYPE, ServerTimingMiddleware, render_metrics
+
+# Every endpoint takes an optional ?window= naming the VS Code window to control
+app = FastAPI(title="VS Code Tab Control API", dependencies=[Depends(route_to_window)])
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,10 +26,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
+
+
+@app.on_event("startup")
+async def open_vscode_client():
+    """Open the pooled client shared by every request to the extension."""
+    await start_client()
+
 
-# VS Code extension server URL
-VSCODE_SERVER = "http://localhost:3068"
+@app.on_event("startup")
+async def start_health_monitor():
+    """Keep the extension's connection state current in the background."""
+    await extension_health.start()
+
+
+@app.on_event("startup")
+async def start_editor_state():
+    """Mirror tabs and recent files from each window's event stream."""
+    for instance in instance_registry.instances():
+        get_editor_state(instance.server)
+
+
+@app.on_event("shutdown")
+async def close_vscode_client():
+    await stop_editor_states()
+    await extension_health.stop()
+    await close_client()
+    window_backend.close()
 
 
 class CommandResponse(BaseModel):
@@ -53,32 +88,35 @@ class TabListResponse(BaseModel):
     tabs: List[TabInfo]
     
 
-class WindowInfo(BaseModel):
-    name: str
+class BatchStep(BaseModel):
+    command: str
+    params: Dict[str, Any] = {}
 
-class WindowListResponse(BaseModel):
+
+class BatchRequest(BaseModel):
+    steps: List[BatchStep]
+    stop_on_error: bool = True
+
+
+class BatchResponse(BaseModel):
     status: str
-    windows: List[str]
+    command: str
+    results: List[Dict[str, Any]]
 
 
-async def forward_to_vscode(command: str, params: Dict = None) -> dict:
-    """Forward command to VS Code extension server."""
-    async with httpx.AsyncClient() as client:
-        try:
-            url = f"{VSCODE_SERVER}/{command}"
-            response = await client.get(url, params=params)
-            data = response.json()
+# Extension commands that may appear in a /batch request
+BATCH_COMMANDS = {
+    "nextTab", "previousTab", "closeTab", "closeAllTabs", "closeTabsToRight",
+    "openFile", "listOpenTabs", "goToTabName", "goToLine", "recentFiles",
+}
 
-            # If the response indicates an error, ensure it includes the command
-            if data.get("status") == "error":
-                data["command"] = command
 
-            return data
-        except httpx.RequestError as exc:
-            raise HTTPException(
-                status_code=503,
-                detail="VS Code extension not running. Please start the extension in VS Code first (press F5 in the extension project)",
-            )
+class WindowInfo(BaseModel):
+    name: str
+
+class WindowListResponse(BaseModel):
+    status: str
+    windows: List[str]
 
 
 @app.get("/nextTab", response_model=CommandResponse)
@@ -122,7 +160,7 @@ async def open_file(path: str):
 @app.get("/listOpenTabs", response_model=TabListResponse)
 async def list_open_tabs():
     """Get a list of all open tabs in VS Code."""
-    return await forward_to_vscode("listOpenTabs")
+    return await get_editor_state().list_open_tabs()
 
 
 @app.get("/goToTabName", response_model=CommandResponse)
@@ -130,7 +168,7 @@ async def go_to_tab_name(name: str):
     """Switch to a specific tab by its name."""
     if not name:
         raise HTTPException(status_code=400, detail="Tab name must be provided")
-    return await forward_to_vscode("goToTabName", {"name": name})
+    return await get_editor_state().go_to_tab(name)
 
 
 @app.get("/goToLine", response_model=CommandResponse)
@@ -144,24 +182,52 @@ async def go_to_line(line: int):
 @app.get("/recentFiles", response_model=RecentFilesResponse)
 async def get_recent_files():
     """Get list of recently opened files."""
-    return await forward_to_vscode("recentFiles")
+    return await get_editor_state().get_recent_files()
+
+
+@app.post("/batch", response_model=BatchResponse)
+async def batch(request: BatchRequest):
+    """
+    Run several commands in order with one round-trip to VS Code. A batch
+    the extension rejects as a whole answers with the extension's status.
+    """
+    if not request.steps:
+        raise HTTPException(status_code=400, detail="At least one step must be provided")
+    unknown = [step.command for step in request.steps if step.command not in BATCH_COMMANDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unsupported batch commands: {', '.join(unknown)}")
+    steps = [step.model_dump() for step in request.steps]
+    return await forward_batch_to_vscode(steps, request.stop_on_error)
 
 
 @app.get("/status")
 async def check_status():
-    """Check if VS Code extension is running."""
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.get(VSCODE_SERVER)
-            return {"status": "connected", "message": "VS Code extension is running"}
-    except httpx.RequestError:
-        return {"status": "disconnected", "message": "VS Code extension is not running"}
+    """Check if VS Code extension is running, as last seen by the heartbeat."""
+    return health_for().status()
+
+
+@app.get("/editorState")
+async def editor_state_status():
+    """Whether tab queries are served from the event-fed mirror, and how fresh it is."""
+    return get_editor_state().stats()
+
+
+@app.get("/windows")
+def list_extension_windows():
+    """VS Code windows running the extension, most recently focused first."""
+    return {"windows": [instance.to_dict() for instance in instance_registry.instances()]}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-stage latency histograms and counters in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
 
 
 @app.get("/listWindows", response_model=WindowListResponse)
 async def list_windows():
     """Get a list of all open VSCode windows."""
-    windows = get_vscode_windows()
+    windows = await asyncio.to_thread(window_backend.list_windows)
     return {"status": "success", "windows": windows}
 
 @app.get("/switchWindow", response_model=CommandResponse)
@@ -170,7 +236,7 @@ async def switch_window(title: str):
     if not title:
         raise HTTPException(status_code=400, detail="Window title must be provided")
     
-    success = switch_to_window(title)
+    success = await asyncio.to_thread(window_backend.switch_to, title)
     if success:
         return {"status": "success", "command": "switchWindow", "message": f"Switched to window: {title}"}
     else:
@@ -193,5 +259,10 @@ if __name__ == "__main__":
     print("- GET /goToLine?line=<number>")
     print("- GET /recentFiles")
     print("- GET /status")
+    print("- GET /editorState")
+    print("- GET /windows")
+    print("- GET /metrics")
+    print("- POST /batch")
+    print("Add ?window=<workspace name> to send a command to a specific VS Code window")
 
     uvicorn.run(app, host="0.0.0.0", port=3000)
@@ -0,0 +1,116 @@
+"""
+Fake OpenAI-compatible chat completions server for benchmarks.
+
+Understands just enough of /v1/chat/completions for this repo: tool-calling
+turns for the agent (streamed or not) and JSON-mode filename matching for
+filesearch. Every reply waits `latency` seconds to imitate the real API.
+Point the servers at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1, or
+serve it from a benchmark with `running_stub(port, app=create_fake_openai_app())`.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def pick_tool_call(command: str, tool_names: List[str]) -> Optional[Dict]:
+    """Crude intent guess so the agent has a plausible tool call to run."""
+    command = command.lower()
+    line = re.search(r"line (\d+)", command)
+    if line and "go_to_line" in tool_names:
+        return {"name": "go_to_line", "arguments": {"line": line.group(1)}}
+    opened = re.search(r"open (?:the )?(.+?)(?: file)?$", command)
+    if opened and "open_file" in tool_names:
+        return {"name": "open_file", "arguments": {"path": opened.group(1)}}
+    for name in tool_names:
+        if name.replace("_", " ") in command:
+            return {"name": name, "arguments": {}}
+    return {"name": "list_open_tabs", "arguments": {}} if "list_open_tabs" in tool_names else None
+
+
+def create_fake_openai_app(latency: float = 0.0) -> FastAPI:
+    """
+    Args:
+        latency (float): Seconds to sleep before each completion
+
+    `app.state.calls` counts completions and `app.state.prompt_chars` the
+    prompt characters sent, so callers can diff them around a run.
+    """
+    fake = FastAPI()
+    fake.state.calls = 0
+    fake.state.prompt_chars = 0
+
+    @fake.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        fake.state.calls += 1
+        messages = body["messages"]
+        fake.state.prompt_chars += sum(len(str(m.get("content") or "")) for m in messages)
+        if latency:
+            await asyncio.sleep(latency)
+
+        content, tool_call = None, None
+        if body.get("tools"):
+            if messages[-1]["role"] == "tool":
+                content = "Done."
+            else:
+                user = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+                tool_call = pick_tool_call(user, [t["function"]["name"] for t in body["tools"]])
+                content = None if tool_call else "I can't do that."
+        else:
+            # filesearch: answer with the first filename offered
+            prompt = messages[-1]["content"]
+            names = json.loads(re.search(r"(\[.*?\])", prompt, re.S).group(1))
+            content = json.dumps({"best_match": names[0], "similarity_score": 0.9, "explanation": "fake"})
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        tool_calls = [{
+            "index": 0, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": tool_call["name"], "arguments": json.dumps(tool_call["arguments"])},
+        }] if tool_call else None
+        usage = {"prompt_tokens": fake.state.prompt_chars // 4, "completion_tokens": 5, "total_tokens": fake.state.prompt_chars // 4 + 5}
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = [{k: v for k, v in c.items() if k != "index"} for c in tool_calls]
+            return {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                "usage": usage,
+            }
+
+        def chunk(delta: Dict, finish: Optional[str] = None) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": body["model"], "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": "" if content is not None else None})
+            if tool_calls:
+                yield chunk({"tool_calls": tool_calls})
+                yield chunk({}, "tool_calls")
+            else:
+                for word in re.findall(r"\S+\s*", content):
+                    yield chunk({"content": word})
+                yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": body["model"], "choices": [], "usage": usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return fake
+
+
+if __name__ == "__main__":
+    uvicorn.run(create_fake_openai_app(float(os.getenv("FAKE_OPENAI_LATENCY", "0"))), host="127.0.0.1", port=8555)
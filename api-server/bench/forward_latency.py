@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: per-command httpx.AsyncClient vs the shared pooled client.
+
+Starts a stub of the extension's port-3068 server and sends the same
+command through both patterns. Run from api-server/:
+
+    python -m bench.forward_latency --requests 500
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+import vscode_client
+from bench.stub_extension import running_stub
+
+
+def summarize(samples: List[float]) -> Dict:
+    samples = sorted(samples)
+    return {
+        "requests": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1] * 1000, 3),
+    }
+
+
+async def client_per_request(url: str, n: int) -> List[float]:
+    """What forward_to_vscode used to do: a fresh client for every command."""
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        async with httpx.AsyncClient() as client:
+            (await client.get(f"{url}/nextTab")).json()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def shared_client(n: int) -> List[float]:
+    samples = []
+    client = vscode_client.get_client()
+    for _ in range(n):
+        start = time.perf_counter()
+        (await client.get("/nextTab", timeout=vscode_client.timeout_for("nextTab"))).json()
+        samples.append(time.perf_counter() - start)
+    await vscode_client.close_client()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--port", type=int, default=3068)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    vscode_client.VSCODE_SERVER = url
+    with running_stub(port=args.port):
+        before = asyncio.run(client_per_request(url, args.requests))
+        after = asyncio.run(shared_client(args.requests))
+
+    print(json.dumps({"client_per_request": summarize(before), "shared_client": summarize(after)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
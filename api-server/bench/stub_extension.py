@@ -0,0 +1,178 @@
+"""
+Stand-in for the VS Code extension's HTTP server on port 3068.
+
+It speaks the same GET /<command>?<params> protocol as
+fixflow-extension/src/extension.ts and keeps a tiny in-memory editor so
+tab commands have something to act on. Run it directly to point a real
+api-server at it, or use `running_stub()` from a benchmark.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class StubEditor:
+    """Minimal tab model: an ordered list of open paths and an active index."""
+
+    def __init__(self):
+        self.tabs: List[str] = []
+        self.active = -1
+        self.line = 1
+        self.version = 0
+        # One queue per GET /events client, fed a snapshot after each command
+        self.listeners: List[asyncio.Queue] = []
+
+    def open(self, path: str):
+        if path not in self.tabs:
+            self.tabs.append(path)
+        self.active = self.tabs.index(path)
+
+    def tab_list(self) -> List[Dict]:
+        return [
+            {"groupIndex": 0, "isActive": i == self.active, "label": os.path.basename(p), "path": p}
+            for i, p in enumerate(self.tabs)
+        ]
+
+    def state_event(self) -> str:
+        state = {
+            "version": self.version,
+            "tabs": self.tab_list(),
+            "recentFiles": [{"path": p, "label": os.path.basename(p)} for p in self.tabs[:100]],
+            "activePath": self.tabs[self.active] if self.tabs else None,
+        }
+        return f"event: state\ndata: {json.dumps(state)}\n\n"
+
+    def publish(self):
+        self.version += 1
+        if self.listeners:
+            event = self.state_event()
+            for queue in self.listeners:
+                queue.put_nowait(event)
+
+    def run(self, command: str, params: Dict) -> Dict:
+        result = self._run(command, params)
+        if command not in ("listopentabs", "recentfiles", "gotoline"):
+            self.publish()
+        return result
+
+    def _run(self, command: str, params: Dict) -> Dict:
+        if command == "nexttab" and self.tabs:
+            self.active = (self.active + 1) % len(self.tabs)
+        elif command == "previoustab" and self.tabs:
+            self.active = (self.active - 1) % len(self.tabs)
+        elif command == "closetab" and self.tabs:
+            self.tabs.pop(self.active)
+            self.active = min(self.active, len(self.tabs) - 1)
+        elif command == "closealltabs":
+            self.tabs, self.active = [], -1
+        elif command == "closetabstoright" and self.tabs:
+            del self.tabs[self.active + 1:]
+        elif command == "openfile":
+            if not params.get("path"):
+                raise ValueError("File path must be provided as a query parameter")
+            self.open(params["path"])
+        elif command == "listopentabs":
+            return {"status": "success", "command": command, "tabs": self.tab_list()}
+        elif command == "gototabname":
+            matches = [p for p in self.tabs if os.path.basename(p) == params.get("name")]
+            if not matches:
+                raise ValueError(f"No tab found with name: {params.get('name')}")
+            self.open(matches[0])
+        elif command == "gotoline":
+            self.line = int(params["line"])
+        elif command == "recentfiles":
+            files = [{"path": p, "label": os.path.basename(p)} for p in self.tabs[:100]]
+            return {"status": "success", "command": command, "files": files}
+        elif command not in ("nexttab", "previoustab", "closetab", "closetabstoright"):
+            raise ValueError("Command not found")
+        return {"status": "success", "command": command}
+
+
+def create_stub_app(latency: float = 0.0) -> FastAPI:
+    """
+    Args:
+        latency (float): Seconds to sleep before answering, to imitate the editor
+    """
+    stub = FastAPI()
+    stub.state.editor = StubEditor()
+    stub.state.requests = 0
+
+    @stub.get("/")
+    async def root():
+        return JSONResponse({"status": "error", "command": "", "message": "Command not found"}, status_code=500)
+
+    @stub.get("/events")
+    async def events():
+        """Push editor snapshots like the extension's event channel."""
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait(stub.state.editor.state_event())
+        stub.state.editor.listeners.append(queue)
+
+        async def stream():
+            try:
+                while True:
+                    yield await queue.get()
+            finally:
+                stub.state.editor.listeners.remove(queue)
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @stub.post("/batch")
+    async def batch(request: Request):
+        stub.state.requests += 1
+        payload = await request.json()
+        results, failed = [], False
+        for step in payload.get("steps", []):
+            command = step["command"].lower()
+            if failed and payload.get("stopOnError"):
+                results.append({"status": "skipped", "command": command})
+                continue
+            if latency:
+                await asyncio.sleep(latency)
+            try:
+                results.append(stub.state.editor.run(command, step.get("params") or {}))
+            except (ValueError, KeyError) as e:
+                failed = True
+                results.append({"status": "error", "command": command, "message": str(e)})
+        return {"status": "error" if failed else "success", "command": "batch", "results": results}
+
+    @stub.get("/{command}")
+    async def command(command: str, request: Request):
+        stub.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        command = command.lower()
+        try:
+            return stub.state.editor.run(command, dict(request.query_params))
+        except (ValueError, KeyError) as e:
+            return JSONResponse({"status": "error", "command": command, "message": str(e)}, status_code=500)
+
+    return stub
+
+
+@contextmanager
+def running_stub(port: int = 3068, latency: float = 0.0, app: Optional[FastAPI] = None):
+    """Serve a stub extension on localhost:`port` in a background thread."""
+    app = app or create_stub_app(latency)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield app
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    uvicorn.run(create_stub_app(float(os.getenv("STUB_LATENCY", "0"))), host="127.0.0.1", port=3068)
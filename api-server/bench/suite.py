@@ -0,0 +1,261 @@
+"""
+End-to-end latency benchmarks for app.py and shortcuts.py.
+
+Runs both servers as real uvicorn processes against the stub extension and
+the fake OpenAI server, one synthetic workspace size at a time, and drives
+each scenario with concurrent requests. Results (p50/p95/p99, throughput,
+errors, LLM and extension calls per scenario) are printed as JSON, so runs
+from two commits can be diffed directly. Run from api-server/:
+
+    python -m bench.suite --sizes 1k,100k --requests 200 --concurrency 8 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.fake_openai import create_fake_openai_app
+from bench.forward_latency import summarize
+from bench.stub_extension import create_stub_app, running_stub
+from bench.workspace import DEFAULT_ROOT, SIZES, WORDS, ensure_workspace, file_name, file_path, sample_files
+
+API_SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_TIMEOUT = 600.0
+
+# (name, server, request builder): the builder gets a file number from the
+# workspace sample and returns (method, path, json body or query params)
+RequestBuilder = Callable[[str, int], Tuple[str, str, Dict]]
+
+
+def spoken(i: int) -> str:
+    """How someone would say file i: "open auth router 123 dot py"."""
+    stem, ext = file_name(i).rsplit(".", 1)
+    first, second, number = stem.split("_")
+    return f"{first} {second} {int(number)} dot {ext}"
+
+
+SCENARIOS: List[Tuple[str, str, RequestBuilder]] = [
+    ("app.nextTab", "app", lambda ws, i: ("GET", "/nextTab", {})),
+    ("app.openFile", "app", lambda ws, i: ("GET", "/openFile", {"path": file_path(ws, i)})),
+    ("shortcuts.execute.fast_path", "shortcuts", lambda ws, i: ("POST", "/execute", {"command": "next tab"})),
+    ("shortcuts.execute.open_exact", "shortcuts", lambda ws, i: ("POST", "/execute", {"command": f"open {file_name(i)}"})),
+    ("shortcuts.execute.open_spoken", "shortcuts", lambda ws, i: ("POST", "/execute", {"command": f"open {spoken(i)}"})),
+    ("shortcuts.execute.agent", "shortcuts",
+     lambda ws, i: ("POST", "/execute", {"command": f"take me to line {i % 5000 + 1} and stay there"})),
+    ("shortcuts.execute.agent_repeat", "shortcuts",
+     lambda ws, i: ("POST", "/execute", {"command": "take me to line 7 and stay there"})),
+]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def running_server(module: str, port: int, env: Dict[str, str]):
+    """Serve `module`:app with uvicorn in a subprocess until the block exits."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=API_SERVER_DIR,
+        env={**os.environ, **env},
+    )
+    try:
+        wait_ready(f"http://127.0.0.1:{port}", process)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def wait_ready(url: str, process: subprocess.Popen, path: str = "/"):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server at {url} exited with code {process.returncode}")
+        try:
+            httpx.get(url + path, timeout=READY_TIMEOUT)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server at {url} did not start")
+
+
+def wait_warm(url: str):
+    """Block until shortcuts has built its file index and agent."""
+    httpx.get(url + "/indexStatus", timeout=READY_TIMEOUT)
+    deadline = time.monotonic() + READY_TIMEOUT
+    while not httpx.get(url + "/startupReport").json().get("agent_ready"):
+        if time.monotonic() > deadline:
+            raise TimeoutError("Agent did not finish warming up")
+        time.sleep(0.1)
+
+
+def failed(response: httpx.Response) -> bool:
+    if response.status_code >= 400:
+        return True
+    body = response.json()
+    return isinstance(body, dict) and body.get("status") == "error"
+
+
+async def drive(call: Callable[[int], Awaitable[bool]], items: List[int], concurrency: int) -> Dict:
+    """Run `call` over `items` with `concurrency` workers and summarize the latencies."""
+    samples: List[float] = []
+    errors = 0
+    queue = list(reversed(items))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            item = queue.pop()
+            started = time.perf_counter()
+            try:
+                ok = await call(item)
+            except httpx.HTTPError:
+                ok = False
+            samples.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(samples) / elapsed, 2),
+    }
+
+
+async def run_scenario(url: str, workspace: str, build: RequestBuilder, items: List[int],
+                       warmup: List[int], concurrency: int, mark: Callable[[], None]) -> Dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120.0) as client:
+        async def call(i: int) -> bool:
+            method, path, payload = build(workspace, i)
+            if method == "GET":
+                response = await client.get(path, params=payload)
+            else:
+                response = await client.post(path, json=payload)
+            return not failed(response)
+
+        for i in warmup:
+            await call(i)
+        mark()
+        return await drive(call, items, concurrency)
+
+
+async def run_file_search(workspace: str, items: List[int], concurrency: int, mark: Callable[[], None]) -> Dict:
+    """llm_file_search in this process, with misspelled terms so the LLM is consulted."""
+    from filesearch import llm_file_search  # imported after OPENAI_BASE_URL is set
+
+    await asyncio.to_thread(llm_file_search, workspace, "warm up", "bench")
+    mark()
+
+    async def call(i: int) -> bool:
+        term = spoken(i).replace(WORDS[i % len(WORDS)], WORDS[i % len(WORDS)][::-1], 1)
+        result = await asyncio.to_thread(llm_file_search, workspace, term, "bench")
+        return "error" not in result
+
+    return await drive(call, items, concurrency)
+
+
+def run_size(size: str, args, stub, fake) -> Dict:
+    workspace = ensure_workspace(size, args.root)
+    sample = sample_files(size, args.requests + args.warmup)
+    warmup, items = sample[:args.warmup], sample[args.warmup:]
+    env = {
+        "VSCODE_SERVER": f"http://127.0.0.1:{args.port_base}",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.port_base + 1}/v1",
+        "OPENAI_API_KEY": "bench",
+        "WORKSPACE_DIR": workspace,
+        "WINDOW_BACKEND": "fake",
+        # No registered windows, so commands go to VSCODE_SERVER (the stub)
+        "FIXFLOW_INSTANCES_DIR": os.path.join(args.root, "instances"),
+        # Kept with the workspaces, so runs start from a snapshot like a restarted server
+        "FILE_INDEX_DIR": os.path.join(args.root, "file-index"),
+        "WARM_UP": "1",
+    }
+    results = {}
+
+    def measure(name: str, run: Callable[[Callable[[], None]], Awaitable[Dict]]):
+        """Run one scenario; LLM and extension calls are counted from the end of its warm-up."""
+        if args.scenarios and not any(name.startswith(prefix) for prefix in args.scenarios):
+            return
+        baseline = {}
+
+        def mark():
+            baseline.update(calls=fake.state.calls, requests=stub.state.requests)
+
+        result = asyncio.run(run(mark))
+        result["llm_calls"] = fake.state.calls - baseline["calls"]
+        result["extension_requests"] = stub.state.requests - baseline["requests"]
+        results[name] = result
+        print(f"[{size}] {name}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+              f"{result['throughput_rps']} req/s", file=sys.stderr)
+
+    for server, port in (("app", args.port_base + 2), ("shortcuts", args.port_base + 3)):
+        scenarios = [(name, build) for name, s, build in SCENARIOS if s == server]
+        if args.scenarios and not any(n.startswith(p) for n, _ in scenarios for p in args.scenarios):
+            continue
+        with running_server(server, port, env) as url:
+            if server == "shortcuts":
+                wait_warm(url)
+            for name, build in scenarios:
+                measure(name, lambda mark: run_scenario(url, workspace, build, items, warmup, args.concurrency, mark))
+
+    os.environ.update({k: env[k] for k in ("OPENAI_BASE_URL", "OPENAI_API_KEY")})
+    measure("filesearch.llm_file_search", lambda mark: run_file_search(workspace, items, args.concurrency, mark))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1k,100k", help=f"Comma-separated subset of {', '.join(SIZES)}")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per fake OpenAI completion")
+    parser.add_argument("--extension-latency", type=float, default=0.0, help="Seconds per stub extension command")
+    parser.add_argument("--scenarios", default="", help="Only run scenarios starting with these comma-separated prefixes")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="Where synthetic workspaces are kept")
+    parser.add_argument("--port-base", type=int, default=8560,
+                        help="Stub extension, fake OpenAI, app and shortcuts use this port and the next three")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    args.scenarios = [prefix for prefix in args.scenarios.split(",") if prefix]
+
+    stub = create_stub_app(args.extension_latency)
+    fake = create_fake_openai_app(args.llm_latency)
+    report = {
+        "commit": git_commit(),
+        "config": {k: getattr(args, k) for k in ("requests", "warmup", "concurrency", "llm_latency", "extension_latency")},
+        "results": {},
+    }
+    with running_stub(args.port_base, app=stub), running_stub(args.port_base + 1, app=fake):
+        for size in args.sizes.split(","):
+            report["results"][size] = run_size(size, args, stub, fake)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Synthetic workspaces for the benchmarks.
+
+Files are empty and named from a small vocabulary ("auth_router_000123.py")
+so fuzzy and spoken-style lookups have realistic near-misses. A workspace
+is generated once per size under the given root and reused afterwards:
+
+    python -m bench.workspace --sizes 1k,100k,1m --root /tmp/fixflow-bench
+"""
+import argparse
+import os
+import random
+from typing import Dict, List
+
+SIZES: Dict[str, int] = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_ROOT = os.getenv("BENCH_WORKSPACE_ROOT", "/tmp/fixflow-bench")
+
+WORDS = [
+    "agent", "api", "auth", "cache", "client", "config", "handler", "index",
+    "loader", "main", "model", "parser", "router", "schema", "server",
+    "service", "settings", "user", "utils", "view",
+]
+EXTENSIONS = ["py", "py", "py", "md", "yml"]
+FILES_PER_DIR = 500
+
+
+def file_name(i: int) -> str:
+    """Deterministic name of the i-th file in every workspace."""
+    first, second = WORDS[i % len(WORDS)], WORDS[(i // len(WORDS)) % len(WORDS)]
+    return f"{first}_{second}_{i:07d}.{EXTENSIONS[i % len(EXTENSIONS)]}"
+
+
+def file_path(root: str, i: int) -> str:
+    group = i // FILES_PER_DIR
+    return os.path.join(root, "src", f"pkg_{group // 100:03d}", f"mod_{group % 100:02d}", file_name(i))
+
+
+def ensure_workspace(size: str, root: str = DEFAULT_ROOT) -> str:
+    """
+    Create the workspace for `size` ("1k", "100k" or "1m") unless it exists.
+
+    Returns:
+        str: The workspace directory
+    """
+    count = SIZES[size]
+    directory = os.path.join(root, f"workspace-{size}")
+    marker = os.path.join(directory, ".complete")
+    if os.path.exists(marker):
+        return directory
+
+    for i in range(count):
+        path = file_path(directory, i)
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "a").close()
+    open(marker, "w").close()
+    return directory
+
+
+def sample_files(size: str, n: int, seed: int = 0) -> List[int]:
+    """n file numbers spread over the workspace, the same for every run."""
+    return random.Random(seed).sample(range(SIZES[size]), min(n, SIZES[size]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark workspaces")
+    parser.add_argument("--sizes", default="1k,100k", help=f"Comma-separated subset of {', '.join(SIZES)}")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    args = parser.parse_args()
+    for size in args.sizes.split(","):
+        print(ensure_workspace(size, args.root))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Things "open ..." also applies to that are not files in the workspace;
+# opening them is left to the agent
+NOT_FILES = ["a", "an", "new", "terminal", "settings", "preferences", "folder", "window", "panel", "sidebar",
+             "explorer", "console", "extension", "extensions", "command", "keyboard", "tab", "editor"]
+OPEN = r"open(?: up)?"
+# One word of a file's name: not a non-file target, nor a word that adds
+# another instruction ("the settings for python", "the file in src")
+NAME_WORD = rf"(?!(?:{'|'.join(NOT_FILES)}|the|this|that|my|file|for|in|with|to|from|on|at|of)\b)[\w\-]+"
+NAME_WORDS = rf"{NAME_WORD}(?: {NAME_WORD}){{0,2}}"
+
+# Phrasings per tool name, tried in order. Tools are matched in the order
+# listed here (not the agent's tool order) so that e.g. "close tabs to the
+# right" wins over "close tab". Named groups become tool parameters.
+COMMAND_PATTERNS: List[Tuple[str, List[str]]] = [
+    ("close_tabs_to_right", [
+        r"close (?:all )?(?:the )?(?:tabs|editors) (?:to|on) the right(?: of (?:this|the current) (?:one|tab))?",
+    ]),
+    ("close_all_tabs", [
+        r"close (?:all|every)(?: of)?(?: the)? (?:open )?(?:tabs|editors|files)",
+        r"close everything",
+    ]),
+    ("close_tab", [
+        r"close (?:this|the|the current|current|active|the active)? ?(?:tab|editor|file)",
+    ]),
+    ("next_tab", [
+        r"(?:go to |switch to |move to )?(?:the )?next (?:tab|editor)",
+    ]),
+    ("previous_tab", [
+        r"(?:go (?:back )?to |switch to |move to )?(?:the )?(?:previous|prev|last) (?:tab|editor)",
+        r"go back a tab",
+    ]),
+    ("go_to_line", [
+        r"(?:go|jump|move|scroll|skip) to line (?:number )?(?P<line>\d+)",
+        r"line (?:number )?(?P<line>\d+)",
+    ]),
+    ("list_open_tabs", [
+        r"(?:list|show|what are)(?: me)?(?: all)?(?: the| my)? open (?:tabs|editors|files)",
+        r"(?:list|show)(?: me)?(?: all)?(?: the| my)? tabs",
+    ]),
+    ("get_recent_files", [
+        r"(?:list|show|get)(?: me)?(?: the| my)? recent(?:ly opened)? files",
+    ]),
+    ("list_windows", [
+        r"(?:list|show)(?: me)?(?: all)?(?: the| my)? (?:open )?windows",
+    ]),
+    ("switch_window", [
+        r"(?:switch|go|change) to (?:the )?window (?P<title>.+)",
+    ]),
+    ("check_status", [
+        r"(?:check (?:the )?)?(?:extension )?status",
+        r"is (?:the )?extension running",
+    ]),
+    ("go_to_tab", [
+        r"(?:go|switch|jump) to (?:the )?tab (?:named |called )?(?P<name>[\w.\-]+)",
+        r"(?:go|switch|jump) to (?:the )?(?P<name>[\w\-]+\.\w+) tab",
+    ]),
+    ("open_file", [
+        # Something that looks like a file name: "app.py", "src/app", "app dot py"
+        rf"{OPEN} (?:the |my )?(?:file )?(?P<path>[\w\-]+(?:\.| dot )\w{{1,8}}|[\w.\-]*/[\w.\-/]+)(?: file)?",
+        # A short name called a file: "open the readme file", "open file main controller"
+        rf"{OPEN} (?:the |my )?(?P<path>{NAME_WORDS}) file",
+        rf"{OPEN} (?:the |my )?file (?P<path>{NAME_WORDS})",
+        # A bare single name: "open readme"
+        rf"{OPEN} (?:the |my )?(?P<path>{NAME_WORD})",
+    ]),
+]
+
+# Anything that chains or qualifies actions needs the agent to plan it.
+COMPOUND_COMMAND = re.compile(r"\b(?:and|then|after|before|except|unless|if)\b|[,;]")
+TRAILING_NOISE = re.compile(r"[\s.!?]+$")
+
+
+class CommandRouter:
+    """
+    Deterministic parser for the simple commands that make up most /execute
+    traffic. A command that fully matches one pattern is mapped straight
+    onto the corresponding tool; anything else is left for the agent.
+    """
+
+    def __init__(self, tools: List[Any]):
+        """
+        Args:
+            tools (List[Any]): The agent's tools; only patterns for tools
+                present here are compiled
+        """
+        tools_by_name = {tool.name: tool for tool in tools}
+        self.routes = [
+            (tools_by_name[name], [re.compile(p, re.IGNORECASE) for p in patterns])
+            for name, patterns in COMMAND_PATTERNS
+            if name in tools_by_name
+        ]
+
+    @staticmethod
+    def normalize(command: str) -> str:
+        command = TRAILING_NOISE.sub("", command.strip())
+        command = re.sub(r"^(?:please |can you |could you )+", "", command, flags=re.IGNORECASE)
+        return re.sub(r"\s+", " ", re.sub(r"\s+please$", "", command, flags=re.IGNORECASE)).strip()
+
+    def match(self, command: str) -> Optional[Tuple[Any, Dict[str, str]]]:
+        """
+        Returns:
+            Optional[Tuple[Any, Dict[str, str]]]: (tool, params) for a simple
+            command, or None when the agent should handle it
+        """
+        command = self.normalize(command)
+        if not command or COMPOUND_COMMAND.search(command):
+            return None
+        for tool, patterns in self.routes:
+            for pattern in patterns:
+                match = pattern.fullmatch(command)
+                if match:
+                    params = {k: v.strip() for k, v in match.groupdict().items() if v}
+                    return tool, params
+        return None
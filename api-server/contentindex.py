@@ -0,0 +1,374 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, keep one server process per index
+    fcntl = None
+
+from filematch import CARRIER_WORDS, FILLER_WORDS
+from fileindex import FileIndex, get_file_index
+from pathvectors import numpy_available
+
+# Text files worth searching by content; wider than the filename index
+CONTENT_EXTENSIONS = os.getenv(
+    "CONTENT_EXTENSIONS",
+    "py,md,yml,yaml,toml,json,txt,js,jsx,ts,tsx,html,css,sh,applescript,swift,go,rs,java,kt,rb,c,h,cpp,ini,cfg",
+).split(",")
+CONTENT_MAX_BYTES = int(os.getenv("CONTENT_MAX_BYTES", str(256 * 1024)))
+CONTENT_INDEX_DIR = os.getenv("CONTENT_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fixflow", "content"))
+# Files indexed per write transaction; searches wait for at most one batch
+CONTENT_BATCH_SIZE = 256
+CONTENT_SHORTLIST_SIZE = 5
+# Candidates whose trigrams match are read back to confirm the terms and cut a snippet
+VERIFY_LIMIT = 50
+SNIPPET_CHARS = 160
+BINARY_SNIFF_BYTES = 8192
+
+# Words that describe the request rather than the file contents
+STOP_WORDS = FILLER_WORDS | CARRIER_WORDS | {
+    "with", "where", "which", "that", "this", "is", "are", "was", "in", "of", "for", "and", "or",
+    "defined", "define", "definition", "declared", "contains", "containing", "has", "uses", "using",
+    "code", "function", "method", "class", "script", "one", "thing", "stuff", "it", "its", "find",
+}
+
+TERM_PATTERN = re.compile(r"[\w.\-]+")
+
+
+def content_terms(search_term: str) -> List[str]:
+    """Words of a spoken request worth looking for in file contents."""
+    terms = [t.strip(".-") for t in TERM_PATTERN.findall(search_term.lower())]
+    return list(dict.fromkeys(t for t in terms if len(t) >= 3 and t not in STOP_WORDS))
+
+
+def trigrams(data: bytes) -> Set[int]:
+    """Distinct byte trigrams of `data`, each packed into one int."""
+    if len(data) < 3:
+        return set()
+    if numpy_available():
+        import numpy as np
+        b = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+        return set(np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:]).tolist())
+    return {int.from_bytes(data[i:i + 3], "big") for i in range(len(data) - 2)}
+
+
+def read_text(path: str, lower: bool = True) -> Optional[bytes]:
+    """File contents, lower-cased by default; None for missing, oversized or binary files."""
+    try:
+        if os.path.getsize(path) > CONTENT_MAX_BYTES:
+            return None
+        with open(path, "rb") as f:
+            data = f.read(CONTENT_MAX_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > CONTENT_MAX_BYTES or b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    return data.lower() if lower else data
+
+
+class ContentIndex:
+    """
+    Trigram inverted index over the contents of a workspace's text files,
+    stored in SQLite so it survives restarts.
+
+    `postings` maps each byte trigram to the documents containing it, and
+    each document keeps its own trigram list so it can be removed or
+    re-indexed without scanning the postings. follow() indexes a
+    FileIndex's files in a background thread and then applies the changes
+    its watcher reports, so searches never read or stat files to keep the
+    index current. Against the copy on disk only new and edited files
+    (by size and mtime) are read. Files above CONTENT_MAX_BYTES and binary
+    files (a NUL byte near the start) are skipped.
+
+    Every uvicorn worker follows the same database. Each write batch holds
+    an exclusive lock on its `.lock` file and first re-reads the document
+    table if another process committed since, so workers never index the
+    same file twice and each one's view matches the postings it reads.
+    """
+
+    def __init__(self, directory: str, db_path: str):
+        self.directory = directory
+        self.db_path = db_path
+        self.ready = threading.Event()
+        self.updates = 0
+        self._lock = threading.Lock()
+        # path -> whether it exists, for changes waiting for the worker
+        self._pending: Dict[str, bool] = {}
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = open(f"{db_path}.lock", "a")
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                grams BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                gram INTEGER NOT NULL,
+                doc INTEGER NOT NULL,
+                PRIMARY KEY (gram, doc)
+            ) WITHOUT ROWID;
+        """)
+        # path -> (doc id, mtime_ns, size)
+        self._docs: Dict[str, Tuple[int, int, int]] = {}
+        # PRAGMA data_version the document table was last read at; it
+        # changes whenever another connection commits
+        self._data_version: Optional[int] = None
+        self._catch_up()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _catch_up(self):
+        """Re-read the document table if another process changed the database."""
+        (version,) = self._db.execute("PRAGMA data_version").fetchone()
+        if version == self._data_version:
+            return
+        self._docs = {
+            path: (doc, mtime_ns, size)
+            for doc, path, mtime_ns, size in self._db.execute("SELECT id, path, mtime_ns, size FROM docs")
+        }
+        self._data_version = version
+
+    @contextmanager
+    def _writing(self):
+        """This process's lock, the database's file lock and a transaction, with `_docs` caught up."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                with self._db:
+                    yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _drop_postings(self, doc: int, blob: bytes):
+        grams = array("I")
+        grams.frombytes(blob)
+        self._db.executemany("DELETE FROM postings WHERE gram = ? AND doc = ?", ((g, doc) for g in grams))
+
+    def _remove(self, path: str):
+        doc = self._docs.pop(path)[0]
+        row = self._db.execute("SELECT grams FROM docs WHERE id = ?", (doc,)).fetchone()
+        if row is not None:
+            self._drop_postings(doc, row[0])
+            self._db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+
+    def _add(self, path: str, stat: os.stat_result):
+        """Index `path`, replacing the row it already has if any."""
+        data = read_text(path)
+        grams = array("I", sorted(trigrams(data))) if data is not None else array("I")
+        row = (stat.st_mtime_ns, stat.st_size, grams.tobytes(), path)
+        existing = self._db.execute("SELECT id, grams FROM docs WHERE path = ?", (path,)).fetchone()
+        if existing is None:
+            doc = self._db.execute("INSERT INTO docs (mtime_ns, size, grams, path) VALUES (?, ?, ?, ?)", row).lastrowid
+        else:
+            doc = existing[0]
+            self._drop_postings(doc, existing[1])
+            self._db.execute("UPDATE docs SET mtime_ns = ?, size = ?, grams = ? WHERE path = ?", row)
+        self._db.executemany("INSERT OR IGNORE INTO postings (gram, doc) VALUES (?, ?)", ((g, doc) for g in grams))
+        self._docs[path] = (doc, stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self, path: str):
+        """Index `path` if it is new or was edited, drop it if it is gone."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        known = self._docs.get(path)
+        if known is not None:
+            if stat is not None and known[1:] == (stat.st_mtime_ns, stat.st_size):
+                return
+            self._remove(path)
+        if stat is not None:
+            self._add(path, stat)
+
+    def _apply(self, changes: Dict[str, bool]):
+        """Apply {path: exists} in batches, so searches only wait for one batch."""
+        items = list(changes.items())
+        for start in range(0, len(items), CONTENT_BATCH_SIZE):
+            if self._stop.is_set():
+                return
+            with self._writing():
+                for path, exists in items[start:start + CONTENT_BATCH_SIZE]:
+                    if exists:
+                        self._refresh(path)
+                    elif path in self._docs:
+                        self._remove(path)
+            self.updates += 1
+
+    def sync(self, paths: Iterable[str]):
+        """Make the index match `paths`: index new and edited files and drop the rest."""
+        paths = set(paths)
+        self._apply({**dict.fromkeys(set(self._docs) - paths, False), **dict.fromkeys(paths, True)})
+
+    def changed(self, changed: Set[str], removed: Set[str]):
+        """FileIndex listener: queue the changes for the worker."""
+        with self._pending_lock:
+            self._pending.update(dict.fromkeys(removed, False))
+            self._pending.update(dict.fromkeys(changed, True))
+        self._wake.set()
+
+    def follow(self, index: FileIndex) -> "ContentIndex":
+        """Index `index`'s files in a background thread, then keep up with its changes."""
+        index.subscribe(self.changed)
+        self._thread = threading.Thread(target=self._run, args=(index,), name="content-index", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, index: FileIndex):
+        try:
+            self.sync(index.paths())
+        except Exception as e:
+            print(f"Content index build failed: {str(e)}")
+        finally:
+            self.ready.set()
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            try:
+                self._apply(pending)
+            except Exception as e:
+                print(f"Content index update failed: {str(e)}")
+
+    def _docs_with(self, term: str) -> Set[int]:
+        """Documents containing every trigram of `term`."""
+        grams = sorted(trigrams(term.encode("utf-8")))
+        placeholders = ",".join("?" * len(grams))
+        rows = self._db.execute(
+            f"SELECT doc FROM postings WHERE gram IN ({placeholders}) GROUP BY doc HAVING COUNT(*) = ?",
+            (*grams, len(grams)),
+        )
+        return {doc for (doc,) in rows}
+
+    def search(self, search_term: str, limit: int = CONTENT_SHORTLIST_SIZE) -> List[Dict]:
+        """
+        Files whose contents contain the words of `search_term`, best first.
+
+        Returns:
+            List[Dict]: {"name", "full_path", "score", "tier": "content", "line", "snippet"}
+        """
+        terms = content_terms(search_term)
+        if not terms:
+            return []
+        with self._lock:
+            self._catch_up()
+            total = max(len(self._docs), 1)
+            postings = {term: self._docs_with(term) for term in terms}
+            paths = {doc: path for path, (doc, _, _) in self._docs.items()}
+
+        # Rarer terms count for more; trigram hits are confirmed below
+        weights = {term: math.log(1 + total / len(docs)) for term, docs in postings.items() if docs}
+        if not weights:
+            return []
+        approximate: Dict[int, float] = {}
+        for term, weight in weights.items():
+            for doc in postings[term]:
+                approximate[doc] = approximate.get(doc, 0.0) + weight
+        shortlist = sorted(approximate, key=approximate.get, reverse=True)[:VERIFY_LIMIT]
+
+        results = []
+        full_weight = sum(weights.get(term, math.log(1 + total)) for term in terms)
+        for doc in shortlist:
+            path = paths.get(doc)
+            data = read_text(path, lower=False) if path else None
+            if data is None:
+                continue
+            text = data.decode("utf-8", "replace")
+            lowered = text.lower()
+            present = [term for term in weights if term in lowered]
+            if not present:
+                continue
+            line_number, snippet = best_line(text, present)
+            results.append({
+                "name": os.path.basename(path),
+                "full_path": path,
+                "score": round(sum(weights[t] for t in present) / full_weight, 4),
+                "tier": "content",
+                "line": line_number,
+                "snippet": snippet,
+            })
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+
+    def stats(self) -> Dict:
+        return {
+            "documents": len(self._docs),
+            "ready": self.ready.is_set(),
+            "pending": len(self._pending),
+            "updates": self.updates,
+            "db_path": self.db_path,
+        }
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            self._db.close()
+            self._lock_file.close()
+
+
+def best_line(text: str, terms: Iterable[str]) -> Tuple[int, str]:
+    """(1-based line number, trimmed line) of the line containing the most lower-case terms."""
+    terms = list(terms)
+    best, best_hits = (0, ""), 0
+    for number, line in enumerate(text.splitlines(), 1):
+        lowered = line.lower()
+        hits = sum(term in lowered for term in terms)
+        if hits > best_hits:
+            best, best_hits = (number, line.strip()[:SNIPPET_CHARS]), hits
+            if hits == len(terms):
+                break
+    return best
+
+
+_indexes: Dict[str, ContentIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_content_index(directory: str) -> ContentIndex:
+    """
+    The shared content index for `directory`. The first call starts
+    indexing its text files in the background (warm-up makes it); until
+    that is done searches only see what has been indexed so far.
+    """
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is not None:
+        return index
+    files = get_file_index(key, CONTENT_EXTENSIONS)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            os.makedirs(CONTENT_INDEX_DIR, exist_ok=True)
+            digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+            index = _indexes[key] = ContentIndex(key, os.path.join(CONTENT_INDEX_DIR, f"{digest}.sqlite")).follow(files)
+    return index
+
+
+def close_content_indexes():
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
@@ -0,0 +1,578 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.agents import AgentFinish
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import BaseTool
+from langchain_openai import ChatOpenAI
+
+from command_router import CommandRouter
+from editor_state import get_editor_state
+from health import health_for
+from metrics import STAGE_ERRORS, observe_stage, record_tool_call
+from modeltiers import MODEL_TIERS, command_tier, tier_stats
+from plan_cache import CONTEXT_KINDS, context_signature, is_error, plan_cache
+from speculation import resolve_file, settle
+from vscode_commands import READ_COMMANDS, forward_batch_to_vscode, forward_to_vscode
+from win import window_backend
+
+
+class LLMTimingHandler(AsyncCallbackHandler):
+    """
+    Records each of the agent's model turns as the agent_llm stage, and its
+    latency and tokens under the model's tier. Once a turn has picked its
+    tools, speculative file searches it doesn't need are cancelled.
+    """
+
+    def __init__(self, tier: str = "large"):
+        self.tier = tier
+        self._started: Dict[Any, float] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    async def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            observe_stage("agent_llm", time.perf_counter() - started)
+            try:
+                usage = response.generations[0][0].message.usage_metadata
+            except (IndexError, AttributeError):
+                usage = None
+            tier_stats.record("agent", self.tier, time.perf_counter() - started, usage)
+        try:
+            tool_calls = response.generations[0][0].message.tool_calls
+        except (IndexError, AttributeError):
+            tool_calls = []
+        settle(tool_calls)
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            STAGE_ERRORS.inc(stage="agent_llm")
+            observe_stage("agent_llm", time.perf_counter() - started)
+            tier_stats.record("agent", self.tier, time.perf_counter() - started)
+
+
+class VSCodeControlTool(BaseTool):
+    name: str
+    description: str
+    endpoint: str
+    params: Optional[List[str]] = []
+    base_url: str = "http://localhost:3000"
+    # For the run_batch tool: the tools its steps may name
+    step_tools: Dict[str, Any] = {}
+
+    def _run(self, **kwargs: Any) -> str:
+        """Execute the VS Code control command synchronously."""
+        return asyncio.run(self._arun(**kwargs))
+
+    async def _resolve_params(self, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict]]:
+        """
+        Turn tool arguments into extension query params, resolving
+        open_file paths through the file search.
+
+        Returns:
+            Tuple[Dict[str, Any], Optional[Dict]]: (params, None) or ({}, error result)
+        """
+        kwargs = dict(kwargs)
+        if self.name == "open_file" and "path" in kwargs:
+            # Find the closest matching file in the routed window's workspace,
+            # or take the search started for it while the agent was planning
+            search_result = await resolve_file(kwargs["path"])
+            
+            if "error" in search_result:
+                return {}, {"status": "error", "message": f"File search error: {search_result['error']}"}
+            
+            if search_result.get("full_path"):
+                kwargs["path"] = search_result["full_path"]
+            else:
+                return {}, {"status": "error", "message": "No matching file found"}
+        return {k: kwargs[k] for k in self.params if k in kwargs}, None
+
+    async def _run_batch(self, steps: List[Dict], stop_on_error: bool = True) -> Dict:
+        """Resolve every step's parameters, then send all steps in one request."""
+        tools = []
+        for step in steps:
+            tool = self.step_tools.get(step.get("tool"))
+            if tool is None:
+                return {"status": "error", "message": f"Unknown tool in batch: {step.get('tool')}"}
+            tools.append(tool)
+
+        resolved = await asyncio.gather(*(
+            tool._resolve_params(step.get("params") or {}) for tool, step in zip(tools, steps)
+        ))
+        for tool, (_, error) in zip(tools, resolved):
+            if error:
+                return {**error, "tool": tool.name}
+
+        batch_steps = [{"command": tool.endpoint, "params": params} for tool, (params, _) in zip(tools, resolved)]
+        return await forward_batch_to_vscode(batch_steps, stop_on_error)
+
+    async def _arun(self, **kwargs: Any) -> str:
+        """Execute the VS Code control command asynchronously."""
+        started = time.perf_counter()
+        result = await self._call(**kwargs)
+        record_tool_call(self.name, result, time.perf_counter() - started)
+        return result
+
+    async def _call(self, **kwargs: Any) -> Dict:
+        try:
+            if self.endpoint == "batch":
+                return await self._run_batch(kwargs.get("steps") or [], kwargs.get("stop_on_error", True))
+            if self.endpoint == "status":
+                # Answered from the heartbeat's cached state, no round-trip
+                return health_for().status()
+            if self.endpoint == "listWindows":
+                # Windows are an OS concern, not something the extension sees
+                windows = await asyncio.to_thread(window_backend.list_windows)
+                return {"status": "success", "windows": windows}
+            if self.endpoint == "switchWindow":
+                title = kwargs.get("title")
+                if not title:
+                    return {"status": "error", "message": "Window title must be provided"}
+                if await asyncio.to_thread(window_backend.switch_to, title):
+                    return {"status": "success", "command": "switchWindow", "message": f"Switched to window: {title}"}
+                return {"status": "error", "message": f"Window '{title}' not found or failed to switch"}
+            # Tab state is mirrored from the extension's event stream
+            if self.endpoint == "listOpenTabs":
+                return await get_editor_state().list_open_tabs()
+            if self.endpoint == "recentFiles":
+                return await get_editor_state().get_recent_files()
+            if self.endpoint == "goToTabName":
+                return await get_editor_state().go_to_tab(kwargs.get("name"))
+            params, error = await self._resolve_params(kwargs)
+            if error:
+                return error
+            response = await forward_to_vscode(self.endpoint, params=params)
+            return response
+        except httpx.HTTPError as e:
+            return {"status": "error", "message": f"HTTP error occurred: {str(e)}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An error occurred: {str(e)}"}
+
+def summarize_steps(steps: List[Dict]) -> str:
+    """A one-line account of tool results, standing in for the model's summary in direct mode."""
+    parts = []
+    for step in steps:
+        result = step["result"]
+        message = result.get("message") if isinstance(result, dict) else None
+        status = result.get("status", "success") if isinstance(result, dict) else "success"
+        parts.append(message or f"{step['tool']}: {status}")
+    return "; ".join(parts)
+
+
+class VSCodeControlAgent:
+    def __init__(self, openai_api_key: str):
+        """Initialize the VS Code Control Agent."""
+        # One model per tier; see modeltiers.command_tier
+        self.llms = {
+            tier: ChatOpenAI(
+                api_key=openai_api_key,
+                model=model,
+                stream_usage=True,
+                callbacks=[LLMTimingHandler(tier)]
+            )
+            for tier, model in MODEL_TIERS.items()
+        }
+        self.llm = self.llms["large"]
+        
+        # Define all VS Code control tools
+        self.tools = [
+            VSCodeControlTool(
+                name="next_tab",
+                description="Switch to the next tab in VS Code",
+                endpoint="nextTab"
+            ),
+            VSCodeControlTool(
+                name="previous_tab",
+                description="Switch to the previous tab in VS Code",
+                endpoint="previousTab"
+            ),
+            VSCodeControlTool(
+                name="close_tab",
+                description="Close the current tab in VS Code",
+                endpoint="closeTab"
+            ),
+            VSCodeControlTool(
+                name="close_all_tabs",
+                description="Close all tabs in VS Code",
+                endpoint="closeAllTabs"
+            ),
+            VSCodeControlTool(
+                name="close_tabs_to_right",
+                description="Close all tabs to the right of the current tab",
+                endpoint="closeTabsToRight"
+            ),
+            VSCodeControlTool(
+                name="open_file",
+                description="Open a specific file. Required parameter: 'path' - the name or path of the file to open. The tool will automatically search for similar filenames if exact match not found.",
+                endpoint="openFile",
+                params=["path"]
+            ),
+            VSCodeControlTool(
+                name="list_open_tabs",
+                description="Get a list of all currently open tabs in VS Code",
+                endpoint="listOpenTabs"
+            ),
+            VSCodeControlTool(
+                name="go_to_tab",
+                description="Switch to a specific tab by providing its name",
+                endpoint="goToTabName",
+                params=["name"]
+            ),
+            VSCodeControlTool(
+                name="go_to_line",
+                description="Go to a specific line number in the current file",
+                endpoint="goToLine",
+                params=["line"]
+            ),
+            VSCodeControlTool(
+                name="get_recent_files",
+                description="Get a list of recently opened files in VS Code",
+                endpoint="recentFiles"
+            ),
+            VSCodeControlTool(
+                name="check_status",
+                description="Check if the VS Code extension is running. Only needed when the user asks; other tools already report when the extension is down",
+                endpoint="status"
+            ),
+            VSCodeControlTool(
+                name="list_windows",
+                description="Get a list of all open VS Code window titles",
+                endpoint="listWindows"
+            ),
+            VSCodeControlTool(
+                name="switch_window",
+                description="Switch to a specific VS Code window by its title",
+                endpoint="switchWindow",
+                params=["title"]
+            ),
+        ]
+
+        # Editor commands that run_batch can chain in one request
+        batchable = {
+            tool.name: tool for tool in self.tools
+            if tool.endpoint not in ("status", "listWindows", "switchWindow")
+        }
+        self.tools.append(
+            VSCodeControlTool(
+                name="run_batch",
+                description=(
+                    "Run several editor actions in order with a single call. Required parameter: 'steps' - "
+                    "a list of {\"tool\": <tool name>, \"params\": {...}} objects using these tools: "
+                    f"{', '.join(batchable)}. Optional parameter: 'stop_on_error' (default true) skips the "
+                    "remaining steps after a failure. Returns one result per step."
+                ),
+                endpoint="batch",
+                params=["steps", "stop_on_error"],
+                step_tools=batchable,
+            )
+        )
+
+        self.prompt = ChatPromptTemplate.from_messages([
+            (
+                "system",
+                """You are a VS Code control assistant that helps users manage their editor tabs, windows, and navigation.
+                You have access to several tools to control VS Code through natural language commands.
+                
+                Important guidelines:
+                1. Do not check the status before other commands. Every tool fails fast with a clear error when the extension is not running; only use check_status when the user asks about it.
+                
+                2. When opening files:
+                   - You MUST use the 'path' parameter with the open_file tool
+                   - Example: If user says "open the config file", use open_file(path="config")
+                   - The path can be a partial filename, relative path, or description
+                   - The tool includes automatic file search functionality that will:
+                     * Search for files matching the provided name or description
+                     * Find similar filenames if exact match isn't found
+                     * Search through the entire workspace recursively
+                   - If initial open fails, don't give up - the search will try to find similar files
+                   - Example handling:
+                     * "open the main JavaScript file" -> open_file(path="main.js")
+                     * "open the user config" -> open_file(path="user config")
+                     * "open the API routes" -> open_file(path="api routes")
+                
+                3. When switching tabs:
+                   - Use the 'name' parameter with go_to_tab
+                   - Example: go_to_tab(name="index.js")
+                
+                4. When going to a specific line:
+                   - Use the 'line' parameter with go_to_line
+                   - Example: go_to_line(line="42")
+                   
+                5. When managing windows:
+                   - Use list_windows to get available windows first
+                   - Use the 'title' parameter with switch_window
+                   - Example: switch_window(title="project-name - VS Code")
+                   - Window titles should match exactly what's returned by list_windows
+                
+                6. When the user asks for several editor actions at once:
+                   - Plan the whole sequence and send it as one run_batch call
+                   - Example: "close all tabs, open agent.py, go to line 120" ->
+                     run_batch(steps=[{{"tool": "close_all_tabs"}}, {{"tool": "open_file", "params": {{"path": "agent.py"}}}}, {{"tool": "go_to_line", "params": {{"line": "120"}}}}])
+                
+                7. For better results:
+                   - First list_open_tabs or get_recent_files if the user's request is ambiguous
+                   - If file not found, try alternative search terms based on the user's description
+                   - Consider file extensions when searching (.js, .py, .json, etc.)
+                   - When switching windows, list available windows first if the target is unclear
+                
+                Always provide the required parameters for tools that need them. Never skip parameters that are marked as required in the tool descriptions. If a file isn't found immediately, the built-in search will help find the closest match."""
+            ),
+            ("human", "{input}"),
+            ("placeholder", "{agent_scratchpad}")
+        ])
+
+        # Simple commands ("next tab", "go to line 42") skip the LLM entirely
+        self.router = CommandRouter(self.tools)
+
+        # The bare tool-calling step, for direct mode
+        self.planners = {
+            tier: create_tool_calling_agent(llm, self.tools, self.prompt) for tier, llm in self.llms.items()
+        }
+        self.executors = {
+            tier: AgentExecutor(
+                agent=self.planners[tier],
+                tools=self.tools,
+                verbose=True,
+                return_intermediate_steps=True
+            )
+            for tier in self.llms
+        }
+        self.agent_executor = self.executors["large"]
+        self.tools_by_name = {tool.name: tool for tool in self.tools}
+        # Tools that only look at the editor, so running them again is harmless
+        self.read_tools = {
+            tool.name for tool in self.tools if tool.endpoint in READ_COMMANDS or tool.endpoint == "listWindows"
+        }
+
+    def escalation_reason(self, tier: str, steps: List[Tuple[str, Any]]) -> Optional[str]:
+        """
+        Why a small-model run should be redone by the large model, or None.
+
+        It is redone when the model did nothing at all (it didn't understand
+        the command), or when a tool failed before anything had changed the
+        editor; once a step has changed it, running the command again could
+        repeat that step, so the result stands.
+        """
+        if tier != "small":
+            return None
+        if not steps:
+            return "no_action"
+        for tool, result in steps:
+            if is_error(result):
+                return "tool_failure"
+            if tool not in self.read_tools:
+                return None
+        return None
+
+    async def _context(self, kinds: List[str]) -> Dict[str, Optional[str]]:
+        """Signatures of the editor state a plan may depend on; None where it can't be read."""
+        async def tabs():
+            result = await get_editor_state().list_open_tabs()
+            return [tab.get("path") or tab.get("label") for tab in result.get("tabs", [])]
+
+        fetchers = {"tabs": tabs, "windows": lambda: asyncio.to_thread(window_backend.list_windows)}
+        values = await asyncio.gather(*(fetchers[kind]() for kind in kinds), return_exceptions=True)
+        return {
+            kind: None if isinstance(value, BaseException) else context_signature(value)
+            for kind, value in zip(kinds, values)
+        }
+
+    async def cached_plan(self, command: str) -> Optional[Dict]:
+        """The plan recorded for this command, if the state it relied on is unchanged."""
+        return plan_cache.get(command, await self._context(plan_cache.context_kinds(command)))
+
+    async def replay(self, command: str, plan: Dict) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Run a cached plan's tool calls in order, yielding the same events as
+        stream(). A failing step invalidates the plan with a
+        "plan_invalidated" event. If only editor reads ran before it, the
+        replay ends there and the caller runs the agent instead; once a
+        step has changed the editor, running the command again would repeat
+        that step, so the replay ends with an error "done" carrying the
+        steps that ran.
+        """
+        yield "intent", {"tools": [{"tool": step["tool"], "args": step["args"]} for step in plan["steps"]]}
+        results = []
+        for step in plan["steps"]:
+            tool = self.tools_by_name.get(step["tool"])
+            yield "tool_start", {"tool": step["tool"], "input": step["args"]}
+            result = await tool._arun(**step["args"]) if tool else {"status": "error", "message": f"Unknown tool: {step['tool']}"}
+            yield "tool_end", {"tool": step["tool"], "output": result}
+            results.append({"tool": step["tool"], "args": step["args"], "result": result})
+            if is_error(result):
+                plan_cache.invalidate(command)
+                yield "plan_invalidated", {"tool": step["tool"], "output": result}
+                if all(done["tool"] in self.read_tools for done in results[:-1]):
+                    return
+                yield "done", {
+                    "status": "error",
+                    "output": summarize_steps(results),
+                    "steps": results,
+                    "handled_by": "plan_cache",
+                }
+                return
+        yield "done", {"status": "success", "output": plan["output"], "steps": results, "handled_by": "plan_cache"}
+
+    async def execute(self, command: str, direct: bool = False) -> dict:
+        """
+        Execute a natural language command to control VS Code.
+        
+        Args:
+            command (str): Natural language command for VS Code control
+            direct (bool): Return the tool results as soon as the model's
+                tool calls have run, see direct()
+            
+        Returns:
+            dict: Response from the agent executor with the "tier" whose
+            model produced it, or from replaying a cached plan (then with
+            "handled_by": "plan_cache")
+        """
+        if direct:
+            async for event, data in self.direct(command):
+                if event == "done":
+                    return {"input": command, **data}
+
+        plan = await self.cached_plan(command)
+        if plan:
+            async for event, data in self.replay(command, plan):
+                if event == "done":
+                    return {"input": command, **data}
+
+        context = await self._context(CONTEXT_KINDS)
+        tier = command_tier(command)
+        result = await self.executors[tier].ainvoke({"input": command})
+        reason = self.escalation_reason(tier, [(a.tool, o) for a, o in result.get("intermediate_steps", [])])
+        if reason:
+            tier_stats.escalate("agent", reason)
+            tier = "large"
+            result = await self.executors[tier].ainvoke({"input": command})
+        result["tier"] = tier
+        steps = [
+            {"tool": action.tool, "args": action.tool_input, "result": observation}
+            for action, observation in result.get("intermediate_steps", [])
+        ]
+        plan_cache.put(command, steps, result["output"], context)
+        return result
+
+    async def stream(self, command: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Run a command through the agent and yield (event, data) pairs as
+        they happen: the tools the model picked, each tool start/end,
+        output tokens and finally the complete output. When the small
+        model's run is redone by the large one an "escalate" event comes
+        first and the events of the second run follow.
+        """
+        plan = await self.cached_plan(command)
+        if plan:
+            async for event, data in self.replay(command, plan):
+                yield event, data
+                if event == "done":
+                    return
+
+        context = await self._context(CONTEXT_KINDS)
+        tier = command_tier(command)
+        output: List[str] = []
+        steps: List[Dict] = []
+        async for event in self._stream_run(tier, command, output, steps):
+            yield event
+        reason = self.escalation_reason(tier, [(step["tool"], step.get("result")) for step in steps])
+        if reason:
+            tier_stats.escalate("agent", reason)
+            yield "escalate", {"from": tier, "to": "large", "reason": reason}
+            tier, output, steps = "large", [], []
+            async for event in self._stream_run(tier, command, output, steps):
+                yield event
+        plan_cache.put(command, steps, "".join(output), context)
+        yield "done", {"status": "success", "output": "".join(output), "handled_by": "agent", "tier": tier}
+
+    async def direct(self, command: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Run a command with a single model turn: ask the model for its tool
+        calls, run them in order and finish with their structured results.
+        The executor's last turn, which only puts the results into prose,
+        is skipped. Yields the same events as stream(); the "done" event
+        carries "steps" ({"tool", "args", "result"} each) and a plain
+        summary of the results as "output".
+        """
+        plan = await self.cached_plan(command)
+        if plan:
+            async for event, data in self.replay(command, plan):
+                yield event, data
+                if event == "done":
+                    return
+
+        context = await self._context(CONTEXT_KINDS)
+        tier = command_tier(command)
+        steps: List[Dict] = []
+        answer: List[str] = []
+        async for event in self._direct_run(tier, command, steps, answer):
+            yield event
+        reason = self.escalation_reason(tier, [(step["tool"], step["result"]) for step in steps])
+        if reason:
+            tier_stats.escalate("agent", reason)
+            yield "escalate", {"from": tier, "to": "large", "reason": reason}
+            tier, steps, answer = "large", [], []
+            async for event in self._direct_run(tier, command, steps, answer):
+                yield event
+        output = answer[0] if answer else summarize_steps(steps)
+        plan_cache.put(command, steps, output, context)
+        yield "done", {
+            "status": "error" if any(is_error(step["result"]) for step in steps) else "success",
+            "output": output,
+            "steps": steps,
+            "handled_by": "agent",
+            "tier": tier,
+        }
+
+    async def _direct_run(self, tier: str, command: str, steps: List[Dict],
+                          answer: List[str]) -> AsyncIterator[Tuple[str, Dict]]:
+        """One tool-calling turn on `tier`'s model and its tool calls; a reply without tools goes to `answer`."""
+        decision = await self.planners[tier].ainvoke({"input": command, "intermediate_steps": []})
+        if isinstance(decision, AgentFinish):
+            answer.append(decision.return_values.get("output", ""))
+            return
+        yield "intent", {"tools": [{"tool": action.tool, "args": action.tool_input} for action in decision]}
+        for action in decision:
+            tool = self.tools_by_name.get(action.tool)
+            yield "tool_start", {"tool": action.tool, "input": action.tool_input}
+            if tool is None:
+                result = {"status": "error", "message": f"Unknown tool: {action.tool}"}
+            elif isinstance(action.tool_input, dict):
+                result = await tool._arun(**action.tool_input)
+            else:
+                # A bare string argument fills the tool's only parameter
+                result = await tool._arun(**({tool.params[0]: action.tool_input} if tool.params else {}))
+            steps.append({"tool": action.tool, "args": action.tool_input, "result": result})
+            yield "tool_end", {"tool": action.tool, "output": result}
+
+    async def _stream_run(self, tier: str, command: str, output: List[str],
+                          steps: List[Dict]) -> AsyncIterator[Tuple[str, Dict]]:
+        """One agent run on `tier`'s model, collecting its output tokens and steps."""
+        async for event in self.executors[tier].astream_events({"input": command}, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                token = event["data"]["chunk"].content
+                if token:
+                    output.append(token)
+                    yield "token", {"text": token}
+            elif kind == "on_chat_model_end":
+                tool_calls = getattr(event["data"]["output"], "tool_calls", None)
+                if tool_calls:
+                    yield "intent", {"tools": [{"tool": c["name"], "args": c["args"]} for c in tool_calls]}
+            elif kind == "on_tool_start":
+                steps.append({"tool": event["name"], "args": event["data"].get("input")})
+                yield "tool_start", {"tool": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                if steps:
+                    steps[-1]["result"] = event["data"].get("output")
+                yield "tool_end", {"tool": event["name"], "output": event["data"].get("output")}
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from vscode_client import VSCODE_SERVER, current_server, get_client, routed_to
+from vscode_commands import forward_to_vscode
+
+# Reconnect delays for the event channel, doubling from the first to the cap
+EVENTS_RETRY_INTERVAL = float(os.getenv("EDITOR_EVENTS_RETRY_INTERVAL", "1"))
+EVENTS_MAX_BACKOFF = float(os.getenv("EDITOR_EVENTS_MAX_BACKOFF", "30"))
+# The extension sends a keep-alive comment every 15s; silence longer than
+# this means the connection is dead even if the socket looks open
+EVENTS_READ_TIMEOUT = httpx.Timeout(45.0, connect=1.0)
+
+
+def parse_sse(lines: List[str]) -> Optional[Dict]:
+    """{"event", "data"} of one Server-Sent Event block, or None if it carries no data."""
+    event, data = "message", []
+    for line in lines:
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+    if not data:
+        return None
+    return {"event": event, "data": "\n".join(data)}
+
+
+class EditorStateMirror:
+    """
+    In-memory copy of the editor's tabs, active file and recent files.
+
+    The extension pushes a full snapshot over GET /events whenever tabs or
+    the active editor change, so while that channel is up tab queries and
+    tab-name lookups are answered here without a round-trip. When the
+    channel drops (or an older extension has no /events) `live` is False
+    and every read polls the extension as before, refreshing the copy with
+    what it returns, while the listener keeps reconnecting with backoff.
+
+    There is one mirror per extension server (VS Code window).
+    """
+
+    def __init__(self, server: str = VSCODE_SERVER):
+        self.server = server
+        self.tabs: List[Dict] = []
+        self.recent_files: List[Dict] = []
+        self.active_path: Optional[str] = None
+        self.version: Optional[int] = None
+        self.live = False
+        self.updated_at: Optional[float] = None
+        self.connects = 0
+        self.snapshots = 0
+        self.polls = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def apply(self, state: Dict):
+        """Replace the copy with a snapshot from the extension."""
+        self.tabs = state.get("tabs", [])
+        self.recent_files = state.get("recentFiles", [])
+        self.active_path = state.get("activePath")
+        self.version = state.get("version")
+        self.updated_at = time.time()
+        self.snapshots += 1
+
+    async def _listen_once(self):
+        async with get_client(self.server).stream("GET", "/events", timeout=EVENTS_READ_TIMEOUT) as response:
+            if response.status_code != 200 or not response.headers.get("content-type", "").startswith("text/event-stream"):
+                raise httpx.HTTPStatusError("Extension has no event channel", request=response.request, response=response)
+            self.connects += 1
+            block: List[str] = []
+            async for line in response.aiter_lines():
+                if line:
+                    block.append(line)
+                    continue
+                event = parse_sse(block)
+                block = []
+                if event is not None and event["event"] == "state":
+                    self.apply(json.loads(event["data"]))
+                    self.live = True
+
+    async def _listen(self):
+        failures = 0
+        while True:
+            try:
+                await self._listen_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                self.last_error = str(e) or type(e).__name__
+            self.live = False
+            await asyncio.sleep(min(EVENTS_RETRY_INTERVAL * 2 ** max(failures - 1, 0), EVENTS_MAX_BACKOFF))
+
+    @property
+    def listening(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.live = False
+
+    async def list_open_tabs(self) -> Dict:
+        """Same result as the extension's listOpenTabs, from the copy while it is live."""
+        if self.live:
+            return {"status": "success", "command": "listopentabs", "tabs": list(self.tabs)}
+        self.polls += 1
+        with routed_to(self.server):
+            result = await forward_to_vscode("listOpenTabs")
+        if result.get("status") == "success":
+            self.tabs = result.get("tabs", [])
+        return result
+
+    async def get_recent_files(self) -> Dict:
+        """Same result as the extension's recentFiles, from the copy while it is live."""
+        if self.live:
+            return {"status": "success", "command": "recentfiles", "files": list(self.recent_files)}
+        self.polls += 1
+        with routed_to(self.server):
+            result = await forward_to_vscode("recentFiles")
+        if result.get("status") == "success":
+            self.recent_files = result.get("files", [])
+        return result
+
+    @staticmethod
+    def resolve_tab(name: str, tabs: List[Dict]) -> Optional[Dict]:
+        """
+        The tab `name` refers to: an exact label first, then a
+        case-insensitive label, then a label without its extension.
+        """
+        wanted = name.strip().lower()
+        for matches in (
+            lambda tab: tab.get("label") == name,
+            lambda tab: tab.get("label", "").lower() == wanted,
+            lambda tab: os.path.splitext(tab.get("label", ""))[0].lower() == wanted,
+        ):
+            tab = next((tab for tab in tabs if matches(tab)), None)
+            if tab is not None:
+                return tab
+        return None
+
+    async def go_to_tab(self, name: str) -> Dict:
+        """
+        Switch to the tab `name` refers to. The name is resolved against the
+        copy, so the extension is only asked to switch to an exact label,
+        and a missing tab is reported without a round-trip.
+        """
+        if not name:
+            return {"status": "error", "command": "gototabname", "message": "Tab name must be provided"}
+        tabs = self.tabs if self.live else (await self.list_open_tabs()).get("tabs", [])
+        tab = self.resolve_tab(name, tabs)
+        if tab is None:
+            return {"status": "error", "command": "gototabname", "message": f"No tab found with name: {name}"}
+        with routed_to(self.server):
+            return await forward_to_vscode("goToTabName", {"name": tab["label"]})
+
+    def stats(self) -> Dict:
+        return {
+            "server": self.server,
+            "listening": self.listening,
+            "live": self.live,
+            "version": self.version,
+            "tabs": len(self.tabs),
+            "active_path": self.active_path,
+            "updated_at": self.updated_at,
+            "connects": self.connects,
+            "snapshots": self.snapshots,
+            "polls": self.polls,
+            "last_error": self.last_error,
+        }
+
+
+_mirrors: Dict[str, EditorStateMirror] = {}
+
+
+def get_editor_state(server: Optional[str] = None) -> EditorStateMirror:
+    """
+    The mirror of `server`, by default the one the current request is
+    routed to. A mirror that isn't listening (new, or stopped) starts right
+    away, so this must be called from the event loop.
+    """
+    server = server or current_server()
+    mirror = _mirrors.get(server)
+    if mirror is None:
+        mirror = _mirrors[server] = EditorStateMirror(server)
+    mirror.start()
+    return mirror
+
+
+async def stop_editor_states():
+    for mirror in list(_mirrors.values()):
+        await mirror.stop()
+
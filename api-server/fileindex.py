@@ -0,0 +1,359 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional, fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+from filesnapshot import FILE_INDEX_SNAPSHOT, FileSnapshot, snapshot_path
+from metrics import timed
+from scanner import IGNORE_FILES, DirectoryScanner, accepts_suffix
+from singleflight import SingleFlight
+
+WORKSPACE_DIR = os.getenv("WORKSPACE_DIR", "/Users/bread/Documents/vscodeproj/api-server")
+# File types indexed by default; '*' indexes every file
+DEFAULT_EXTENSIONS = [ext.strip() for ext in os.getenv("FILE_EXTENSIONS", "py,yml,md").split(",") if ext.strip()]
+POLL_INTERVAL = float(os.getenv("FILE_INDEX_POLL_INTERVAL", "2.0"))
+
+
+def path_hash(path: str) -> int:
+    """Stable 64-bit hash of a path (unlike hash(), not salted per process)."""
+    return int.from_bytes(hashlib.blake2b(path.encode(), digest_size=8).digest(), "big")
+
+
+def normalize_extensions(extensions: Iterable[str]) -> Set[str]:
+    """Turn ['py', '.MD'] into {'.py', '.md'}."""
+    return {f'.{ext.lower().strip(".")}' for ext in extensions}
+
+
+def walk_files(directory: str, extensions: Iterable[str] = DEFAULT_EXTENSIONS) -> List[str]:
+    """
+    Returns full paths for all files with specified extensions in a directory and its subdirectories,
+    skipping excluded and ignored directories (see scanner.DirectoryScanner).
+    """
+    with timed("file_walk"):
+        return DirectoryScanner(extensions).scan(directory)
+
+
+def iter_files(directory: str, extensions: Iterable[str] = DEFAULT_EXTENSIONS) -> Iterator[List[str]]:
+    """Like walk_files, but yields batches of paths while the walk is still going."""
+    return DirectoryScanner(extensions).iter_files(directory)
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Applies watchdog events to a FileIndex."""
+
+    def __init__(self, index: "FileIndex"):
+        super().__init__()
+        self.index = index
+
+    def on_created(self, event):
+        if event.is_directory:
+            self.index.add_many(self.index.walk(event.src_path))
+        elif self.index.is_ignore_file(event.src_path):
+            self.index.rules_changed()
+        else:
+            self.index.add(event.src_path)
+
+    def on_modified(self, event):
+        if event.is_directory:
+            return
+        if self.index.is_ignore_file(event.src_path):
+            self.index.rules_changed()
+        else:
+            self.index.modified(event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory and self.index.is_ignore_file(event.src_path):
+            self.index.rules_changed()
+        elif event.is_directory:
+            self.index.discard_tree(event.src_path)
+        else:
+            self.index.discard(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.index.discard_tree(event.src_path)
+            self.index.add_many(self.index.walk(event.dest_path))
+        elif self.index.is_ignore_file(event.src_path) or self.index.is_ignore_file(event.dest_path):
+            self.index.rules_changed()
+        else:
+            self.index.discard(event.src_path)
+            self.index.add(event.dest_path)
+
+
+class FileIndex:
+    """
+    Long-lived set of workspace file paths kept current by a filesystem watcher.
+
+    The tree is walked once on start(). After that, watchdog (inotify on Linux,
+    FSEvents on macOS) or a polling thread applies changes incrementally, and
+    every change bumps `generation` so callers can tell how fresh a result is.
+
+    Like the walk, the watcher leaves out files in excluded or ignored
+    directories; editing an ignore file rebuilds the index.
+
+    With a `snapshot_path` the file table is also kept on disk (see
+    filesnapshot.FileSnapshot): building after a restart, or in another
+    worker process, only stats the directories recorded there, and the
+    polling fallback revalidates the same way instead of walking.
+
+    `fingerprint` is an order-independent XOR of path hashes. Unlike
+    `generation` it only depends on which files exist, so it is the same
+    after a restart and can key results that are persisted to disk.
+
+    subscribe() registers a listener for the individual changes, including
+    edits to files already in the index, which don't change `generation`.
+    """
+
+    def __init__(self, directory: str, extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+                 poll_interval: float = POLL_INTERVAL, snapshot_path: Optional[str] = None):
+        self.directory = str(Path(directory).absolute())
+        self.extensions = sorted(normalize_extensions(extensions))
+        self.poll_interval = poll_interval
+        self.scanner = DirectoryScanner(self.extensions)
+        self.snapshot = FileSnapshot(snapshot_path, self.directory, self.scanner) if snapshot_path else None
+        self.generation = 0
+        self.fingerprint = 0
+        self.updated_at: Optional[float] = None
+        self.watcher: Optional[str] = None
+
+        self._paths: Set[str] = set()
+        self._snapshot: List[str] = []
+        self._snapshot_generation = -1
+        self._lock = threading.Lock()
+        self._observer = None
+        self._poll_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[Set[str], Set[str]], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._paths
+
+    def _accepts(self, path: str) -> bool:
+        return accepts_suffix(path, self.scanner.suffixes) and not self.scanner.ignored(path, self.directory)
+
+    def walk(self, directory: str) -> List[str]:
+        """Files under `directory`, a part of this index's tree, as the full walk would find them."""
+        return self.scanner.scan(directory, root=self.directory)
+
+    @staticmethod
+    def is_ignore_file(path: str) -> bool:
+        return os.path.basename(path) in IGNORE_FILES
+
+    def rules_changed(self):
+        """An ignore file changed: forget the cached rules and walk the tree again."""
+        self.scanner.forget_rules()
+        self.build()
+
+    def subscribe(self, listener: Callable[[Set[str], Set[str]], None]):
+        """
+        Call `listener(changed, removed)` after every change, from the
+        watcher's thread: paths added or written to, and paths gone. It must
+        be quick; hand real work to another thread.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, changed: Set[str], removed: Set[str]):
+        if changed or removed:
+            for listener in list(self._listeners):
+                listener(changed, removed)
+
+    def _touch(self):
+        self.generation += 1
+        self.updated_at = time.time()
+
+    def build(self):
+        """
+        Walk the whole tree, or revalidate the snapshot, and replace the
+        current contents. Without a snapshot, paths are hashed batch by
+        batch while the scanner's threads keep walking.
+        """
+        if self.snapshot is not None:
+            with timed("file_walk"):
+                paths = self.snapshot.sync()
+            self._replace(set(paths))
+            return
+        paths: Set[str] = set()
+        fingerprint = 0
+        with timed("file_walk"):
+            for batch in self.scanner.iter_files(self.directory):
+                paths.update(batch)
+                for path in batch:
+                    fingerprint ^= path_hash(path)
+        self._replace(paths, fingerprint)
+
+    def _replace(self, paths: Set[str], fingerprint: Optional[int] = None):
+        if fingerprint is None:
+            fingerprint = 0
+            for path in paths:
+                fingerprint ^= path_hash(path)
+        with self._lock:
+            added, removed = paths - self._paths, self._paths - paths
+            self._paths = paths
+            self.fingerprint = fingerprint
+            self._touch()
+        self._notify(added, removed)
+
+    def add(self, path: str):
+        self.add_many([path])
+
+    def add_many(self, paths: Iterable[str]):
+        accepted = {str(Path(p).absolute()) for p in paths if self._accepts(p)}
+        with self._lock:
+            new = accepted - self._paths
+            if new:
+                self._paths |= new
+                for p in new:
+                    self.fingerprint ^= path_hash(p)
+                self._touch()
+        # Files already known were replaced, e.g. by an editor's atomic save
+        self._notify(accepted, set())
+
+    def modified(self, path: str):
+        """A file's contents changed; only listeners care."""
+        path = str(Path(path).absolute())
+        if path in self._paths:
+            self._notify({path}, set())
+
+    def discard(self, path: str):
+        path = str(Path(path).absolute())
+        with self._lock:
+            if path not in self._paths:
+                return
+            self._paths.discard(path)
+            self.fingerprint ^= path_hash(path)
+            self._touch()
+        self._notify(set(), {path})
+
+    def discard_tree(self, directory: str):
+        prefix = str(Path(directory).absolute()).rstrip(os.sep) + os.sep
+        with self._lock:
+            gone = {p for p in self._paths if p.startswith(prefix)}
+            if gone:
+                self._paths -= gone
+                for p in gone:
+                    self.fingerprint ^= path_hash(p)
+                self._touch()
+        self._notify(set(), gone)
+
+    def paths(self) -> List[str]:
+        """
+        Current file list. The list is only rebuilt when the generation has
+        changed, so repeated lookups between filesystem changes are O(1).
+        """
+        if self._snapshot_generation != self.generation:
+            with self._lock:
+                self._snapshot = sorted(self._paths)
+                self._snapshot_generation = self.generation
+        return self._snapshot
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "files": len(self._paths),
+            "generation": self.generation,
+            "fingerprint": f"{self.fingerprint:016x}",
+            "updated_at": self.updated_at,
+            "watcher": self.watcher,
+            "snapshot": self.snapshot.stats() if self.snapshot is not None else None,
+        }
+
+    def start(self) -> "FileIndex":
+        """Build the index and start watching for changes."""
+        self.build()
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_IndexEventHandler(self), self.directory, recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+                self.watcher = "watchdog"
+                return self
+            except OSError as e:
+                # e.g. inotify watch limit reached on a very large tree
+                print(f"File watcher unavailable, falling back to polling: {str(e)}")
+                self._observer = None
+
+        self._stop.clear()
+        self._poll_thread = threading.Thread(target=self._poll, name="file-index-poll", daemon=True)
+        self._poll_thread.start()
+        self.watcher = "polling"
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._poll_thread is not None:
+            self._poll_thread.join(timeout=5)
+            self._poll_thread = None
+        self.watcher = None
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            if self.snapshot is not None:
+                paths = self.snapshot.sync(reload=False)
+                if paths is None:
+                    continue
+                current = set(paths)
+            else:
+                current = set(self.scanner.scan(self.directory))
+            if current != self._paths:
+                self._replace(current)
+
+
+_indexes: Dict[tuple, FileIndex] = {}
+_indexes_lock = threading.Lock()
+_index_builds = SingleFlight("file_index", copy_results=False)
+
+
+def get_file_index(directory: str, extensions: Iterable[str] = DEFAULT_EXTENSIONS) -> FileIndex:
+    """
+    Returns the shared index for a directory and set of extensions,
+    building it and starting its watcher on first use.
+    """
+    key = (str(Path(directory).absolute()), tuple(sorted(normalize_extensions(extensions))))
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is not None:
+        return index
+    # Different workspaces are walked concurrently; callers wanting the same
+    # one share a single walk
+    return _index_builds.run_sync(key, lambda: _build_index(key))
+
+
+def _build_index(key: Tuple[str, Tuple[str, ...]]) -> FileIndex:
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is not None:
+        return index
+    path = snapshot_path(*key) if FILE_INDEX_SNAPSHOT else None
+    index = FileIndex(key[0], key[1], snapshot_path=path).start()
+    with _indexes_lock:
+        existing = _indexes.setdefault(key, index)
+    if existing is not index:
+        index.stop()
+    return existing
+
+
+def stop_file_indexes():
+    """Stop every watcher started through get_file_index."""
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.stop()
+        _indexes.clear()
@@ -0,0 +1,209 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+# Scores per matching tier. A file's score is the best tier it reaches.
+EXACT_SCORE = 1.0
+CASE_INSENSITIVE_SCORE = 0.97
+STEM_SCORE = 0.92
+STEM_EXTENSION_PENALTY = 0.15
+PHONETIC_SCORE = 0.9
+TOKEN_SCORE = 0.75
+SUBSEQUENCE_SCORE = 0.6
+EDIT_SCORE = 0.8
+
+# A local match is trusted when it scores at least this much and beats the
+# runner-up by CONFIDENT_MARGIN; otherwise only the shortlist goes to the LLM.
+CONFIDENT_SCORE = 0.85
+CONFIDENT_MARGIN = 0.1
+SHORTLIST_SIZE = 20
+# Below this nothing matched lexically, so a shortlist would only mislead.
+SHORTLIST_MIN_SCORE = 0.3
+
+FILLER_WORDS = {"open", "the", "a", "an", "please", "show", "me", "go", "to", "up"}
+# Words that only say what kind of thing is meant ("open the config file");
+# dropped at either end of a query, never from its middle or as its only word
+CARRIER_WORDS = {"file"}
+SPOKEN_SYMBOLS = {"dot": ".", "underscore": "_", "dash": "-", "hyphen": "-", "slash": "/"}
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_query(search_term: str) -> str:
+    """
+    Lower-case a spoken search term, drop filler words and turn spoken
+    symbols into characters: "open app dot pi file" -> "app.pi". A leading
+    carrier word only goes when filler introduced it ("open the file
+    config" -> "config", but "file search" stays).
+    """
+    spoken = [SPOKEN_SYMBOLS.get(w, w) for w in re.findall(r"[\w.\-/]+", search_term.lower())]
+    words = [w for w in spoken if w not in FILLER_WORDS]
+    if len(words) > 1 and words[-1] in CARRIER_WORDS:
+        words.pop()
+    if len(words) > 1 and words[0] in CARRIER_WORDS and spoken[0] != words[0]:
+        words.pop(0)
+    query = " ".join(words)
+    return re.sub(r"\s*([._\-/])\s*", r"\1", query).strip(" ./")
+
+
+@lru_cache(maxsize=4096)
+def phonetic_key(text: str) -> str:
+    """Untruncated Soundex over the letters and digits of `text`."""
+    text = re.sub(r"[^a-z0-9]", "", text.lower())
+    if not text:
+        return ""
+    key = [text[0]]
+    last = SOUNDEX_CODES.get(text[0], "")
+    for char in text[1:]:
+        code = SOUNDEX_CODES.get(char, char if char.isdigit() else "")
+        if code and code != last:
+            key.append(code)
+        if char not in "hw":
+            last = code
+    return "".join(key)
+
+
+def is_subsequence(needle: str, haystack: str) -> bool:
+    chars = iter(haystack)
+    return all(char in chars for char in needle)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up early once it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+SEPARATORS = re.compile(r"[\s._\-/]+")
+
+
+def _split_name(name: str) -> Tuple[str, str]:
+    """("app", ".py") for "app.py", without the cost of building a Path."""
+    stem, dot, extension = name.rpartition(".")
+    return (stem, dot + extension) if stem else (name, "")
+
+
+@lru_cache(maxsize=1 << 17)
+def _name_features(name: str) -> Tuple[str, str, str, Set[str]]:
+    """Lower-cased name, stem, compact stem and stem tokens, cached per filename."""
+    lower = name.lower()
+    stem = _split_name(lower)[0]
+    return lower, stem, SEPARATORS.sub("", stem), set(SEPARATORS.split(stem)) - {""}
+
+
+@lru_cache(maxsize=256)
+def _query_features(query: str) -> Tuple[str, str, str, Set[str], int, str]:
+    """Stem, extension, compact stem, tokens, edit limit and phonetic key of a query."""
+    stem, extension = _split_name(query)
+    compact = SEPARATORS.sub("", stem)
+    tokens = set(SEPARATORS.split(stem)) - {""}
+    return stem, extension, compact, tokens, max(1, len(compact) // 4), phonetic_key(query)
+
+
+def score_name(query: str, name: str) -> Optional[Dict]:
+    """
+    Score one filename against a normalized query.
+
+    Returns:
+        Optional[Dict]: {"score", "tier"} for the best tier reached, or None
+    """
+    if name == query:
+        return {"score": EXACT_SCORE, "tier": "exact"}
+    lower, stem, compact_stem, name_tokens = _name_features(name)
+    if lower == query:
+        return {"score": CASE_INSENSITIVE_SCORE, "tier": "case-insensitive"}
+
+    _, query_extension, compact_query, query_tokens, limit, query_key = _query_features(query)
+    # Cheap length filter: nothing below can score for wildly different lengths
+    # unless the query is a subsequence or shares a token.
+    if len(compact_stem) + limit < len(compact_query) and not name_tokens & query_tokens:
+        return None
+
+    # With an extension in the query, "app.pi" should sound like "app.py"
+    # rather than merely share a stem with "app.md".
+    if compact_query == compact_stem:
+        if not query_extension:
+            return {"score": STEM_SCORE, "tier": "stem"}
+        if query_key == phonetic_key(lower):
+            return {"score": PHONETIC_SCORE, "tier": "phonetic"}
+        return {"score": STEM_SCORE - STEM_EXTENSION_PENALTY, "tier": "stem"}
+
+    # Soundex alone is coarse, so a phonetic hit also needs close spelling.
+    # Both tiers assume the first letter was heard right, which keeps the
+    # edit-distance work off most of a large tree.
+    if compact_query[:1] == compact_stem[:1]:
+        distance = edit_distance(compact_query, compact_stem, limit)
+    else:
+        distance = limit + 1
+    phonetic_target = lower if query_extension else stem
+    if distance <= limit and query_key and query_key == phonetic_key(phonetic_target):
+        return {"score": PHONETIC_SCORE, "tier": "phonetic"}
+
+    best = None
+    if distance <= limit:
+        best = {"score": EDIT_SCORE - 0.1 * distance, "tier": "edit-distance"}
+
+    if query_tokens and name_tokens:
+        overlap = len(query_tokens & name_tokens) / len(query_tokens | name_tokens)
+        if overlap and (best is None or TOKEN_SCORE * overlap > best["score"]):
+            best = {"score": TOKEN_SCORE * overlap, "tier": "token"}
+
+    if compact_query and len(compact_query) <= len(compact_stem) and is_subsequence(compact_query, compact_stem):
+        score = SUBSEQUENCE_SCORE * len(compact_query) / len(compact_stem)
+        if best is None or score > best["score"]:
+            best = {"score": score, "tier": "subsequence"}
+    return best
+
+
+def rank_files(search_term: str, file_paths: List[str], limit: int = SHORTLIST_SIZE) -> List[Dict]:
+    """
+    Rank files by how well their names match a spoken search term.
+
+    Files sharing a basename are collapsed into one candidate that keeps the
+    first path, the same choice find_closest_file has always made.
+
+    Returns:
+        List[Dict]: Up to `limit` candidates with name, full_path, score and tier
+    """
+    query = normalize_query(search_term)
+    if not query:
+        return []
+
+    candidates = {}
+    for path in file_paths:
+        name = path.rpartition(os.sep)[2]
+        if name in candidates:
+            continue
+        match = score_name(query, name)
+        if match:
+            candidates[name] = {"name": name, "full_path": path, **match}
+
+    ranked = sorted(candidates.values(), key=lambda c: (-c["score"], len(c["name"]), c["name"]))
+    return ranked[:limit]
+
+
+def confident_match(candidates: List[Dict]) -> Optional[Dict]:
+    """The top candidate if it clearly beats the rest, else None."""
+    if not candidates or candidates[0]["score"] < CONFIDENT_SCORE:
+        return None
+    if len(candidates) > 1 and candidates[0]["score"] - candidates[1]["score"] < CONFIDENT_MARGIN:
+        return None
+    return candidates[0]
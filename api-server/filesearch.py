@@ -1,77 +1,435 @@
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 import json
-from openai import OpenAI
+from fileindex import DEFAULT_EXTENSIONS, FileIndex, get_file_index, walk_files
+from filematch import SHORTLIST_MIN_SCORE, SHORTLIST_SIZE, confident_match, normalize_query, rank_files
+from contentindex import get_content_index
+from metrics import timed
+from modeltiers import (CHARS_PER_TOKEN, ESCALATE_BELOW_SCORE, FILE_MATCH_MAX_PROMPT_TOKENS, MODEL_TIERS,
+                        candidates_tier, estimate_tokens, model_call, tier_of, tier_stats)
+from singleflight import SingleFlight
+from pathvectors import PathVectorIndex, get_path_vector_index
 
-def get_file_paths(directory: str, extensions: List[str] = ['py', 'yml', 'md']) -> List[str]:
+SEARCH_CACHE_SIZE = int(os.getenv("FILESEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("FILESEARCH_CACHE_TTL", "86400"))
+SEARCH_CACHE_PATH = os.getenv("FILESEARCH_CACHE_PATH")
+# Changes are written to SEARCH_CACHE_PATH this long after the first one, off the request path
+SEARCH_CACHE_SAVE_DELAY = float(os.getenv("FILESEARCH_CACHE_SAVE_DELAY", "2.0"))
+
+
+class SearchCache:
+    """
+    Bounded LRU cache of llm_file_search results with a per-entry TTL.
+
+    Keys are (workspace root, normalized search term, file-set fingerprint),
+    so any file being added, deleted or renamed in the workspace retires the
+    old entries. A hit whose matched file has since left the index is
+    dropped as well. When `path` is set the cache is loaded from and written
+    back to that JSON file so it survives restarts. Writes are batched: a
+    timer thread saves `save_delay` seconds after the first change, and
+    flush() saves whatever is still pending (e.g. at shutdown).
+    """
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL,
+                 path: Optional[str] = SEARCH_CACHE_PATH, save_delay: float = SEARCH_CACHE_SAVE_DELAY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_delay = save_delay
+        self.saves = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(directory: str, search_term: str, fingerprint: int) -> Tuple[str, str, str]:
+        return (str(Path(directory).absolute()), normalize_query(search_term), f"{fingerprint:016x}")
+
+    def get(self, key: Tuple[str, str, str], known_paths=None) -> Optional[Dict]:
+        """
+        Cached result for `key`, or None. `known_paths` is anything supporting
+        `in` (e.g. a FileIndex); a result whose file is no longer in it is
+        invalidated instead of returned.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if time.time() - stored_at > self.ttl:
+                    del self._entries[key]
+                    entry = None
+                elif known_paths is not None and result.get("full_path") not in known_paths:
+                    del self._entries[key]
+                    self.invalidations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key: Tuple[str, str, str], result: Dict):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        self._changed()
+
+    def invalidate_path(self, full_path: str) -> int:
+        """Drop every entry that resolved to `full_path`. Returns how many were dropped."""
+        with self._lock:
+            stale = [k for k, (_, result) in self._entries.items() if result.get("full_path") == full_path]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if stale:
+            self._changed()
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._changed()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "persisted_to": self.path,
+            "saves": self.saves,
+        }
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, stored_at, result in rows[-self.max_entries:]:
+            if now - stored_at <= self.ttl:
+                self._entries[tuple(key)] = (stored_at, result)
+
+    def _changed(self):
+        """Schedule a save, unless one is already pending."""
+        if not self.path:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes to `path` now."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self._save()
+
+    def _save(self):
+        with self._save_lock:
+            with self._lock:
+                rows = [[list(key), stored_at, result] for key, (stored_at, result) in self._entries.items()]
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(rows, f)
+                os.replace(tmp_path, self.path)
+                self.saves += 1
+            except OSError as e:
+                print(f"Error saving file search cache: {str(e)}")
+
+
+search_cache = SearchCache()
+# Identical searches in flight at once (retries, double-fired triggers) share one model call
+search_flights = SingleFlight("file_search")
+
+def get_file_paths(directory: str, extensions: List[str] = DEFAULT_EXTENSIONS) -> List[str]:
     """
     Returns full paths for all files with specified extensions in a directory and its subdirectories.
     """
-    extensions = [f'.{ext.lower().strip(".")}' for ext in extensions]
-    file_paths = []
-    root_dir = Path(directory)
-    
-    for root, _, files in os.walk(root_dir):
-        for file in files:
-            file_path = Path(root) / file
-            if file_path.suffix.lower() in extensions:
-                file_paths.append(str(file_path.absolute()))
-    
-    return file_paths
+    return walk_files(directory, extensions)
+
+SYSTEM_PROMPT = """You are a helpful assistant that finds the most semantically similar filename from a list.
+    Analyze the conceptual meaning of the search term and find the best matching filename.
+    Return only a JSON object with no additional text."""
 
-def find_closest_file(search_term: str, file_paths: List[str], api_key: str) -> Dict:
+
+@lru_cache(maxsize=8)
+def get_openai_client(api_key: str) -> "OpenAI":
     """
-    Uses GPT-4 to find the file name that most closely matches the search term.
-    
+    One client (and connection pool) per API key, reused across searches.
+    The SDK is imported here so importing filesearch stays cheap.
+    """
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+
+@lru_cache(maxsize=8)
+def get_async_openai_client(api_key: str) -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=api_key)
+
+
+def sync_path_vectors(index: FileIndex) -> Optional[PathVectorIndex]:
+    """The embedding index for `index`'s workspace, updated to its current files."""
+    vectors = get_path_vector_index(index.directory)
+    if vectors is not None:
+        vectors.sync(index.paths(), index.generation)
+    return vectors
+
+def semantic_shortlist(index: FileIndex, search_term: str) -> List[Dict]:
+    """Nearest filenames by embedding, or [] when the vector index is unavailable."""
+    with timed("path_vectors"):
+        vectors = sync_path_vectors(index)
+        return vectors.search(search_term, SHORTLIST_SIZE) if vectors is not None else []
+
+def content_shortlist(directory: str, search_term: str) -> List[Dict]:
+    """Files whose contents contain the words of the search term, each with a snippet."""
+    with timed("content_search"):
+        return get_content_index(directory).search(search_term)
+
+Lookup = Callable[[str], List[Dict]]
+
+def fit_names(file_names: List[str], max_tokens: int) -> List[str]:
+    """The leading names whose JSON list fits in `max_tokens`."""
+    budget = max_tokens * CHARS_PER_TOKEN
+    used = 2
+    for i, name in enumerate(file_names):
+        used += len(name) + 3
+        if used > budget:
+            return file_names[:i]
+    return file_names
+
+def build_match_request(search_term: str, file_paths: List[str], semantic: Optional[Lookup] = None,
+                        content: Optional[Lookup] = None) -> Tuple[Optional[Dict], Optional[Dict], List[Dict]]:
+    """
+    Rank filenames locally and decide whether the model is needed.
+
     Args:
-        search_term (str): The search term to match against
-        file_paths (List[str]): List of file paths to search through
-        api_key (str): OpenAI API key
-    
+        semantic: Optional lookup of the nearest filenames by meaning, only
+            called when the model is needed, to widen its shortlist
+        content: Optional lookup of files by what they contain ("the file
+            with the window switching AppleScript"), only called when the
+            model is needed; its matches are shown to the model as snippets
+
+    The request goes to the small model when the model is offered at most
+    SMALL_MAX_CANDIDATES names, otherwise to the large one. The name list is
+    cut to keep the prompt within FILE_MATCH_MAX_PROMPT_TOKENS.
+
     Returns:
-        Dict: JSON response containing the best match and similarity score
+        Tuple[Optional[Dict], Optional[Dict], List[Dict]]: (local result, None, [])
+        when a local candidate clearly wins, otherwise (None, chat completion
+        kwargs, content matches the model may pick from)
     """
-    
-    file_names = [Path(path).name for path in file_paths]
-    
-    system_prompt = """You are a helpful assistant that finds the most semantically similar filename from a list.
-    Analyze the conceptual meaning of the search term and find the best matching filename.
-    Return only a JSON object with no additional text."""
-    
-    user_prompt = f"""Given the search term "{search_term}", find the most semantically similar filename from this list:
-    {json.dumps(file_names, indent=2)}
-    
+    with timed("file_rank"):
+        candidates = rank_files(search_term, file_paths)
+    best = confident_match(candidates)
+    if best:
+        return {
+            "best_match": best["name"],
+            "similarity_score": best["score"],
+            "explanation": f"Local {best['tier']} match",
+            "full_path": best["full_path"],
+            "matched_by": "local",
+        }, None, []
+
+    shortlist = [c["name"] for c in candidates] if candidates and candidates[0]["score"] >= SHORTLIST_MIN_SCORE else []
+    if semantic is not None:
+        shortlist += [c["name"] for c in semantic(search_term)]
+    content_matches = content(search_term) if content is not None else []
+    shortlist += [c["name"] for c in content_matches]
+    if shortlist:
+        file_names = list(dict.fromkeys(shortlist))
+    else:
+        # Nothing resembles the term: every name, the closest ones first
+        file_names = list(dict.fromkeys([c["name"] for c in candidates] + [Path(path).name for path in file_paths]))
+
+    head = f"""Given the search term "{search_term}", find the most semantically similar filename from this list:
+    """
+    tail = ""
+    if content_matches:
+        snippets = [{"file": c["name"], "line": c["line"], "snippet": c["snippet"]} for c in content_matches]
+        tail += f"""
+    The search term may describe what the file contains. These files contain its words:
+    {json.dumps(snippets, separators=(",", ":"))}
+    """
+    tail += """
     Return a JSON object with:
-    {{
+    {
         "best_match": "filename",
         "similarity_score": 0.XX,
         "explanation": "brief reason for the match"
-    }}
+    }
     
     The similarity score should be between 0 and 1, where 1 is a perfect match."""
-    
-    client = OpenAI(api_key=api_key)
-    
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
+
+    offered = fit_names(file_names, FILE_MATCH_MAX_PROMPT_TOKENS - estimate_tokens(SYSTEM_PROMPT + head + tail))
+    if len(offered) < len(file_names):
+        tier_stats.truncated += 1
+    user_prompt = f"""{head}{json.dumps(offered, separators=(",", ":"))}
+    {tail}"""
+
+    return None, {
+        "model": MODEL_TIERS[candidates_tier(len(offered))],
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt}
         ],
-        response_format={ "type": "json_object" }
-    )
-    
+        "response_format": { "type": "json_object" },
+    }, content_matches
+
+def parse_match_response(response, file_paths: List[str], content_matches: List[Dict] = ()) -> Dict:
+    """Turn the model's JSON answer into a result with the matched full path."""
     result = json.loads(response.choices[0].message.content)
-    
-    matched_path = next((path for path in file_paths if Path(path).name == result["best_match"]), None)
+
+    matched_path = next((c["full_path"] for c in content_matches if c["name"] == result["best_match"]), None)
+    if matched_path is None:
+        matched_path = next((path for path in file_paths if Path(path).name == result["best_match"]), None)
     result["full_path"] = matched_path
+    result["matched_by"] = "llm"
     
     return result
 
+def checked_match(response, file_paths: List[str], content_matches: List[Dict], tier: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    (result, None) for an answer to keep, or (None, reason) when a small
+    model's answer is unusable or unsure and the large model should be asked.
+    """
+    try:
+        result = parse_match_response(response, file_paths, content_matches)
+    except (ValueError, KeyError, TypeError):
+        if tier != "small":
+            raise
+        return None, "invalid_answer"
+    if tier == "small":
+        if not result.get("full_path"):
+            return None, "unknown_file"
+        if (result.get("similarity_score") or 0.0) < ESCALATE_BELOW_SCORE:
+            return None, "low_confidence"
+    return result, None
+
+def escalated(request: Dict, reason: str) -> Dict:
+    tier_stats.escalate("file_match", reason)
+    return {**request, "model": MODEL_TIERS["large"]}
+
+def find_closest_file(search_term: str, file_paths: List[str], api_key: str,
+                      semantic: Optional[Lookup] = None, content: Optional[Lookup] = None) -> Dict:
+    """
+    Uses the model to find the file name that most closely matches the search term.
+
+    Filenames are ranked locally first. A clear local winner is returned
+    without calling the model; otherwise the model only sees the local,
+    semantic and content shortlists, or every filename that fits the prompt
+    budget when all are empty. An unsure or unusable answer from the small
+    model is asked again of the large one.
+
+    Args:
+        search_term (str): The search term to match against
+        file_paths (List[str]): List of file paths to search through
+        api_key (str): OpenAI API key
+        semantic: Optional nearest-filenames lookup, see build_match_request
+        content: Optional file-contents lookup, see build_match_request
+
+    Returns:
+        Dict: JSON response containing the best match and similarity score
+    """
+    local_result, request, content_matches = build_match_request(search_term, file_paths, semantic, content)
+    if local_result:
+        return local_result
+
+    while True:
+        tier = tier_of(request["model"])
+        with timed("llm_file_match"), model_call("file_match", tier) as call:
+            response = get_openai_client(api_key).chat.completions.create(**request)
+            call.usage = response.usage
+        result, reason = checked_match(response, file_paths, content_matches, tier)
+        if reason is None:
+            return result
+        request = escalated(request, reason)
+
+async def afind_closest_file(search_term: str, file_paths: List[str], api_key: str,
+                            semantic: Optional[Lookup] = None, content: Optional[Lookup] = None) -> Dict:
+    """
+    Async version of find_closest_file. Local ranking runs in a worker
+    thread and the model is called through a shared AsyncOpenAI client, so
+    the event loop keeps serving other requests meanwhile.
+    """
+    local_result, request, content_matches = await asyncio.to_thread(
+        build_match_request, search_term, file_paths, semantic, content)
+    if local_result:
+        return local_result
+
+    while True:
+        tier = tier_of(request["model"])
+        with timed("llm_file_match"), model_call("file_match", tier) as call:
+            response = await get_async_openai_client(api_key).chat.completions.create(**request)
+            call.usage = response.usage
+        result, reason = checked_match(response, file_paths, content_matches, tier)
+        if reason is None:
+            return result
+        request = escalated(request, reason)
+
+def _lookup_cached(index: FileIndex, directory: str, search_term: str) -> Tuple[Tuple, Optional[Dict]]:
+    cache_key = search_cache.make_key(directory, search_term, index.fingerprint)
+    cached = search_cache.get(cache_key, known_paths=index)
+    if cached is not None:
+        cached["cached"] = True
+    return cache_key, cached
+
+def _finish_search(result: Dict, index: FileIndex, cache_key: Tuple, files_searched: int) -> Dict:
+    result["files_searched"] = files_searched
+    result["index_generation"] = index.generation
+    if result.get("full_path"):
+        search_cache.put(cache_key, result)
+    return result
+
+NO_FILES_ERROR = {
+    "error": "No matching files found in directory",
+    "files_searched": 0
+}
+
 def llm_file_search(directory: str, search_term: str, api_key: str) -> Dict:
     """
     Main function to find files and match them against the search term.
+
+    File paths come from the shared, watcher-backed index for `directory`,
+    so only the first search for a workspace pays for a directory walk.
+    Successful matches are kept in `search_cache` until the file set changes,
+    and identical searches running at the same time share one match.
     
     Args:
         directory (str): Directory to search in
@@ -83,25 +441,72 @@ def llm_file_search(directory: str, search_term: str, api_key: str) -> Dict:
     """
     try:
         # Get all relevant files
-        file_paths = get_file_paths(directory)
+        index = get_file_index(directory)
+        cache_key, cached = _lookup_cached(index, directory, search_term)
+        if cached is not None:
+            return cached
+
+        file_paths = index.paths()
         
         if not file_paths:
-            return {
-                "error": "No matching files found in directory",
-                "files_searched": 0
-            }
-        
-        result = find_closest_file(search_term, file_paths, api_key)
-        result["files_searched"] = len(file_paths)
+            return dict(NO_FILES_ERROR)
         
-        return result
+        result = search_flights.run_sync(cache_key, lambda: find_closest_file(
+            search_term, file_paths, api_key, partial(semantic_shortlist, index), partial(content_shortlist, directory)))
+        return _finish_search(result, index, cache_key, len(file_paths))
         
     except Exception as e:
         return {
             "error": str(e),
             "files_searched": 0
         }
-        
+
+async def allm_file_search(directory: str, search_term: str, api_key: str) -> Dict:
+    """
+    Async version of llm_file_search for use from the event loop.
+
+    Building a workspace's index for the first time walks the tree in a
+    worker thread, and the model call goes through afind_closest_file, so
+    concurrent requests overlap instead of queuing behind the search.
+    """
+    try:
+        index = await asyncio.to_thread(get_file_index, directory)
+        cache_key, cached = _lookup_cached(index, directory, search_term)
+        if cached is not None:
+            return cached
+
+        file_paths = index.paths()
+
+        if not file_paths:
+            return dict(NO_FILES_ERROR)
+
+        result = await search_flights.run(cache_key, lambda: afind_closest_file(
+            search_term, file_paths, api_key, partial(semantic_shortlist, index), partial(content_shortlist, directory)))
+        return _finish_search(result, index, cache_key, len(file_paths))
+
+    except Exception as e:
+        return {
+            "error": str(e),
+            "files_searched": 0
+        }
+
+def best_search_result(results: List[Dict]) -> Dict:
+    """Of one search per workspace root: a local match over a model's guess, then the higher score."""
+    found = [r for r in results if r.get("full_path")]
+    if not found:
+        return next((r for r in results if "error" in r), results[0])
+    return max(found, key=lambda r: (r.get("matched_by") == "local", r.get("similarity_score") or 0.0))
+
+async def asearch_workspaces(directories: List[str], search_term: str, api_key: str) -> Dict:
+    """
+    allm_file_search over every root of a multi-root workspace at once,
+    each with its own index, keeping the best result.
+    """
+    if len(directories) == 1:
+        return await allm_file_search(directories[0], search_term, api_key)
+    results = await asyncio.gather(*(allm_file_search(d, search_term, api_key) for d in directories))
+    return best_search_result(list(results))
+
 if __name__ == "__main__":
     api_key = os.getenv("OPENAI_API_KEY")
 
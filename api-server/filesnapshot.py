@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from scanner import DirectoryScanner, Listing, ignore_signature
+
+FILE_INDEX_DIR = os.getenv("FILE_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fixflow", "files"))
+# Set to 0 to walk every workspace from scratch on startup
+FILE_INDEX_SNAPSHOT = os.getenv("FILE_INDEX_SNAPSHOT", "1") != "0"
+# Directory mtimes are coarse (a clock tick, not a nanosecond), so a directory
+# changed this recently when it was listed is listed again on the next sync
+RACY_WINDOW_NS = 2_000_000_000
+SCHEMA_VERSION = 2
+REPO_EXCLUDE = os.path.join(".git", "info", "exclude")
+
+
+def snapshot_path(directory: str, extensions: Iterable[str]) -> str:
+    key = f"{directory}|{','.join(sorted(extensions))}"
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    return os.path.join(FILE_INDEX_DIR, f"{digest}.sqlite")
+
+
+class FileSnapshot:
+    """
+    A workspace's file table persisted in SQLite, so a restart, a reload or
+    another uvicorn worker starts from it instead of walking the tree.
+
+    There is one row per directory the scanner entered: its mtime, a
+    signature of its ignore files and the names of its matching files in
+    one NUL-separated column, which keeps the table small and reading it
+    back a matter of a few hundred rows. sync() revalidates by
+    stat'ing those directories instead of listing them: only directories
+    whose mtime moved (an entry was added, removed or renamed) or whose
+    ignore files changed are walked again, each with its subtree.
+
+    Processes share the file: WAL mode lets them read it concurrently, and
+    an update takes the write lock first and then re-checks, so when
+    several workers start together one of them walks and the others only
+    revalidate what it wrote.
+    """
+
+    def __init__(self, path: str, root: str, scanner: DirectoryScanner):
+        self.path = path
+        self.root = root
+        self.scanner = scanner
+        self.syncs = 0
+        self.last_sync: Dict = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=120)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                ignore_sig TEXT NOT NULL,
+                names TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+
+    def _config(self) -> str:
+        """What the stored table depends on besides the tree; a change means starting over."""
+        return json.dumps({
+            "schema": SCHEMA_VERSION,
+            "root": self.root,
+            "suffixes": sorted(self.scanner.suffixes),
+            "exclude": sorted(self.scanner.exclude),
+            "ignore_files": self.scanner.ignore_files,
+            "repo_exclude": ignore_signature(self.root, [REPO_EXCLUDE]),
+        }, sort_keys=True)
+
+    def _stale(self, config: str) -> Optional[List[str]]:
+        """Outermost directories to walk again, or None when the whole table must be rebuilt."""
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        if row is None or row[0] != config:
+            return None
+        changed = []
+        for path, mtime_ns, ignore_sig in self._db.execute("SELECT path, mtime_ns, ignore_sig FROM dirs ORDER BY path"):
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime_ns or (ignore_sig and ignore_signature(path, self.scanner.ignore_files) != ignore_sig):
+                changed.append(path)
+        # ORDER BY path puts a directory right before its subtree
+        outermost: List[str] = []
+        for path in changed:
+            if not outermost or not path.startswith(outermost[-1] + os.sep):
+                outermost.append(path)
+        return outermost
+
+    def _delete_tree(self, directory: str):
+        prefix, end = directory + os.sep, directory + chr(ord(os.sep) + 1)
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (directory, prefix, end))
+
+    def _write(self, listings: Iterable[Listing]) -> int:
+        count = 0
+        for listing in listings:
+            # Recorded as unknown so the next sync lists it again; see RACY_WINDOW_NS
+            racy = time.time_ns() - listing.mtime_ns < RACY_WINDOW_NS
+            names = "\0".join(path[len(listing.directory) + 1:] for path in listing.files)
+            self._db.execute("INSERT OR REPLACE INTO dirs (path, mtime_ns, ignore_sig, names) VALUES (?, ?, ?, ?)",
+                             (listing.directory, -1 if racy else listing.mtime_ns, listing.ignore_sig, names))
+            count += 1
+        return count
+
+    def sync(self, reload: bool = True) -> Optional[List[str]]:
+        """
+        Bring the snapshot up to date with the tree and return its files.
+
+        Args:
+            reload (bool): When False and nothing changed, return None
+                instead of reading the file list back
+
+        Returns:
+            Optional[List[str]]: Absolute paths of the workspace's files
+        """
+        with self._lock:
+            started = time.perf_counter()
+            config = self._config()
+            stale = self._stale(config)
+            rebuilt, listed = False, 0
+            if stale is None or stale:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    # Another process may have brought it up to date while we waited for the lock
+                    stale = self._stale(config)
+                    rebuilt = stale is None
+                    self.scanner.forget_rules()
+                    if rebuilt:
+                        self._db.execute("DELETE FROM dirs")
+                        listed = self._write(self.scanner.iter_listings(self.root))
+                        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('config', ?)", (config,))
+                    else:
+                        for directory in stale:
+                            self._delete_tree(directory)
+                            listed += self._write(self.scanner.iter_listings(directory, root=self.root))
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            elif not reload:
+                return None
+            paths = []
+            for directory, names in self._db.execute("SELECT path, names FROM dirs WHERE names != ''"):
+                prefix = directory + os.sep
+                paths += [prefix + name for name in names.split("\0")]
+            self.syncs += 1
+            self.last_sync = {
+                "rebuilt": rebuilt,
+                "directories_listed": listed,
+                "files": len(paths),
+                "ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            return paths
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "syncs": self.syncs, "last_sync": self.last_sync}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
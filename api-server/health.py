@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from vscode_client import VSCODE_SERVER, current_server, get_client, timeout_for
+
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "5"))
+HEARTBEAT_MAX_BACKOFF = float(os.getenv("HEARTBEAT_MAX_BACKOFF", "30"))
+# Consecutive failed probes/commands before commands start failing fast
+FAILURE_THRESHOLD = int(os.getenv("HEARTBEAT_FAILURE_THRESHOLD", "2"))
+
+EXTENSION_DOWN_DETAIL = "VS Code extension not running. Please start the extension in VS Code first (press F5 in the extension project)"
+
+# Errors meaning nothing is listening, as opposed to a slow command
+UNREACHABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class ExtensionHealth:
+    """
+    Cached connection state of the VS Code extension.
+
+    A background heartbeat probes the extension every HEARTBEAT_INTERVAL
+    seconds while it is up and backs off exponentially while it is down.
+    Command results feed the same state, so a dead extension is noticed on
+    the first failed command as well. Once FAILURE_THRESHOLD failures pile
+    up the circuit opens and allow_request() returns False until the next
+    probe succeeds or the backoff period elapses, at which point a single
+    trial request is let through.
+
+    There is one instance per extension server; only the default server's
+    runs a heartbeat, the others follow command results alone.
+    """
+
+    def __init__(self, server: str = VSCODE_SERVER):
+        self.server = server
+        self.state = "unknown"
+        self.consecutive_failures = 0
+        self.last_checked: Optional[float] = None
+        self.last_connected: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.circuit_open_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backoff(self) -> float:
+        if self.consecutive_failures == 0:
+            return HEARTBEAT_INTERVAL
+        return min(HEARTBEAT_INTERVAL * 2 ** (self.consecutive_failures - 1), HEARTBEAT_MAX_BACKOFF)
+
+    @property
+    def circuit_open(self) -> bool:
+        return self.consecutive_failures >= FAILURE_THRESHOLD
+
+    def known_down(self) -> bool:
+        """True while the circuit is open and not yet due for a trial request."""
+        return self.circuit_open and time.monotonic() < self.circuit_open_until
+
+    def allow_request(self) -> bool:
+        """False while the extension is known to be down."""
+        if not self.circuit_open:
+            return True
+        now = time.monotonic()
+        if now >= self.circuit_open_until:
+            # Half-open: let this request probe, hold the rest back
+            self.circuit_open_until = now + self.backoff
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "connected"
+        self.consecutive_failures = 0
+        self.last_checked = self.last_connected = time.time()
+        self.last_error = None
+        self.circuit_open_until = 0.0
+
+    def record_failure(self, error: Exception):
+        self.state = "disconnected"
+        self.consecutive_failures += 1
+        self.last_checked = time.time()
+        self.last_error = str(error) or type(error).__name__
+        if self.circuit_open:
+            self.circuit_open_until = time.monotonic() + self.backoff
+
+    async def probe(self) -> bool:
+        """Ping the extension once and update the state."""
+        try:
+            # Any HTTP answer, even the 500 for an unknown command, means it is up
+            await get_client(self.server).get("/", timeout=timeout_for("status"))
+        except httpx.RequestError as e:
+            self.record_failure(e)
+            return False
+        self.record_success()
+        return True
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.backoff)
+            await self.probe()
+
+    async def start(self):
+        """Probe once so the state is known before serving, then keep probing."""
+        if self._task is None or self._task.done():
+            await self.probe()
+            self._task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        connected = self.state == "connected"
+        return {
+            "status": "connected" if connected else "disconnected",
+            "message": "VS Code extension is running" if connected else "VS Code extension is not running",
+            "state": self.state,
+            "last_checked": self.last_checked,
+            "last_connected": self.last_connected,
+            "consecutive_failures": self.consecutive_failures,
+            "circuit_open": self.circuit_open,
+            "last_error": self.last_error,
+        }
+
+
+_healths: Dict[str, ExtensionHealth] = {}
+
+
+def health_for(server: Optional[str] = None) -> ExtensionHealth:
+    """Connection state of `server`, by default the one the current request is routed to."""
+    server = server or current_server()
+    health = _healths.get(server)
+    if health is None:
+        health = _healths[server] = ExtensionHealth(server)
+    return health
+
+
+extension_health = health_for(VSCODE_SERVER)
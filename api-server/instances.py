@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from fileindex import WORKSPACE_DIR
+from vscode_client import VSCODE_SERVER, set_server
+
+# Each running extension keeps <pid>.json here with its port and workspace roots
+INSTANCES_DIR = os.getenv("FIXFLOW_INSTANCES_DIR", os.path.join(os.path.expanduser("~"), ".fixflow", "instances"))
+
+
+class ExtensionInstance:
+    """One VS Code window running the extension."""
+
+    def __init__(self, server: str, name: str, roots: List[str], pid: Optional[int] = None,
+                 focused_at: float = 0.0):
+        self.server = server
+        self.name = name
+        self.roots = roots
+        self.pid = pid
+        self.focused_at = focused_at
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "ExtensionInstance":
+        return cls(
+            server=f"http://localhost:{int(record['port'])}",
+            name=record.get("name") or "",
+            roots=[os.path.abspath(root) for root in record.get("roots") or []],
+            pid=record.get("pid"),
+            focused_at=float(record.get("focusedAt") or 0.0),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "server": self.server,
+            "roots": self.roots,
+            "pid": self.pid,
+            "focused_at": self.focused_at,
+        }
+
+
+# Used when no extension has registered itself, e.g. an older build
+DEFAULT_INSTANCE = ExtensionInstance(VSCODE_SERVER, "default", [os.path.abspath(WORKSPACE_DIR)])
+
+
+def pid_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class InstanceRegistry:
+    """
+    The extension instances (VS Code windows) currently running.
+
+    Every instance writes a small JSON record to `directory` and rewrites it
+    (via rename) when its workspace folders or focus change, so the
+    directory's mtime moves whenever anything changes. Lookups stat the
+    directory and only re-read the records then; records of processes that
+    have exited are ignored. Windows are found by name through a dict and by
+    file path through a dict of roots, walking up the path's parents, so
+    lookups don't slow down as more windows are opened.
+    """
+
+    def __init__(self, directory: str = INSTANCES_DIR):
+        self.directory = directory
+        self._mtime_ns: Optional[int] = None
+        self._instances: List[ExtensionInstance] = []
+        self._by_name: Dict[str, ExtensionInstance] = {}
+        self._by_root: Dict[str, ExtensionInstance] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            instances = []
+            for entry in os.scandir(self.directory) if mtime_ns is not None else ():
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path) as f:
+                        instance = ExtensionInstance.from_record(json.load(f))
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+                if pid_alive(instance.pid):
+                    instances.append(instance)
+            # Most recently focused first, so it wins name and root clashes
+            instances.sort(key=lambda instance: instance.focused_at, reverse=True)
+            by_name: Dict[str, ExtensionInstance] = {}
+            by_root: Dict[str, ExtensionInstance] = {}
+            # A window's own name or port beats another window's folder name
+            for instance in instances:
+                by_name.setdefault(instance.name.lower(), instance)
+                by_name.setdefault(instance.server.rsplit(":", 1)[1], instance)
+            for instance in instances:
+                for root in instance.roots:
+                    by_root.setdefault(root, instance)
+                    by_name.setdefault(os.path.basename(root).lower(), instance)
+            self._instances, self._by_name, self._by_root = instances, by_name, by_root
+            self._mtime_ns = mtime_ns
+
+    def instances(self) -> List[ExtensionInstance]:
+        """Registered instances, most recently focused first; just the default one if none are."""
+        self.refresh()
+        return list(self._instances) or [DEFAULT_INSTANCE]
+
+    def focused(self) -> ExtensionInstance:
+        return self.instances()[0]
+
+    def find(self, window: str) -> Optional[ExtensionInstance]:
+        """The instance called `window`: a workspace name, root folder name or path, or port."""
+        self.refresh()
+        if not self._instances:
+            return DEFAULT_INSTANCE if window.lower() == DEFAULT_INSTANCE.name else None
+        instance = self._by_name.get(window.strip().lower())
+        if instance is None and os.sep in window:
+            instance = self.for_path(window)
+        return instance
+
+    def for_path(self, path: str) -> Optional[ExtensionInstance]:
+        """The instance whose workspace contains `path`, the innermost root winning."""
+        self.refresh()
+        path = os.path.abspath(path)
+        while True:
+            instance = self._by_root.get(path)
+            if instance is not None:
+                return instance
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    def roots(self) -> List[str]:
+        """Every workspace root of every instance."""
+        return list(dict.fromkeys(root for instance in self.instances() for root in instance.roots))
+
+    def select(self, window: Optional[str] = None) -> ExtensionInstance:
+        """
+        The instance a request should go to: `window` when given, otherwise
+        the most recently focused one.
+
+        Raises:
+            HTTPException: 404 when no instance matches `window`
+        """
+        if not window:
+            return self.focused()
+        instance = self.find(window)
+        if instance is None:
+            raise HTTPException(status_code=404, detail=f"No VS Code window matches '{window}'")
+        return instance
+
+
+instance_registry = InstanceRegistry()
+
+# Instance the current request is routed to
+_instance: ContextVar[ExtensionInstance] = ContextVar("extension_instance", default=DEFAULT_INSTANCE)
+
+
+def current_instance() -> ExtensionInstance:
+    return _instance.get()
+
+
+def use_instance(instance: ExtensionInstance):
+    """Send the rest of the current request's commands to `instance`, searching its roots."""
+    _instance.set(instance)
+    set_server(instance.server)
+
+
+async def route_to_window(window: Optional[str] = None):
+    """
+    FastAPI dependency adding an optional `window` query parameter to every
+    endpoint: extension commands go to that window, or to the most recently
+    focused one without it. Declared async so it runs in the request's own
+    context and the routing is visible to the endpoint.
+    """
+    use_instance(instance_registry.select(window))
@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import Counter, Histogram
+
+# Cheap model for simple commands and short candidate lists, large one for the rest
+SMALL_MODEL = os.getenv("SMALL_MODEL", "gpt-4o-mini")
+LARGE_MODEL = os.getenv("LARGE_MODEL", "gpt-4o")
+MODEL_TIERS = {"small": SMALL_MODEL, "large": LARGE_MODEL}
+
+# Commands longer than this (in words), or chaining several actions, go to the large model
+SMALL_COMMAND_MAX_WORDS = int(os.getenv("SMALL_COMMAND_MAX_WORDS", "12"))
+# File matches offering the model more candidates than this go to the large model
+SMALL_MAX_CANDIDATES = int(os.getenv("SMALL_MAX_CANDIDATES", "40"))
+# Prompt budget of one file-match request; longer filename lists are cut to fit
+FILE_MATCH_MAX_PROMPT_TOKENS = int(os.getenv("FILE_MATCH_MAX_PROMPT_TOKENS", "6000"))
+# A small-model file match scoring below this is asked again of the large model
+ESCALATE_BELOW_SCORE = float(os.getenv("ESCALATE_BELOW_SCORE", "0.6"))
+
+MODEL_CALLS = Counter("fixflow_model_calls_total", "Model calls by caller (agent, file_match) and tier", ["scope", "tier"])
+MODEL_TOKENS = Counter(
+    "fixflow_model_tokens_total",
+    "Tokens reported by the API, by caller, tier and kind (prompt, completion)",
+    ["scope", "tier", "kind"],
+)
+MODEL_DURATION = Histogram("fixflow_model_duration_seconds", "Model call latency by caller and tier", ["scope", "tier"])
+ESCALATIONS = Counter(
+    "fixflow_model_escalations_total",
+    "Requests the small model handled poorly and the large model was asked again, by caller and reason",
+    ["scope", "reason"],
+)
+
+# For budgeting prompts without shipping a tokenizer's vocabulary
+CHARS_PER_TOKEN = 4
+
+# "close this and open that", "open x, go to line 3", "then", ...
+MULTI_STEP = re.compile(r"\b(and|then|after|before|also|afterwards)\b|[,;]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about right for English and file paths."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def tier_of(model: str) -> str:
+    return "large" if model == LARGE_MODEL else "small"
+
+
+def command_tier(command: str) -> str:
+    """Tier for an agent command: small for one short action, large for longer or chained requests."""
+    if len(command.split()) > SMALL_COMMAND_MAX_WORDS or MULTI_STEP.search(command.lower()):
+        return "large"
+    return "small"
+
+
+def candidates_tier(count: int) -> str:
+    """Tier for a file match offering the model `count` candidate names."""
+    return "small" if count <= SMALL_MAX_CANDIDATES else "large"
+
+
+def usage_tokens(usage: Any) -> Tuple[int, int]:
+    """(prompt, completion) tokens from an OpenAI usage object or a LangChain usage_metadata dict."""
+    if usage is None:
+        return 0, 0
+    if isinstance(usage, dict):
+        return (usage.get("input_tokens", usage.get("prompt_tokens")) or 0,
+                usage.get("output_tokens", usage.get("completion_tokens")) or 0)
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+class TierStats:
+    """Calls, tokens, latency and escalations per caller and tier, for the /modelTiers endpoint."""
+
+    def __init__(self):
+        self._tiers: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._escalations: Dict[Tuple[str, str], int] = {}
+        self.truncated = 0
+        self._lock = threading.Lock()
+
+    def record(self, scope: str, tier: str, seconds: float, usage: Any = None):
+        prompt, completion = usage_tokens(usage)
+        MODEL_CALLS.inc(scope=scope, tier=tier)
+        MODEL_DURATION.observe(seconds, scope=scope, tier=tier)
+        MODEL_TOKENS.inc(prompt, scope=scope, tier=tier, kind="prompt")
+        MODEL_TOKENS.inc(completion, scope=scope, tier=tier, kind="completion")
+        with self._lock:
+            entry = self._tiers.setdefault(
+                (scope, tier), {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt
+            entry["completion_tokens"] += completion
+            entry["seconds"] += seconds
+
+    def escalate(self, scope: str, reason: str):
+        ESCALATIONS.inc(scope=scope, reason=reason)
+        with self._lock:
+            self._escalations[(scope, reason)] = self._escalations.get((scope, reason), 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tiers = {f"{scope}.{tier}": {**entry, "model": MODEL_TIERS[tier],
+                                         "avg_ms": round(entry["seconds"] / entry["calls"] * 1000, 1)}
+                     for (scope, tier), entry in self._tiers.items()}
+            escalations = {f"{scope}.{reason}": count for (scope, reason), count in self._escalations.items()}
+        return {"models": dict(MODEL_TIERS), "tiers": tiers, "escalations": escalations,
+                "truncated_prompts": self.truncated}
+
+
+tier_stats = TierStats()
+
+
+class _ModelCall:
+    usage: Optional[Any] = None
+
+
+@contextmanager
+def model_call(scope: str, tier: str):
+    """Time one model call; set `.usage` on the yielded object to count its tokens."""
+    call = _ModelCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    finally:
+        tier_stats.record(scope, tier, time.perf_counter() - started, call.usage)
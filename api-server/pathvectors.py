@@ -0,0 +1,469 @@
+import abc
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, keep one server process per store
+    fcntl = None
+
+# numpy is optional (searches then fall back to the full filename list) and
+# only imported once a vector index is first needed, keeping startup cheap
+np = None
+
+from filematch import SEPARATORS, normalize_query
+
+PATH_EMBEDDER = os.getenv("PATH_EMBEDDER", "hashing")
+PATH_VECTORS_DIR = os.getenv("PATH_VECTORS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fixflow", "vectors"))
+HASHING_DIM = int(os.getenv("PATH_VECTORS_HASHING_DIM", "256"))
+OPENAI_EMBEDDING_MODEL = os.getenv("PATH_VECTORS_OPENAI_MODEL", "text-embedding-3-small")
+EMBED_BATCH_SIZE = 2048
+# Rewrite the path log once it holds this many times more lines than live rows
+LOG_COMPACT_RATIO = 2
+
+def numpy_available() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def path_words(path: str) -> List[str]:
+    """Lower-cased words of a path component: "userConfig_v2.yml" -> ["user", "config", "v2", "yml"]."""
+    return [w for w in SEPARATORS.split(CAMEL_BOUNDARY.sub(" ", path).lower()) if w]
+
+
+class Embedder(abc.ABC):
+    """Turns strings into L2-normalized float32 vectors of a fixed dimension."""
+
+    name = "base"
+    dim = 0
+
+    @abc.abstractmethod
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """One vector per text."""
+
+    def embed_path(self, paths: List[str]) -> "np.ndarray":
+        return self.embed(paths)
+
+    def embed_query(self, query: str) -> "np.ndarray":
+        return self.embed([query])[0]
+
+
+class HashingEmbedder(Embedder):
+    """
+    Offline embedder: character trigrams and words hashed into `dim` signed
+    buckets. Trigrams make misspellings and partial names land close to the
+    real name; words of the two parent directories add a little context.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        # feature -> signed bucket; trigrams and path words repeat a lot
+        self._buckets: Dict[str, int] = {}
+
+    def _bucket(self, feature: str) -> int:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            h = zlib.crc32(feature.encode("utf-8", "surrogatepass"))
+            bucket = (h % self.dim + 1) * (1 if h & 0x80000000 else -1)
+            if len(self._buckets) < 1 << 20:
+                self._buckets[feature] = bucket
+        return bucket
+
+    def _features(self, name: str, context: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        words = path_words(name)
+        padded = f" {' '.join(words)} "
+        features = [("#" + padded[i:i + 3], 1.0) for i in range(len(padded) - 2)]
+        features += [("w" + word, 2.0) for word in words]
+        features += [("d" + word, 0.5) for word in context]
+        return features
+
+    def _vectorize(self, rows: List[List[Tuple[str, float]]]) -> "np.ndarray":
+        cells, weights = [], []
+        for row, features in enumerate(rows):
+            offset = row * self.dim - 1
+            for feature, weight in features:
+                bucket = self._bucket(feature)
+                if bucket > 0:
+                    cells.append(offset + bucket)
+                    weights.append(weight)
+                else:
+                    cells.append(offset - bucket)
+                    weights.append(-weight)
+        # bincount sums weights landing in the same cell, like np.add.at but much faster
+        flat = np.bincount(np.asarray(cells, dtype=np.intp), weights=np.asarray(weights, dtype=np.float64),
+                           minlength=len(rows) * self.dim)
+        vectors = flat.reshape(len(rows), self.dim).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        return self._vectorize([self._features(text) for text in texts])
+
+    def embed_path(self, paths: List[str]) -> "np.ndarray":
+        rows = []
+        for path in paths:
+            parts = path.replace("\\", "/").split("/")
+            context = [w for part in parts[-3:-1] for w in path_words(part)]
+            rows.append(self._features(parts[-1], context))
+        return self._vectorize(rows)
+
+    def embed_query(self, query: str) -> "np.ndarray":
+        return self.embed([normalize_query(query) or query])[0]
+
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI embeddings of "<parent dir>/<filename>"; needs network access and a key."""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = OPENAI_EMBEDDING_MODEL):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.model = model
+        self.dim = len(self._request(["probe"])[0])
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in response.data]
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        vectors = np.asarray(self._request(texts), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def embed_path(self, paths: List[str]) -> "np.ndarray":
+        return self.embed(["/".join(path.replace("\\", "/").split("/")[-2:]) for path in paths])
+
+
+EMBEDDERS = {"hashing": HashingEmbedder, "openai": OpenAIEmbedder}
+
+
+def create_embedder(name: str = PATH_EMBEDDER) -> Embedder:
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown path embedder: {name}")
+    return EMBEDDERS[name]()
+
+
+class PathVectorIndex:
+    """
+    One embedding per file path, kept in a memory-mapped float32 array.
+
+    Row i of `vectors.f32` belongs to the path on row i of the path table.
+    The table is persisted as an append-only log ("+<row>\\t<path>" and
+    "-<row>" lines), so a file change costs one vector write and one log
+    line rather than a rewrite. Freed rows are zeroed (they score 0) and
+    reused by later additions. sync() diffs against a FileIndex snapshot,
+    so only added and removed files are embedded or dropped.
+
+    Every uvicorn worker opens the same store. Each change and search
+    holds an exclusive lock on its `lock` file, and first reads the log
+    lines other processes appended since (or the whole log, if one of
+    them compacted or reset it), so no two processes claim the same row
+    and this process's row table matches the vectors it reads.
+    """
+
+    def __init__(self, directory: str, embedder: Embedder, storage_dir: str):
+        self.directory = directory
+        self.embedder = embedder
+        self.storage_dir = storage_dir
+        self.synced_generation = -1
+        self._rows: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._vectors = None
+        self._capacity = 0
+        self._log_lines = 0
+        # Where this process has read the log up to, and which version of the
+        # log that was; every rewrite (compaction, reset) gets a new epoch in
+        # meta.json, since the replaced file's inode may well be reused
+        self._log_offset = 0
+        self._log_epoch: Optional[str] = None
+        self._lock = threading.Lock()
+        os.makedirs(storage_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(storage_dir, "lock"), "a")
+        with self._locked():
+            pass
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.storage_dir, "vectors.f32")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.storage_dir, "paths.log")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.storage_dir, "meta.json")
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    @contextmanager
+    def _locked(self):
+        """This process's lock and the store's file lock, with the view caught up with other processes."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        try:
+            stat = os.stat(self._log_path)
+        except OSError:
+            stat = None
+        meta = self._read_meta()
+        if self._vectors is None or stat is None or meta.get("log_epoch") != self._log_epoch \
+                or stat.st_size < self._log_offset:
+            self._load()
+        elif stat.st_size > self._log_offset:
+            self._read_log()
+            # Additions may have grown the array
+            capacity = meta.get("capacity", self._capacity)
+            if capacity != self._capacity:
+                self._map(capacity)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _map(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.embedder.dim))
+
+    def _load(self):
+        meta = self._read_meta()
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.embedder.dim \
+                or not os.path.exists(self._vectors_path) or not os.path.exists(self._log_path):
+            self._reset()
+            return
+
+        self._rows, self._row_of = [], {}
+        self._log_lines = self._log_offset = 0
+        self._log_epoch = meta.get("log_epoch")
+        self._map(meta["capacity"])
+        self._read_log()
+        if self._log_lines > LOG_COMPACT_RATIO * max(len(self._row_of), 1024):
+            self._compact()
+
+    def _read_log(self):
+        """Apply the log lines past the offset read so far."""
+        with open(self._log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # Lines are only appended under the lock, but never trust a torn tail
+        data = data[:data.rfind(b"\n") + 1]
+        self._log_offset += len(data)
+        for line in data.decode("utf-8", "surrogateescape").splitlines():
+            self._log_lines += 1
+            if line.startswith("+"):
+                row, path = line[1:].split("\t", 1)
+                self._set_row(int(row), path)
+            elif line.startswith("-"):
+                self._set_row(int(line[1:]), None)
+        self._free = [row for row, path in enumerate(self._rows) if path is None]
+
+    def _log_written(self):
+        """Record this process's own appends as read."""
+        self._log_offset = os.path.getsize(self._log_path)
+
+    def _reset(self):
+        for path in (self._vectors_path, self._log_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._rows, self._row_of, self._free = [], {}, []
+        self._capacity = 0
+        self._vectors = None
+        self._log_lines = 0
+        self._log_epoch = os.urandom(8).hex()
+        open(self._log_path, "w").close()
+        self._log_written()
+        self._grow(1024)
+
+    def _write_meta(self):
+        with open(self._meta_path, "w") as f:
+            json.dump({"embedder": self.embedder.name, "dim": self.embedder.dim,
+                       "capacity": self._capacity, "directory": self.directory,
+                       "log_epoch": self._log_epoch}, f)
+
+    def _grow(self, needed: int):
+        capacity = max(self._capacity, 1024)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.embedder.dim * 4)
+        self._map(capacity)
+        self._write_meta()
+
+    def _set_row(self, row: int, path: Optional[str]):
+        while len(self._rows) <= row:
+            self._rows.append(None)
+        previous = self._rows[row]
+        if previous is not None:
+            self._row_of.pop(previous, None)
+        self._rows[row] = path
+        if path is not None:
+            self._row_of[path] = row
+
+    def _compact(self):
+        with open(f"{self._log_path}.tmp", "w", encoding="utf-8", errors="surrogateescape") as f:
+            for row, path in enumerate(self._rows):
+                if path is not None:
+                    f.write(f"+{row}\t{path}\n")
+        os.replace(f"{self._log_path}.tmp", self._log_path)
+        self._log_epoch = os.urandom(8).hex()
+        self._write_meta()
+        self._log_lines = len(self._row_of)
+        self._log_written()
+
+    def _add_many(self, paths: List[str]):
+        paths = [p for p in paths if p not in self._row_of and "\n" not in p]
+        if not paths:
+            return
+        self._grow(len(self._rows) + max(0, len(paths) - len(self._free)))
+        with open(self._log_path, "a", encoding="utf-8", errors="surrogateescape") as log:
+            for start in range(0, len(paths), EMBED_BATCH_SIZE):
+                batch = paths[start:start + EMBED_BATCH_SIZE]
+                vectors = self.embedder.embed_path(batch)
+                lines = []
+                for path, vector in zip(batch, vectors):
+                    row = self._free.pop() if self._free else len(self._rows)
+                    self._vectors[row] = vector
+                    self._set_row(row, path)
+                    lines.append(f"+{row}\t{path}\n")
+                self._vectors.flush()
+                log.writelines(lines)
+                self._log_lines += len(lines)
+        self._log_written()
+
+    def _discard_many(self, paths: Iterable[str]):
+        lines = []
+        for path in paths:
+            row = self._row_of.get(path)
+            if row is None:
+                continue
+            self._vectors[row] = 0
+            self._set_row(row, None)
+            self._free.append(row)
+            lines.append(f"-{row}\n")
+        if lines:
+            self._vectors.flush()
+            with open(self._log_path, "a", encoding="utf-8", errors="surrogateescape") as log:
+                log.writelines(lines)
+            self._log_lines += len(lines)
+            self._log_written()
+            if self._log_lines > LOG_COMPACT_RATIO * max(len(self._row_of), 1024):
+                self._compact()
+
+    def sync(self, paths: List[str], generation: int):
+        """Bring the vectors in line with `paths`, embedding only what changed."""
+        if generation == self.synced_generation:
+            return
+        with self._locked():
+            if generation == self.synced_generation:
+                return
+            current = set(paths)
+            known = set(self._row_of)
+            self._discard_many(known - current)
+            self._add_many(sorted(current - known))
+            self.synced_generation = generation
+
+    def search(self, query: str, k: int = 20) -> List[Dict]:
+        """
+        Top-k paths by cosine similarity to `query`.
+
+        Returns:
+            List[Dict]: candidates like filematch.rank_files(), with tier "semantic"
+        """
+        q = self.embedder.embed_query(query)
+        with self._locked():
+            used = len(self._rows)
+            if not self._row_of or used == 0:
+                return []
+            scores = self._vectors[:used] @ q
+            k = min(k, used)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for row in top:
+                path = self._rows[row]
+                if path is None or scores[row] <= 0:
+                    continue
+                results.append({
+                    "name": os.path.basename(path),
+                    "full_path": path,
+                    "score": round(float(scores[row]), 4),
+                    "tier": "semantic",
+                })
+            return results
+
+    def stats(self) -> Dict:
+        return {
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "vectors": len(self._row_of),
+            "capacity": self._capacity,
+            "synced_generation": self.synced_generation,
+            "storage_dir": self.storage_dir,
+        }
+
+
+_indexes: Dict[str, Optional[PathVectorIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def storage_dir_for(directory: str, embedder: Embedder, root: str = PATH_VECTORS_DIR) -> str:
+    digest = hashlib.blake2b(os.path.abspath(directory).encode(), digest_size=8).hexdigest()
+    return os.path.join(root, f"{digest}-{embedder.name}-{embedder.dim}")
+
+
+def get_path_vector_index(directory: str) -> Optional[PathVectorIndex]:
+    """
+    The shared vector index for `directory`, or None when numpy is missing,
+    PATH_EMBEDDER is "none" or the embedder can't be created.
+    Call sync() with the FileIndex contents before searching.
+    """
+    if PATH_EMBEDDER == "none" or not numpy_available():
+        return None
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            try:
+                embedder = create_embedder()
+                _indexes[key] = PathVectorIndex(key, embedder, storage_dir_for(key, embedder))
+            except Exception as e:
+                # Remembered as None so a broken embedder isn't retried per search
+                print(f"Error: {str(e)}")
+                _indexes[key] = None
+        return _indexes[key]
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from command_router import CommandRouter
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "256"))
+
+# Tools whose arguments the model chose by looking at editor state, and the
+# state ("tabs" or "windows") a recorded plan using them is only valid for
+CONTEXT_DEPENDENCIES = {
+    "list_open_tabs": "tabs",
+    "get_recent_files": "tabs",
+    "go_to_tab": "tabs",
+    "list_windows": "windows",
+    "switch_window": "windows",
+}
+CONTEXT_KINDS = sorted(set(CONTEXT_DEPENDENCIES.values()))
+
+# Tools that only read state; a plan made of nothing else is an answer the
+# model wrote from their output, not a sequence of actions worth replaying
+OBSERVATION_TOOLS = {"list_open_tabs", "get_recent_files", "list_windows", "check_status"}
+
+
+def context_signature(values: Iterable[Any]) -> str:
+    """Order-independent digest of a piece of editor state, e.g. the open tab labels."""
+    digest = hashlib.blake2b(digest_size=8)
+    for value in sorted({str(v) for v in values}):
+        digest.update(value.encode("utf-8", "surrogatepass") + b"\0")
+    return digest.hexdigest()
+
+
+def plan_tool_names(steps: List[Dict]) -> List[str]:
+    """Tool names in a plan, including the steps inside run_batch calls."""
+    names = []
+    for step in steps:
+        names.append(step["tool"])
+        if step["tool"] == "run_batch":
+            names += [s.get("tool") for s in step["args"].get("steps") or []]
+    return names
+
+
+def is_error(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("status") == "error"
+
+
+class PlanCache:
+    """
+    Bounded LRU cache of the tool calls the agent chose for a command.
+
+    Keys are normalized commands. Each entry holds the ordered tool calls,
+    the agent's final output and signatures of the editor state the plan
+    depended on (see CONTEXT_DEPENDENCIES); a lookup only hits when that
+    state still has the same signature. A plan whose replay fails is
+    invalidated so the next run goes back through the model.
+    """
+
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(command: str) -> str:
+        return CommandRouter.normalize(command).lower()
+
+    def context_kinds(self, command: str) -> List[str]:
+        """State the cached plan for `command` depends on; empty if none is cached."""
+        with self._lock:
+            entry = self._entries.get(self.make_key(command))
+            return list(entry["context"]) if entry else []
+
+    def get(self, command: str, context: Dict[str, Optional[str]]) -> Optional[Dict]:
+        """
+        The cached plan for `command`, or None.
+
+        Args:
+            command (str): The user's command
+            context (Dict[str, Optional[str]]): Current signature per context kind
+
+        Returns:
+            Optional[Dict]: {"steps": [{"tool", "args"}, ...], "output", "context"}
+        """
+        key = self.make_key(command)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or any(context.get(kind) != sig for kind, sig in entry["context"].items()):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, command: str, steps: List[Dict], output: str, context: Dict[str, Optional[str]]) -> bool:
+        """
+        Record a successful plan. Plans without an action step, with a failed
+        step, or depending on state whose signature is unknown are skipped.
+
+        Returns:
+            bool: Whether the plan was cached
+        """
+        names = plan_tool_names(steps)
+        if not steps or all(name in OBSERVATION_TOOLS for name in names):
+            return False
+        if any(is_error(step.get("result")) for step in steps):
+            return False
+        kinds = {CONTEXT_DEPENDENCIES[name] for name in names if name in CONTEXT_DEPENDENCIES}
+        if any(context.get(kind) is None for kind in kinds):
+            return False
+
+        key = self.make_key(command)
+        entry = {
+            "steps": [{"tool": step["tool"], "args": step["args"]} for step in steps],
+            "output": output,
+            "context": {kind: context[kind] for kind in sorted(kinds)},
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, command: str) -> bool:
+        with self._lock:
+            dropped = self._entries.pop(self.make_key(command), None) is not None
+            self.invalidations += dropped
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+plan_cache = PlanCache()
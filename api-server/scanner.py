@@ -0,0 +1,339 @@
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+# Directory names never descended into, wherever they are
+SCAN_EXCLUDE = [
+    name.strip() for name in os.getenv(
+        "FILE_SCAN_EXCLUDE",
+        ".git,.hg,.svn,node_modules,venv,.venv,__pycache__,.mypy_cache,.pytest_cache,.tox,build,dist,.next,target",
+    ).split(",") if name.strip()
+]
+# Per-directory ignore files whose patterns prune the walk (gitignore syntax)
+IGNORE_FILES = [name.strip() for name in os.getenv("FILE_SCAN_IGNORE_FILES", ".gitignore,.ignore").split(",") if name.strip()]
+# Threads scanning subtrees; directory listing releases the GIL, so this helps on cold or network disks
+SCAN_WORKERS = int(os.getenv("FILE_SCAN_WORKERS", str(min(16, (os.cpu_count() or 2) * 2))))
+
+
+def _glob_segment(segment: str) -> str:
+    """Regex for one path segment of a gitignore glob."""
+    out, i = [], 0
+    while i < len(segment):
+        c = segment[i]
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = segment.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = segment[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < len(segment):
+            i += 1
+            out.append(re.escape(segment[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRule:
+    """One gitignore pattern, matched against paths relative to its file's directory."""
+
+    def __init__(self, regex: "re.Pattern", negate: bool, dir_only: bool):
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+    @classmethod
+    def parse(cls, line: str) -> Optional["IgnoreRule"]:
+        line = line.rstrip("\n")
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        # A slash anywhere but the end anchors the pattern to its directory
+        anchored = "/" in line
+        segments = line.lstrip("/").split("/")
+        parts = []
+        for i, segment in enumerate(segments):
+            last = i == len(segments) - 1
+            if segment == "**":
+                parts.append(".*" if last else "(?:.*/)?")
+                continue
+            parts.append(_glob_segment(segment) + ("" if last else "/"))
+        regex = "".join(parts)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        return cls(re.compile(regex), negate, dir_only)
+
+    def matches(self, relative: str, is_dir: bool) -> bool:
+        return (is_dir or not self.dir_only) and self.regex.fullmatch(relative) is not None
+
+
+class IgnoreRules:
+    """
+    The ignore rules in effect in one directory: its own ignore files' rules
+    on top of its parent's. As in git, the last matching rule wins and rules
+    closer to the path win over those further up.
+    """
+
+    def __init__(self, directory: str, rules: List[IgnoreRule], parent: Optional["IgnoreRules"] = None):
+        self.directory = directory
+        self.rules = rules
+        self.parent = parent
+
+    @classmethod
+    def load(cls, directory: str, parent: Optional["IgnoreRules"] = None,
+             names: Iterable[str] = IGNORE_FILES) -> Optional["IgnoreRules"]:
+        """`parent` extended with `directory`'s ignore files, or `parent` itself when it has none."""
+        rules = []
+        for name in names:
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+                    rules += [rule for rule in map(IgnoreRule.parse, f) if rule is not None]
+            except OSError:
+                continue
+        return cls(directory, rules, parent) if rules else parent
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        rules: Optional[IgnoreRules] = self
+        while rules is not None:
+            relative = path[len(rules.directory) + 1:].replace(os.sep, "/")
+            for rule in reversed(rules.rules):
+                if rule.matches(relative, is_dir):
+                    return not rule.negate
+            rules = rules.parent
+        return False
+
+
+def repo_excludes(root: str) -> Optional[IgnoreRules]:
+    """The repository's own untracked-file excludes, beneath every ignore file."""
+    return IgnoreRules.load(root, None, [os.path.join(".git", "info", "exclude")])
+
+
+def ignore_signature(directory: str, names: Iterable[str]) -> str:
+    """Sizes and mtimes of `directory`'s ignore files, to notice an edit without reading them."""
+    parts = []
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return ";".join(sorted(parts))
+
+
+class Listing(NamedTuple):
+    """One directory as the scanner saw it."""
+    directory: str
+    # Taken before listing, so a change made during the listing shows as a newer mtime later
+    mtime_ns: int
+    ignore_sig: str
+    files: List[str]
+
+
+def accepts_suffix(name: str, suffixes: Set[str]) -> bool:
+    """Whether a file name has one of `suffixes` ('.py', ...); '.*' accepts any file."""
+    return ".*" in suffixes or os.path.splitext(name)[1].lower() in suffixes
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-scan")
+        return _pool
+
+
+class _Scan:
+    """State of one scan: its output queue and how many subtree tasks are still running."""
+
+    def __init__(self):
+        self.results: "queue.Queue[Optional[Listing]]" = queue.Queue()
+        self.outstanding = 0
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.outstanding += 1
+
+    def finished(self):
+        with self._lock:
+            self.outstanding -= 1
+            done = self.outstanding == 0
+        if done:
+            self.results.put(None)
+
+
+class DirectoryScanner:
+    """
+    Parallel, ignore-aware replacement for os.walk over a workspace.
+
+    Directories are listed with os.scandir. Directory names in `exclude`,
+    and anything matched by the `.gitignore`/`.ignore` files met on the way
+    (and the root's `.git/info/exclude`), are pruned before they are
+    entered. Subtrees are fanned out to a shared thread pool while it has
+    idle workers and walked in place otherwise, so small trees don't pay
+    for task hand-offs. Symlinked directories are not followed, like
+    os.walk.
+
+    iter_files() yields each directory's matching files as soon as it has
+    been listed, so consumers can work while the walk goes on.
+    """
+
+    def __init__(self, extensions: Iterable[str], exclude: Iterable[str] = SCAN_EXCLUDE,
+                 ignore_files: Iterable[str] = IGNORE_FILES, workers: int = SCAN_WORKERS):
+        self.suffixes = {f'.{ext.lower().strip(".")}' for ext in extensions}
+        self.exclude = set(exclude)
+        self.ignore_files = list(ignore_files)
+        self.workers = max(1, workers)
+        self._rules: Dict[str, Optional[IgnoreRules]] = {}
+        self._rules_lock = threading.Lock()
+
+    def _walk(self, scan: _Scan, top: str, rules: Optional[IgnoreRules]):
+        try:
+            stack: List[Tuple[str, Optional[IgnoreRules]]] = [(top, rules)]
+            while stack and not scan.cancelled:
+                directory, rules = stack.pop()
+                rules = IgnoreRules.load(directory, rules, self.ignore_files)
+                files, ignore_sig = [], []
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                    entries = os.scandir(directory)
+                except OSError:
+                    continue
+                with entries:
+                    for entry in entries:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if (entry.name in self.exclude or entry.is_symlink()
+                                    or (rules is not None and rules.ignored(entry.path, True))):
+                                continue
+                            if scan.outstanding < self.workers:
+                                self._submit(scan, entry.path, rules)
+                            else:
+                                stack.append((entry.path, rules))
+                        elif accepts_suffix(entry.name, self.suffixes) and not (
+                                rules is not None and rules.ignored(entry.path, False)):
+                            files.append(entry.path)
+                        if not is_dir and entry.name in self.ignore_files:
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            ignore_sig.append(f"{entry.name}:{stat.st_mtime_ns}:{stat.st_size}")
+                scan.results.put(Listing(directory, mtime_ns, ";".join(sorted(ignore_sig)), files))
+        except BaseException as e:
+            scan.error = e
+        finally:
+            scan.finished()
+
+    def _submit(self, scan: _Scan, directory: str, rules: Optional[IgnoreRules]):
+        scan.started()
+        try:
+            _get_pool(self.workers).submit(self._walk, scan, directory, rules)
+        except BaseException:
+            scan.finished()
+            raise
+
+    def iter_files(self, directory: str, root: Optional[str] = None) -> Iterator[List[str]]:
+        """
+        Batches of absolute file paths under `directory`, one per directory
+        listed, in no particular order. When `directory` is inside a larger
+        workspace `root`, the ignore files above it apply too.
+        """
+        for listing in self.iter_listings(directory, root):
+            if listing.files:
+                yield listing.files
+
+    def iter_listings(self, directory: str, root: Optional[str] = None) -> Iterator[Listing]:
+        """Like iter_files, but one Listing for every directory entered, with or without matching files."""
+        top = str(Path(directory).absolute())
+        root = str(Path(root).absolute()) if root else top
+        if top == root:
+            rules = repo_excludes(root)
+        elif self.ignored(top, root):
+            return
+        else:
+            rules = self._rules_for(os.path.dirname(top), root)
+        scan = _Scan()
+        self._submit(scan, top, rules)
+        try:
+            while True:
+                listing = scan.results.get()
+                if listing is None:
+                    break
+                yield listing
+        finally:
+            scan.cancelled = True
+        if scan.error is not None:
+            raise scan.error
+
+    def scan(self, directory: str, root: Optional[str] = None) -> List[str]:
+        return [path for batch in self.iter_files(directory, root) for path in batch]
+
+    def _rules_for(self, directory: str, root: str) -> Optional[IgnoreRules]:
+        """The rules in effect in `directory` (under `root`), loaded once per directory."""
+        with self._rules_lock:
+            if directory in self._rules:
+                return self._rules[directory]
+        parent = repo_excludes(root) if directory == root else self._rules_for(os.path.dirname(directory), root)
+        rules = IgnoreRules.load(directory, parent, self.ignore_files)
+        with self._rules_lock:
+            self._rules[directory] = rules
+        return rules
+
+    def ignored(self, path: str, root: str) -> bool:
+        """
+        Whether a single path under `root` would have been skipped by a scan,
+        for filtering watcher events without walking.
+        """
+        relative = os.path.relpath(path, root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return True
+        parts = relative.split(os.sep)
+        if any(part in self.exclude for part in parts[:-1]):
+            return True
+        directory = root
+        for i, part in enumerate(parts):
+            rules = self._rules_for(directory, root)
+            current = os.path.join(directory, part)
+            is_dir = i < len(parts) - 1 or os.path.isdir(current)
+            if rules is not None and rules.ignored(current, is_dir):
+                return True
+            directory = current
+        return False
+
+    def forget_rules(self):
+        """Drop cached ignore rules, e.g. after an ignore file changed."""
+        with self._rules_lock:
+            self._rules.clear()
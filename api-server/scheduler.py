@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+from metrics import Counter, observe_stage
+
+# Commands (queued or running) per window before new ones get a 429
+COMMAND_QUEUE_DEPTH = int(os.getenv("COMMAND_QUEUE_DEPTH", "8"))
+# A command that waited this long for its turn is dropped instead of run late
+COMMAND_MAX_WAIT = float(os.getenv("COMMAND_MAX_WAIT", "10"))
+
+DROPPED_COMMANDS = Counter(
+    "fixflow_dropped_commands_total",
+    "Commands dropped before reaching the extension, by reason (superseded, stale, rejected)",
+    ["reason"],
+)
+
+
+class _Job:
+    def __init__(self, lane: str, supersede_key: Optional[str], max_wait: Optional[float]):
+        self.lane = lane
+        self.supersede_key = supersede_key
+        self.max_wait = max_wait
+        self.enqueued_at = time.perf_counter()
+        self.turn = asyncio.Event()
+        self.task = asyncio.current_task()
+        self.started = False
+        # Set once the job has sent anything to the extension; from then on
+        # cancelling it could leave the editor half-way through
+        self.touched = False
+        self.dropped: Optional[str] = None
+
+
+# Job the current task is running on behalf of
+_current_job: ContextVar[Optional[_Job]] = ContextVar("scheduler_job", default=None)
+
+
+def mark_touched():
+    """Record that the running job has reached the extension, so it is no longer cancelled when superseded."""
+    job = _current_job.get()
+    if job is not None:
+        job.touched = True
+
+
+class CommandScheduler:
+    """
+    Runs commands for each VS Code window one at a time, in arrival order.
+
+    Every window (extension server) has its own FIFO lane; different windows
+    run in parallel. A job runs in its caller's task once the jobs ahead of
+    it are done, so routing and per-request timings carry over, and calls a
+    running job makes itself (e.g. the agent's tool calls) skip the queue.
+
+    - A lane holds at most `max_depth` jobs; more are rejected with a 429.
+    - A job that waited longer than its `max_wait` is dropped as stale.
+    - A job with a `supersede_key` drops the queued jobs with the same key,
+      and cancels the running one as long as it hasn't reached the
+      extension yet.
+
+    Time spent waiting is recorded as the queue_wait stage, separately from
+    the command_run stage.
+    """
+
+    def __init__(self, max_depth: int = COMMAND_QUEUE_DEPTH):
+        self.max_depth = max_depth
+        self.completed = 0
+        self.dropped: Dict[str, int] = {"superseded": 0, "stale": 0, "rejected": 0}
+        self._lanes: Dict[str, Deque[_Job]] = {}
+
+    def _drop(self, job: _Job, reason: str):
+        job.dropped = reason
+        self.dropped[reason] += 1
+        DROPPED_COMMANDS.inc(reason=reason)
+
+    def _supersede(self, lane: Deque[_Job], key: str):
+        for job in lane:
+            if job.supersede_key != key or job.dropped is not None:
+                continue
+            if not job.started:
+                self._drop(job, "superseded")
+                job.turn.set()
+            elif not job.touched:
+                self._drop(job, "superseded")
+                job.task.cancel()
+
+    @staticmethod
+    def dropped_result(job: _Job) -> Dict:
+        if job.dropped == "superseded":
+            message = "Superseded by a newer command for this window"
+        else:
+            message = f"Waited more than {job.max_wait:g}s for the commands ahead of it"
+        return {"status": "cancelled", "reason": job.dropped, "message": message}
+
+    def slot(self, lane_key: str, supersede_key: Optional[str] = None,
+             max_wait: Optional[float] = None) -> "_Slot":
+        """
+        Async context manager holding `lane_key`'s turn for its block. It
+        yields the job, or None inside a job already running on that lane;
+        the block must not run the command when `job.dropped` is set. A
+        running job cancelled because it was superseded ends the block
+        without raising, with `job.dropped` set.
+
+        Raises:
+            HTTPException: 429 when the lane is full
+        """
+        return _Slot(self, lane_key, supersede_key, max_wait)
+
+    async def run(self, lane_key: str, fn: Callable[[], Awaitable[Any]], supersede_key: Optional[str] = None,
+                  max_wait: Optional[float] = None) -> Any:
+        """
+        Run `fn()` when it is this job's turn on `lane_key`.
+
+        Returns:
+            Any: fn's result, or a {"status": "cancelled", "reason": ...}
+            result when the job was superseded or went stale
+        """
+        async with self.slot(lane_key, supersede_key, max_wait) as job:
+            if job is None or job.dropped is None:
+                return await fn()
+        return self.dropped_result(job)
+
+    def _enqueue(self, lane_key: str, supersede_key: Optional[str], max_wait: Optional[float]) -> _Job:
+        lane = self._lanes.setdefault(lane_key, deque())
+        if len(lane) >= self.max_depth:
+            self.dropped["rejected"] += 1
+            DROPPED_COMMANDS.inc(reason="rejected")
+            raise HTTPException(status_code=429, detail=f"Too many commands queued for this window ({len(lane)})",
+                                headers={"Retry-After": "1"})
+        if supersede_key is not None:
+            self._supersede(lane, supersede_key)
+        job = _Job(lane_key, supersede_key, max_wait)
+        lane.append(job)
+        if lane[0] is job:
+            job.turn.set()
+        return job
+
+    def _release(self, job: _Job):
+        lane = self._lanes[job.lane]
+        lane.remove(job)
+        if lane:
+            lane[0].turn.set()
+        else:
+            del self._lanes[job.lane]
+
+    def stats(self) -> Dict:
+        return {
+            "max_depth": self.max_depth,
+            "queued": {lane: len(jobs) for lane, jobs in self._lanes.items()},
+            "completed": self.completed,
+            "dropped": dict(self.dropped),
+        }
+
+
+class _Slot:
+    def __init__(self, scheduler: CommandScheduler, lane_key: str, supersede_key: Optional[str],
+                 max_wait: Optional[float]):
+        self.scheduler = scheduler
+        self.lane_key = lane_key
+        self.supersede_key = supersede_key
+        self.max_wait = max_wait
+        self.job: Optional[_Job] = None
+        self.token = None
+        self.started_at: Optional[float] = None
+
+    async def __aenter__(self) -> Optional[_Job]:
+        current = _current_job.get()
+        if current is not None and current.lane == self.lane_key:
+            return None
+        job = self.job = self.scheduler._enqueue(self.lane_key, self.supersede_key, self.max_wait)
+        try:
+            await job.turn.wait()
+        except BaseException:
+            self.scheduler._release(job)
+            raise
+        waited = time.perf_counter() - job.enqueued_at
+        observe_stage("queue_wait", waited)
+        if job.dropped is None and self.max_wait is not None and waited > self.max_wait:
+            self.scheduler._drop(job, "stale")
+        if job.dropped is None:
+            job.started = True
+            self.started_at = time.perf_counter()
+            self.token = _current_job.set(job)
+        return job
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        job = self.job
+        if job is None:
+            return False
+        if self.token is not None:
+            _current_job.reset(self.token)
+        if self.started_at is not None:
+            observe_stage("command_run", time.perf_counter() - self.started_at)
+            self.scheduler.completed += 1
+        self.scheduler._release(job)
+        if exc_type is asyncio.CancelledError and job.dropped is not None:
+            job.task.uncancel()
+            return True
+        return False
+
+
+command_scheduler = CommandScheduler()
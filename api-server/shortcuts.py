@@ -1,254 +1,341 @@
+import time
+_import_started = time.perf_counter()
+
+from dotenv import load_dotenv
+load_dotenv()
+
 from fastapi import FastAPI, HTTPException
-from typing import Dict
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import AsyncIterator, Dict, List, Literal, Optional
 from pydantic import BaseModel
-from filesearch import llm_file_search
+from filesearch import search_cache, sync_path_vectors
+from plan_cache import plan_cache
+from command_router import CommandRouter
+from singleflight import SingleFlight, coalescing_stats
+from scheduler import COMMAND_MAX_WAIT, command_scheduler
+from modeltiers import tier_stats
+from speculation import speculate, speculation_stats
+from contentindex import close_content_indexes, get_content_index
+from fileindex import WORKSPACE_DIR, get_file_index, stop_file_indexes
+from pathvectors import get_path_vector_index
+from vscode_client import close_client, start_client
+from health import EXTENSION_DOWN_DETAIL, extension_health, health_for
+from editor_state import get_editor_state, stop_editor_states
+from instances import instance_registry, use_instance
+from metrics import CONTENT_TYPE, ServerTimingMiddleware, render_metrics
+from startup import format_startup_report, record_startup, startup_report, timed_import
 import asyncio
+import json
 import os
-from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
-load_dotenv()
+import threading
+
+record_startup("shortcuts (eager imports)", time.perf_counter() - _import_started)
+
+# Imported lazily by get_agent(), in dependency order for the startup report
+HEAVY_MODULES = ["openai", "langchain_core", "langchain_openai", "langchain.agents"]
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
 
 app = FastAPI()
+app.add_middleware(ServerTimingMiddleware)
+
+
+@app.on_event("startup")
+async def open_vscode_client():
+    """Open the pooled client shared by every request to the extension."""
+    await start_client()
+
+
+@app.on_event("startup")
+async def start_health_monitor():
+    """Keep the extension's connection state current in the background."""
+    await extension_health.start()
+
+
+@app.on_event("startup")
+async def start_editor_state():
+    """Mirror tabs and recent files from each window's event stream."""
+    for instance in instance_registry.instances():
+        get_editor_state(instance.server)
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    """
+    Build the agent and walk the workspace after startup instead of during
+    it, so `/` answers right away. Without WARM_UP both happen on first use.
+    """
+    if WARM_UP:
+        app.state.warm_up = asyncio.create_task(warm_up())
+
+
+@app.on_event("shutdown")
+async def close_file_index():
+    stop_file_indexes()
+    close_content_indexes()
+    search_cache.flush()
+
+
+@app.on_event("shutdown")
+async def close_vscode_client():
+    await stop_editor_states()
+    await extension_health.stop()
+    await close_client()
+
+_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_agent():
+    """
+    The shared VSCodeControlAgent, or None without an OpenAI API key.
+
+    langchain and the OpenAI SDK are only imported here, on first use, so
+    the server can answer before they are loaded.
+    """
+    global _agent
+    if _agent is None and "OPENAI_API_KEY" in os.environ:
+        with _agent_lock:
+            if _agent is None:
+                for module in HEAVY_MODULES:
+                    timed_import(module)
+                control_agent = timed_import("control_agent")
+                _agent = control_agent.VSCodeControlAgent(openai_api_key=os.getenv("OPENAI_API_KEY"))
+    return _agent
+
+
+async def aget_agent():
+    """get_agent() for the event loop: a cold build runs in a worker thread."""
+    if _agent is not None:
+        return _agent
+    return await asyncio.to_thread(get_agent)
+
+
+def build_workspace_index(root: str):
+    sync_path_vectors(get_file_index(root))
+    # Returns right away; the contents are indexed in the background
+    get_content_index(root)
+
+async def warm_up():
+    """
+    Build the agent, and the file index and path vectors of every open
+    workspace root, concurrently in the background, and start indexing
+    the roots' file contents.
+    """
+    started = time.perf_counter()
+    roots = instance_registry.roots() or [WORKSPACE_DIR]
+    await asyncio.gather(
+        *(asyncio.to_thread(build_workspace_index, root) for root in roots),
+        aget_agent(),
+    )
+    record_startup("warm_up", time.perf_counter() - started)
+    print(format_startup_report())
 
-VSCODE_SERVER = "http://localhost:3068"
-async def forward_to_vscode(command: str, params: Dict = None) -> dict:
-    """Forward command to VS Code extension server."""
-    async with httpx.AsyncClient() as client:
-        try:
-            url = f"{VSCODE_SERVER}/{command}"
-            response = await client.get(url, params=params)
-            data = response.json()
-
-            # If the response indicates an error, ensure it includes the command
-            if data.get("status") == "error":
-                data["command"] = command
-
-            return JSONResponse(data)
-        except httpx.RequestError as exc:
-            raise HTTPException(
-                status_code=503,
-                detail="VS Code extension not running. Please start the extension in VS Code first (press F5 in the extension project)",
-            )
-
-
-
-# Initialize the agent with the OpenAI API key
-agent = None
-if "OPENAI_API_KEY" in os.environ:
-    from typing import Dict, List, Optional, Type, Any
-    from langchain_core.tools import BaseTool
-    from langchain_openai import ChatOpenAI
-    from langchain.agents import AgentExecutor, create_tool_calling_agent
-    from langchain_core.prompts import ChatPromptTemplate
-    from pydantic import BaseModel, Field
-    import httpx
-    import os
-    
-    class VSCodeControlTool(BaseTool):
-        name: str
-        description: str
-        endpoint: str
-        params: Optional[List[str]] = []
-        base_url: str = "http://localhost:3000"
-
-        def _run(self, **kwargs: Any) -> str:
-            """Execute the VS Code control command synchronously."""
-            import asyncio
-            return asyncio.run(self._arun(**kwargs))
-
-        async def _arun(self, **kwargs: Any) -> str:
-            """Execute the VS Code control command asynchronously."""
-            async with httpx.AsyncClient() as client:
-                try:
-                    if self.name == "open_file" and "path" in kwargs:
-                        workspace_dir = os.getenv("WORKSPACE_DIR", "/Users/bread/Documents/vscodeproj/api-server")
-                        
-                        # Use llm_file_search to find the closest matching file
-                        search_result = llm_file_search(
-                            directory=workspace_dir,
-                            search_term=kwargs["path"],
-                            api_key=os.getenv("OPENAI_API_KEY")
-                        )
-                        
-                        if "error" in search_result:
-                            return {"status": "error", "message": f"File search error: {search_result['error']}"}
-                        
-                        if search_result.get("full_path"):
-                            kwargs["path"] = search_result["full_path"]
-                        else:
-                            return {"status": "error", "message": "No matching file found"}
-                    params = {k: kwargs[k] for k in self.params if k in kwargs}
-                    if self.endpoint != "status":
-                        response = await forward_to_vscode(self.endpoint, params=params)
-                        return response
-                    return {}
-                except httpx.HTTPError as e:
-                    return {"status": "error", "message": f"HTTP error occurred: {str(e)}"}
-                except Exception as e:
-                    return {"status": "error", "message": f"An error occurred: {str(e)}"}
-
-    class VSCodeControlAgent:
-        def __init__(self, openai_api_key: str):
-            """Initialize the VS Code Control Agent."""
-            self.llm = ChatOpenAI(
-                api_key=openai_api_key,
-                model="gpt-4o"
-            )
-            
-            # Define all VS Code control tools
-            self.tools = [
-                VSCodeControlTool(
-                    name="next_tab",
-                    description="Switch to the next tab in VS Code",
-                    endpoint="nextTab"
-                ),
-                VSCodeControlTool(
-                    name="previous_tab",
-                    description="Switch to the previous tab in VS Code",
-                    endpoint="previousTab"
-                ),
-                VSCodeControlTool(
-                    name="close_tab",
-                    description="Close the current tab in VS Code",
-                    endpoint="closeTab"
-                ),
-                VSCodeControlTool(
-                    name="close_all_tabs",
-                    description="Close all tabs in VS Code",
-                    endpoint="closeAllTabs"
-                ),
-                VSCodeControlTool(
-                    name="close_tabs_to_right",
-                    description="Close all tabs to the right of the current tab",
-                    endpoint="closeTabsToRight"
-                ),
-                VSCodeControlTool(
-                    name="open_file",
-                    description="Open a specific file. Required parameter: 'path' - the name or path of the file to open. The tool will automatically search for similar filenames if exact match not found.",
-                    endpoint="openFile",
-                    params=["path"]
-                ),
-                VSCodeControlTool(
-                    name="list_open_tabs",
-                    description="Get a list of all currently open tabs in VS Code",
-                    endpoint="listOpenTabs"
-                ),
-                VSCodeControlTool(
-                    name="go_to_tab",
-                    description="Switch to a specific tab by providing its name",
-                    endpoint="goToTabName",
-                    params=["name"]
-                ),
-                VSCodeControlTool(
-                    name="go_to_line",
-                    description="Go to a specific line number in the current file",
-                    endpoint="goToLine",
-                    params=["line"]
-                ),
-                VSCodeControlTool(
-                    name="get_recent_files",
-                    description="Get a list of recently opened files in VS Code",
-                    endpoint="recentFiles"
-                ),
-                VSCodeControlTool(
-                    name="check_status",
-                    description="Check if the VS Code extension is running",
-                    endpoint="status"
-                ),
-                VSCodeControlTool(
-                    name="list_windows",
-                    description="Get a list of all open VS Code window titles",
-                    endpoint="listWindows"
-                ),
-                VSCodeControlTool(
-                    name="switch_window",
-                    description="Switch to a specific VS Code window by its title",
-                    endpoint="switchWindow",
-                    params=["title"]
-                ),
-            ]
-
-            self.prompt = ChatPromptTemplate.from_messages([
-                (
-                    "system",
-                    """You are a VS Code control assistant that helps users manage their editor tabs, windows, and navigation.
-                    You have access to several tools to control VS Code through natural language commands.
-                    
-                    Important guidelines:
-                    1. Always check the status first before executing other commands to ensure the extension is running.
-                    
-                    2. When opening files:
-                       - You MUST use the 'path' parameter with the open_file tool
-                       - Example: If user says "open the config file", use open_file(path="config")
-                       - The path can be a partial filename, relative path, or description
-                       - The tool includes automatic file search functionality that will:
-                         * Search for files matching the provided name or description
-                         * Find similar filenames if exact match isn't found
-                         * Search through the entire workspace recursively
-                       - If initial open fails, don't give up - the search will try to find similar files
-                       - Example handling:
-                         * "open the main JavaScript file" -> open_file(path="main.js")
-                         * "open the user config" -> open_file(path="user config")
-                         * "open the API routes" -> open_file(path="api routes")
-                    
-                    3. When switching tabs:
-                       - Use the 'name' parameter with go_to_tab
-                       - Example: go_to_tab(name="index.js")
-                    
-                    4. When going to a specific line:
-                       - Use the 'line' parameter with go_to_line
-                       - Example: go_to_line(line="42")
-                       
-                    5. When managing windows:
-                       - Use list_windows to get available windows first
-                       - Use the 'title' parameter with switch_window
-                       - Example: switch_window(title="project-name - VS Code")
-                       - Window titles should match exactly what's returned by list_windows
-                    
-                    6. For better results:
-                       - First list_open_tabs or get_recent_files if the user's request is ambiguous
-                       - If file not found, try alternative search terms based on the user's description
-                       - Consider file extensions when searching (.js, .py, .json, etc.)
-                       - When switching windows, list available windows first if the target is unclear
-                    
-                    Always provide the required parameters for tools that need them. Never skip parameters that are marked as required in the tool descriptions. If a file isn't found immediately, the built-in search will help find the closest match."""
-                ),
-                ("human", "{input}"),
-                ("placeholder", "{agent_scratchpad}")
-            ])
-
-            self.agent = create_tool_calling_agent(self.llm, self.tools, self.prompt)
-            self.agent_executor = AgentExecutor(
-                agent=self.agent,
-                tools=self.tools,
-                verbose=True
-            )
-
-        async def execute(self, command: str) -> dict:
-            """
-            Execute a natural language command to control VS Code.
-            
-            Args:
-                command (str): Natural language command for VS Code control
-                
-            Returns:
-                dict: Response from the agent executor
-            """
-            return await self.agent_executor.ainvoke({"input": command})
-
-    agent = VSCodeControlAgent(openai_api_key=os.getenv("OPENAI_API_KEY"))
 
 class VSCodeCommandRequest(BaseModel):
     command: str
+    # Workspace name, root folder or port of the VS Code window to control;
+    # the most recently focused window when omitted
+    window: Optional[str] = None
+    # "direct" returns the tool results as soon as the model's tool calls
+    # have run, skipping the model turn that only summarizes them in prose
+    mode: Literal["summarize", "direct"] = "summarize"
+
+def fast_path_response(tool, result: Dict) -> Optional[Dict]:
+    """The /execute response for a fast-path tool result, or None to hand the command to the agent."""
+    if result.get("status") != "error":
+        return {"status": "success", "output": result, "tool": tool.name, "handled_by": "fast_path"}
+    # On other failures (e.g. no file matched) let the agent try rephrasing;
+    # only an extension known to be down makes that pointless
+    if health_for().known_down():
+        return {**result, "tool": tool.name, "handled_by": "fast_path"}
+    return None
+
+# The same command sent again while it runs (shortcut retries, a voice
+# trigger firing twice) waits for the first run instead of repeating it.
+# Only while it runs, so a command sent again after it finished always runs
+# again; and never for fast-path tools whose effect adds up, so "next tab"
+# sent twice reaches the extension twice even when the calls overlap
+execute_flights = SingleFlight("execute", window=0)
+
+# Tools that do something more each time they are called
+CUMULATIVE_TOOLS = {"next_tab", "previous_tab", "close_tab"}
+
+# Tools whose effect a newer call of the same tool replaces outright
+LAST_WINS_TOOLS = {"go_to_line", "go_to_tab", "switch_window"}
+
+def supersede_key(agent, command: str) -> Optional[str]:
+    """
+    Which earlier commands for the same window this one makes pointless:
+    only those running the same last-wins tool. Commands the agent plans
+    never supersede anything, since two of them are as likely to be
+    unrelated ("open foo.py", "go to line 10 in bar.py") as to conflict.
+    """
+    route = agent.router.match(command)
+    if route is None:
+        return None
+    tool, _ = route
+    return tool.name if tool.name in LAST_WINS_TOOLS else None
+
+def coalesces(agent, command: str) -> bool:
+    """Whether an identical /execute call still running may answer this one, see execute_flights."""
+    route = agent.router.match(command)
+    return route is None or route[0].name not in CUMULATIVE_TOOLS
+
+async def run_command(agent, command: str, mode: str = "summarize") -> Dict:
+    try:
+        route = agent.router.match(command)
+        if route:
+            tool, params = route
+            response = fast_path_response(tool, await tool._arun(**params))
+            if response:
+                return response
+
+        direct = mode == "direct"
+        with speculate(command):
+            result = await agent.execute(command, direct=direct)
+        response = {"status": result.get("status", "success"), "output": result["output"],
+                    "handled_by": result.get("handled_by", "agent")}
+        if direct:
+            response["steps"] = result.get("steps", [])
+        if "tier" in result:
+            response["tier"] = result["tier"]
+        return response
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 @app.post("/execute")
 async def execute_command(request: VSCodeCommandRequest) -> Dict:
+    instance = instance_registry.select(request.window)
+    use_instance(instance)
+    agent = await aget_agent()
     if not agent:
         raise HTTPException(status_code=500, detail="VS Code agent not initialized")
-    try:
-        result = await agent.execute(request.command)
-        return {"status": "success", "output": result["output"]}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    if health_for().known_down():
+        raise HTTPException(status_code=503, detail=EXTENSION_DOWN_DETAIL)
+    def scheduled():
+        return command_scheduler.run(
+            instance.server, lambda: run_command(agent, request.command, request.mode),
+            supersede_key=supersede_key(agent, request.command), max_wait=COMMAND_MAX_WAIT,
+        )
+
+    if not coalesces(agent, request.command):
+        return await scheduled()
+    key = (instance.server, CommandRouter.normalize(request.command).lower(), request.mode)
+    return await execute_flights.run(key, scheduled)
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_command(agent, command: str, mode: str = "summarize") -> AsyncIterator[str]:
+    route = agent.router.match(command)
+    if route:
+        tool, params = route
+        yield sse_event("route", {"handled_by": "fast_path"})
+        yield sse_event("intent", {"tools": [{"tool": tool.name, "args": params}]})
+        yield sse_event("tool_start", {"tool": tool.name, "input": params})
+        result = await tool._arun(**params)
+        yield sse_event("tool_end", {"tool": tool.name, "output": result})
+        response = fast_path_response(tool, result)
+        if response:
+            yield sse_event("done", response)
+            return
+
+    yield sse_event("route", {"handled_by": "agent"})
+    with speculate(command):
+        async for event, data in (agent.direct(command) if mode == "direct" else agent.stream(command)):
+            yield sse_event(event, data)
+
+@app.post("/execute/stream")
+async def execute_command_stream(request: VSCodeCommandRequest) -> StreamingResponse:
+    """
+    Same as /execute, but streams progress as Server-Sent Events so the
+    client sees the first tool action instead of waiting for the whole run.
+    """
+    instance = instance_registry.select(request.window)
+    use_instance(instance)
+    agent = await aget_agent()
+    if not agent:
+        raise HTTPException(status_code=500, detail="VS Code agent not initialized")
+    if health_for().known_down():
+        raise HTTPException(status_code=503, detail=EXTENSION_DOWN_DETAIL)
+
+    async def events():
+        # The response is streamed from another task; route it the same way
+        use_instance(instance)
+        try:
+            async with command_scheduler.slot(instance.server, supersede_key(agent, request.command),
+                                              COMMAND_MAX_WAIT) as job:
+                if job.dropped is None:
+                    async for event in stream_command(agent, request.command, request.mode):
+                        yield event
+            if job.dropped is not None:
+                yield sse_event("done", command_scheduler.dropped_result(job))
+        except Exception as e:
+            yield sse_event("done", {"status": "error", "message": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/indexStatus")
+def index_status(window: Optional[str] = None):
+    """
+    Size and generation of the file index and path vectors of each root of
+    a window's workspace (the focused one by default), plus search cache stats.
+    """
+    workspaces = {}
+    for root in instance_registry.select(window).roots or [WORKSPACE_DIR]:
+        vectors = get_path_vector_index(root)
+        workspaces[root] = {
+            **get_file_index(root).stats(),
+            "path_vectors": vectors.stats() if vectors is not None else None,
+        }
+    return {"workspaces": workspaces, "search_cache": search_cache.stats()}
+
+@app.get("/windows")
+def list_windows():
+    """VS Code windows running the extension, most recently focused first."""
+    return {"windows": [instance.to_dict() for instance in instance_registry.instances()]}
+
+@app.get("/scheduler")
+def scheduler_status():
+    """
+    Commands queued per window, and how many were dropped as superseded,
+    stale or rejected. Only fast-path commands for a last-wins tool
+    (LAST_WINS_TOOLS) supersede earlier ones; commands the agent plans are
+    never superseded, and are only dropped once they waited longer than
+    COMMAND_MAX_WAIT.
+    """
+    return command_scheduler.stats()
+
+@app.get("/modelTiers")
+def model_tiers():
+    """Model calls, tokens and latency per tier, and how often the large model had to redo the small one's work."""
+    return tier_stats.stats()
+
+@app.get("/speculation")
+def speculation_status():
+    """File searches started before the agent planned, and how many its open_file calls used."""
+    return speculation_stats.stats()
+
+@app.get("/coalescing")
+def coalescing_status():
+    """Calls per single-flight group and how many were answered by an identical call instead of running."""
+    return {"groups": coalescing_stats()}
+
+@app.get("/planCache")
+def plan_cache_status():
+    """Size and hit rate of the cache of replayable agent tool plans."""
+    return plan_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-stage latency histograms and counters in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/startupReport")
+def get_startup_report():
+    """Import and warm-up cost per module, for tracking cold-start regressions."""
+    return {**startup_report(), "agent_ready": _agent is not None}
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,138 @@
+import asyncio
+import copy
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from metrics import Counter
+
+# Seconds a finished call keeps answering identical calls; 0 only joins calls still in flight
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "1.0"))
+
+COALESCED_CALLS = Counter(
+    "fixflow_coalesced_calls_total",
+    "Calls answered by an identical call in flight (or just finished) instead of running again",
+    ["scope"],
+)
+
+# Every SingleFlight, for the /coalescing endpoint
+GROUPS: List["SingleFlight"] = []
+
+
+class _Call:
+    """One shared call: an asyncio task, or a result filled in by a thread."""
+
+    def __init__(self, task: Optional[asyncio.Task] = None):
+        self.task = task
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished_at: Optional[float] = None
+        # Callers awaiting the task; the last one to be cancelled cancels it
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is running,
+    later calls with the same key wait for it and get a copy of its result
+    instead of doing the work again. A successful result keeps being shared
+    for `window` seconds after it finished, which catches retries and
+    double-fired triggers that arrive just after the first one completed.
+    Failures are shared with the callers already waiting but never reused.
+
+    run() is for coroutines on the event loop; the work runs in its own task,
+    so a caller that goes away doesn't cancel it for the others, only the
+    last caller to be cancelled cancels the work itself. run_sync()
+    is the same for blocking calls made from worker threads. Each caller gets
+    its own deep copy of the result unless `copy_results` is False, for
+    results that are meant to be shared (e.g. an index).
+    """
+
+    def __init__(self, scope: str, window: float = COALESCE_WINDOW, copy_results: bool = True):
+        self.scope = scope
+        self.window = window
+        self.copy_results = copy_results
+        self.calls = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        GROUPS.append(self)
+
+    def _join(self, key: Hashable, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Call]:
+        """
+        The call to share for `key`, if any; drops expired calls. Calls are
+        only shared between threads, or between tasks of the same event
+        loop. Caller holds the lock.
+        """
+        self.calls += 1
+        now = time.monotonic()
+        for stale in [k for k, c in self._calls.items()
+                      if c.finished_at is not None and now - c.finished_at >= self.window]:
+            del self._calls[stale]
+        call = self._calls.get(key)
+        if call is not None and (call.task.get_loop() if call.task else None) is not loop:
+            call = None
+        if call is not None:
+            self.coalesced += 1
+            COALESCED_CALLS.inc(scope=self.scope)
+        return call
+
+    def _finish(self, key: Hashable, call: _Call, failed: bool):
+        with self._lock:
+            call.finished_at = time.monotonic()
+            if (failed or self.window <= 0) and self._calls.get(key) is call:
+                del self._calls[key]
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            call = self._join(key, asyncio.get_running_loop())
+            if call is None:
+                call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+                call.task.add_done_callback(
+                    lambda task: self._finish(key, call, task.cancelled() or task.exception() is not None))
+        call.waiters += 1
+        try:
+            return self._copy(await asyncio.shield(call.task))
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def run_sync(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._join(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            self._finish(key, call, call.error is not None)
+            call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return self._copy(call.result)
+
+    def _copy(self, result: Any) -> Any:
+        return copy.deepcopy(result) if self.copy_results else result
+
+    def stats(self) -> Dict:
+        return {
+            "scope": self.scope,
+            "window_seconds": self.window,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": sum(1 for c in self._calls.values() if c.finished_at is None),
+        }
+
+
+def coalescing_stats() -> List[Dict]:
+    return [group.stats() for group in GROUPS]
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+from filematch import normalize_query
+from filesearch import asearch_workspaces
+from fileindex import WORKSPACE_DIR
+from instances import current_instance
+from metrics import Counter
+from plan_cache import OBSERVATION_TOOLS
+
+# File searches started per command before the agent has planned; 0 turns speculation off
+SPECULATIVE_SEARCHES = int(os.getenv("SPECULATIVE_SEARCHES", "2"))
+
+# "open the config file", "show me app dot py", "edit utils.py and go to line 3", ...
+FILE_VERBS = r"open|edit|show(?: me)?|view|bring up|pull up|load|switch to|go to|jump to"
+FILE_REFERENCE = re.compile(
+    rf"\b(?:{FILE_VERBS})\s+(?:up\s+)?(?:the\s+|my\s+|a\s+)?(?:file\s+)?(?P<term>[\w.\-/ ]+?)"
+    r"(?:\s+(?:file|for me|please))*\s*(?=[,;.!?]?\s*(?:\b(?:and|then|at|on)\b|[,;]|$))",
+    re.IGNORECASE,
+)
+# Things those verbs are also used with that are not files
+NOT_A_FILE = re.compile(r"\b(?:line|lines|tab|tabs|window|windows|terminal|panel|sidebar|settings)\b|^\d+$",
+                        re.IGNORECASE)
+
+SPECULATIVE_SEARCH_OUTCOMES = Counter(
+    "fixflow_speculative_searches_total",
+    "File searches started before the agent planned, by outcome (hit, cancelled, unused), "
+    "and open_file searches no speculation anticipated (miss)",
+    ["outcome"],
+)
+
+
+def file_references(command: str, limit: int = SPECULATIVE_SEARCHES) -> List[str]:
+    """Search terms for the files a command probably asks to open, most likely first."""
+    terms, seen = [], set()
+    for match in FILE_REFERENCE.finditer(command):
+        term = match.group("term").strip()
+        key = normalize_query(term)
+        if not key or key in seen or NOT_A_FILE.search(term):
+            continue
+        seen.add(key)
+        terms.append(term)
+    return terms[:limit]
+
+
+async def search_file(search_term: str) -> Dict:
+    """Find the file closest to `search_term` in the routed window's workspace."""
+    return await asearch_workspaces(
+        directories=current_instance().roots or [WORKSPACE_DIR],
+        search_term=search_term,
+        api_key=os.getenv("OPENAI_API_KEY"),
+    )
+
+
+class _Guess:
+    def __init__(self, term: str, task: "asyncio.Task[Dict]"):
+        self.term = term
+        self.task = task
+        self.used = False
+
+
+class SpeculationStats:
+    """Outcomes of speculative file searches, for the /speculation endpoint."""
+
+    OUTCOMES = ("hit", "miss", "cancelled", "unused")
+
+    def __init__(self):
+        self.started = 0
+        self.outcomes = dict.fromkeys(self.OUTCOMES, 0)
+        self._lock = threading.Lock()
+
+    def start(self, count: int):
+        with self._lock:
+            self.started += count
+
+    def record(self, outcome: str, count: int = 1):
+        if not count:
+            return
+        SPECULATIVE_SEARCH_OUTCOMES.inc(count, outcome=outcome)
+        with self._lock:
+            self.outcomes[outcome] += count
+
+    def stats(self) -> Dict:
+        with self._lock:
+            started, outcomes = self.started, dict(self.outcomes)
+        return {
+            "enabled": SPECULATIVE_SEARCHES > 0,
+            "started": started,
+            **outcomes,
+            "hit_rate": round(outcomes["hit"] / started, 3) if started else None,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+# Searches started for the command the current task is running
+_guesses: ContextVar[Optional[Dict[str, _Guess]]] = ContextVar("speculative_searches", default=None)
+
+
+def _drop(guesses: Dict[str, _Guess], keys: Iterable[str]):
+    """Cancel the unused searches for `keys` that are still running."""
+    cancelled = 0
+    for key in list(keys):
+        guess = guesses[key]
+        if not guess.used and not guess.task.done():
+            guess.task.cancel()
+            del guesses[key]
+            cancelled += 1
+    speculation_stats.record("cancelled", cancelled)
+
+
+def _finish(guesses: Dict[str, _Guess]):
+    _drop(guesses, guesses.keys())
+    unused = 0
+    for guess in guesses.values():
+        if not guess.task.done():
+            # Used, but its command ended (or was superseded) before it
+            guess.task.cancel()
+        elif not guess.used:
+            unused += 1
+            if not guess.task.cancelled():
+                guess.task.exception()
+    speculation_stats.record("unused", unused)
+
+
+@contextmanager
+def speculate(command: str):
+    """
+    Start searching for the files `command` mentions while the agent plans,
+    for the block. resolve_file() hands an open_file call the search started
+    for its path; searches the plan turns out not to need are cancelled by
+    settle() once the model has answered, and at the latest when the block
+    ends.
+    """
+    if _guesses.get() is not None or SPECULATIVE_SEARCHES <= 0:
+        yield
+        return
+    guesses = {}
+    for term in file_references(command):
+        guesses[normalize_query(term)] = _Guess(term, asyncio.ensure_future(search_file(term)))
+    speculation_stats.start(len(guesses))
+    token = _guesses.set(guesses)
+    try:
+        yield
+    finally:
+        _guesses.reset(token)
+        _finish(guesses)
+
+
+def settle(tool_calls: List[Dict[str, Any]]):
+    """
+    Cancel the searches a model turn's tool calls ({"name", "args"} each)
+    show are not needed: those for paths no open_file call asks for, unless
+    the turn only looked at editor state and the model is still deciding.
+    """
+    guesses = _guesses.get()
+    if not guesses:
+        return
+    names = [call.get("name") for call in tool_calls]
+    if names and all(name in OBSERVATION_TOOLS for name in names):
+        return
+    wanted = set()
+    for call in tool_calls:
+        args = call.get("args") or {}
+        if call.get("name") == "open_file":
+            wanted.add(normalize_query(str(args.get("path", ""))))
+        elif call.get("name") == "run_batch":
+            wanted |= {normalize_query(str((step.get("params") or {}).get("path", "")))
+                       for step in args.get("steps") or [] if step.get("tool") == "open_file"}
+    _drop(guesses, [key for key in guesses if key not in wanted])
+
+
+async def resolve_file(search_term: str) -> Dict:
+    """search_file(), answered by the speculative search for the same term when there is one."""
+    guesses = _guesses.get()
+    guess = guesses.get(normalize_query(search_term)) if guesses else None
+    if guess is None:
+        if guesses is not None:
+            speculation_stats.record("miss")
+        return await search_file(search_term)
+    if not guess.used:
+        guess.used = True
+        speculation_stats.record("hit")
+    return await asyncio.shield(guess.task)
@@ -0,0 +1,36 @@
+import importlib
+import sys
+import time
+from types import ModuleType
+from typing import Dict
+
+# Seconds spent per module import / startup step, in the order recorded
+STARTUP_COSTS: Dict[str, float] = {}
+
+
+def record_startup(name: str, seconds: float):
+    STARTUP_COSTS.setdefault(name, seconds)
+
+
+def timed_import(module: str) -> ModuleType:
+    """
+    Import `module` and record how long it took. Dependencies already
+    imported by earlier calls are not counted again, so importing in
+    dependency order gives a per-module breakdown.
+    """
+    already_loaded = module in sys.modules
+    started = time.perf_counter()
+    imported = importlib.import_module(module)
+    if not already_loaded:
+        record_startup(module, time.perf_counter() - started)
+    return imported
+
+
+def startup_report() -> Dict:
+    return {"steps_ms": {name: round(seconds * 1000, 1) for name, seconds in STARTUP_COSTS.items()}}
+
+
+def format_startup_report() -> str:
+    lines = ["Startup cost:"]
+    lines += [f"  {name:<28} {seconds * 1000:8.1f} ms" for name, seconds in STARTUP_COSTS.items()]
+    return "\n".join(lines)
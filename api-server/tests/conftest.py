@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before any test imports the server modules, which read them at import time
+STUB_PORT = 8791
+os.environ["VSCODE_SERVER"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ["WARM_UP"] = "0"
+os.environ["FIXFLOW_INSTANCES_DIR"] = tempfile.mkdtemp()
+os.environ["FILE_INDEX_DIR"] = tempfile.mkdtemp()
+os.environ.setdefault("OPENAI_API_KEY", "test")
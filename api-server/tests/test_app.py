@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app import app
+from bench.stub_extension import running_stub
+from conftest import STUB_PORT
+
+
+def rejecting_stub() -> FastAPI:
+    """An extension whose /batch refuses the request as a whole, as the real one does on a malformed body."""
+    stub = FastAPI()
+
+    @stub.post("/batch")
+    async def batch():
+        return JSONResponse({"status": "error", "command": "batch", "message": "Unexpected token"}, status_code=400)
+
+    return stub
+
+
+def test_batch_runs_steps_in_one_request():
+    with running_stub(STUB_PORT) as stub, TestClient(app) as client:
+        response = client.post("/batch", json={"steps": [
+            {"command": "openFile", "params": {"path": "/w/a.py"}},
+            {"command": "nextTab"},
+        ]})
+        assert response.status_code == 200
+        assert [r["command"] for r in response.json()["results"]] == ["openfile", "nexttab"]
+        assert stub.state.requests == 1
+
+
+def test_batch_rejected_by_the_extension_keeps_its_status():
+    with running_stub(STUB_PORT, app=rejecting_stub()), TestClient(app) as client:
+        response = client.post("/batch", json={"steps": [{"command": "nextTab"}]})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unexpected token"
+
+
+def test_unsupported_batch_command_is_refused():
+    with running_stub(STUB_PORT), TestClient(app) as client:
+        response = client.post("/batch", json={"steps": [{"command": "deleteEverything"}]})
+        assert response.status_code == 400
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import filesearch
+from fileindex import stop_file_indexes
+from filesearch import afind_closest_file, asearch_workspaces, best_search_result
+from modeltiers import MODEL_TIERS
+
+
+class FakeAsyncOpenAI:
+    """Answers chat completions from a list, recording the models asked."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.models = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, **kwargs):
+        self.models.append(model)
+        message = SimpleNamespace(content=json.dumps(self.answers.pop(0)))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    def install(*answers):
+        client = FakeAsyncOpenAI(answers)
+        monkeypatch.setattr(filesearch, "get_async_openai_client", lambda api_key: client)
+        return client
+    return install
+
+
+@pytest.fixture
+def workspaces(tmp_path):
+    roots = []
+    for name, files in (("api", ["app.py", "routes.py"]), ("docs", ["index.md", "settings_panel.md"])):
+        root = tmp_path / name
+        root.mkdir()
+        for file in files:
+            (root / file).write_text("")
+        roots.append(str(root))
+    yield roots
+    stop_file_indexes()
+
+
+def test_a_clear_local_match_does_not_call_the_model(fake_openai):
+    client = fake_openai()
+    result = asyncio.run(afind_closest_file("app dot py", ["/w/app.py", "/w/routes.py"], "key"))
+
+    assert result["full_path"] == "/w/app.py"
+    assert result["matched_by"] == "local"
+    assert client.models == []
+
+
+def test_an_unsure_small_model_answer_is_asked_of_the_large_model(fake_openai):
+    client = fake_openai(
+        {"best_match": "routes.py", "similarity_score": 0.2, "explanation": "guess"},
+        {"best_match": "app.py", "similarity_score": 0.9, "explanation": "entry point"},
+    )
+    result = asyncio.run(afind_closest_file("the server entry point", ["/w/app.py", "/w/routes.py"], "key"))
+
+    assert client.models == [MODEL_TIERS["small"], MODEL_TIERS["large"]]
+    assert result["full_path"] == "/w/app.py"
+    assert result["matched_by"] == "llm"
+
+
+def test_every_workspace_root_is_searched_and_a_local_match_wins(workspaces, fake_openai):
+    # Nothing in the first root resembles the term, so its search asks the model
+    client = fake_openai({"best_match": "routes.py", "similarity_score": 0.95, "explanation": "guess"})
+    result = asyncio.run(asearch_workspaces(workspaces, "settings panel", "key"))
+
+    assert result["full_path"].endswith("docs/settings_panel.md")
+    assert result["matched_by"] == "local"
+    assert client.models == [MODEL_TIERS["small"]]
+
+
+def test_local_matches_beat_model_guesses_then_scores_decide():
+    local = {"full_path": "/a/x.py", "matched_by": "local", "similarity_score": 0.7}
+    guess = {"full_path": "/b/x.py", "matched_by": "llm", "similarity_score": 0.95}
+    error = {"error": "No matching files found in directory", "files_searched": 0}
+
+    assert best_search_result([guess, local]) is local
+    assert best_search_result([guess, dict(guess, similarity_score=0.5)]) is guess
+    assert best_search_result([{"files_searched": 3}, error]) is error
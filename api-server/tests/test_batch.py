@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from bench.stub_extension import StubEditor, running_stub
+from conftest import STUB_PORT
+from vscode_client import close_client, send_batch
+
+
+def legacy_stub(batch_answer: str) -> FastAPI:
+    """
+    An extension build without /batch: "missing" leaves the POST unrouted (405),
+    "not_found" answers it with the extension's unknown-command error.
+    """
+    stub = FastAPI()
+    stub.state.editor = StubEditor()
+    stub.state.editor.tabs = ["/w/a.py", "/w/b.py"]
+    stub.state.editor.active = 0
+    stub.state.gets = []
+
+    if batch_answer == "not_found":
+        @stub.post("/batch")
+        async def batch():
+            return JSONResponse({"status": "error", "command": "batch", "message": "Command not found"}, status_code=500)
+
+    @stub.get("/{command}")
+    async def command(command: str, request: Request):
+        stub.state.gets.append(command)
+        try:
+            return stub.state.editor.run(command.lower(), dict(request.query_params))
+        except (ValueError, KeyError) as e:
+            return JSONResponse({"status": "error", "command": command, "message": str(e)}, status_code=500)
+
+    return stub
+
+
+def run_batch(steps, stop_on_error=True):
+    async def main():
+        try:
+            return await send_batch(steps, stop_on_error)
+        finally:
+            await close_client()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("batch_answer", ["missing", "not_found"])
+def test_extensions_without_batch_get_one_request_per_step(batch_answer):
+    with running_stub(STUB_PORT, app=legacy_stub(batch_answer)) as stub:
+        result = run_batch([{"command": "nextTab"}, {"command": "goToLine", "params": {"line": "3"}}])
+
+    assert stub.state.gets == ["nextTab", "goToLine"]
+    assert result["status"] == "success"
+    assert [r["command"] for r in result["results"]] == ["nexttab", "gotoline"]
+    assert stub.state.editor.active == 1
+
+
+@pytest.mark.parametrize("stop_on_error, sent", [(True, ["bogus"]), (False, ["bogus", "nextTab"])])
+def test_fallback_honours_stop_on_error(stop_on_error, sent):
+    with running_stub(STUB_PORT, app=legacy_stub("missing")) as stub:
+        result = run_batch([{"command": "bogus"}, {"command": "nextTab"}], stop_on_error)
+
+    assert stub.state.gets == sent
+    assert result["status"] == "error"
+    assert result["results"][1]["status"] == ("skipped" if stop_on_error else "success")
+
+
+def test_batch_capable_extension_gets_a_single_post():
+    with running_stub(STUB_PORT) as stub:
+        stub.state.editor.tabs = ["/w/a.py", "/w/b.py"]
+        result = run_batch([{"command": "nextTab"}, {"command": "previousTab"}])
+
+    assert stub.state.requests == 1
+    assert [r["status"] for r in result["results"]] == ["success", "success"]
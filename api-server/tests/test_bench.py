@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from openai import OpenAI
+
+from bench.fake_openai import create_fake_openai_app, pick_tool_call
+from bench.stub_extension import running_stub
+from bench.suite import drive, spoken
+from bench.workspace import file_name, file_path, sample_files
+from conftest import STUB_PORT
+
+FAKE_OPENAI_PORT = STUB_PORT + 1
+TOOLS = ["open_file", "go_to_line", "next_tab", "list_open_tabs"]
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("take me to line 7", {"name": "go_to_line", "arguments": {"line": "7"}}),
+    ("open the user config file", {"name": "open_file", "arguments": {"path": "user config"}}),
+    ("switch to the next tab", {"name": "next_tab", "arguments": {}}),
+    ("what is going on", {"name": "list_open_tabs", "arguments": {}}),
+])
+def test_fake_model_picks_a_plausible_tool(command, expected):
+    assert pick_tool_call(command, TOOLS) == expected
+
+
+@pytest.fixture(scope="module")
+def fake_openai():
+    fake = create_fake_openai_app()
+    with running_stub(FAKE_OPENAI_PORT, app=fake):
+        yield fake, OpenAI(api_key="test", base_url=f"http://127.0.0.1:{FAKE_OPENAI_PORT}/v1")
+
+
+def test_fake_openai_answers_file_matches_and_tool_calls(fake_openai):
+    fake, client = fake_openai
+    before = fake.state.calls
+
+    match = client.chat.completions.create(model="gpt-4o-mini", response_format={"type": "json_object"}, messages=[
+        {"role": "user", "content": 'Pick one of ["app.py","routes.py"]'},
+    ])
+    assert json.loads(match.choices[0].message.content)["best_match"] == "app.py"
+
+    tools = [{"type": "function", "function": {"name": name, "parameters": {"type": "object"}}} for name in TOOLS]
+    turn = client.chat.completions.create(model="gpt-4o", tools=tools, messages=[
+        {"role": "user", "content": "go to line 12"},
+    ])
+    call = turn.choices[0].message.tool_calls[0].function
+    assert (call.name, json.loads(call.arguments)) == ("go_to_line", {"line": "12"})
+    assert fake.state.calls - before == 2
+
+
+def test_fake_openai_streams_tool_calls(fake_openai):
+    _, client = fake_openai
+    tools = [{"type": "function", "function": {"name": "next_tab", "parameters": {"type": "object"}}}]
+    chunks = list(client.chat.completions.create(model="gpt-4o", tools=tools, stream=True, messages=[
+        {"role": "user", "content": "next tab please"},
+    ]))
+    calls = [c.choices[0].delta.tool_calls for c in chunks if c.choices and c.choices[0].delta.tool_calls]
+    assert calls[0][0].function.name == "next_tab"
+    assert chunks[-1].choices[0].finish_reason == "tool_calls"
+
+
+def test_stub_extension_tracks_tabs_and_requests():
+    with running_stub(STUB_PORT) as stub:
+        with httpx.Client(base_url=f"http://127.0.0.1:{STUB_PORT}") as client:
+            client.get("/openFile", params={"path": "/w/a.py"})
+            client.get("/openFile", params={"path": "/w/b.py"})
+            tabs = client.get("/listOpenTabs").json()
+            unknown = client.get("/nope")
+
+    assert stub.state.requests == 4
+    assert stub.state.editor.tabs == ["/w/a.py", "/w/b.py"]
+    assert "b.py" in json.dumps(tabs)
+    assert unknown.status_code == 500
+
+
+def test_workspace_names_are_deterministic():
+    assert file_name(21) == "api_api_0000021.py"
+    assert spoken(21) == "api api 21 dot py"
+    assert file_path("/ws", 1234).endswith("/src/pkg_000/mod_02/" + file_name(1234))
+    assert sample_files("1k", 5) == sample_files("1k", 5)
+
+
+def test_drive_counts_errors_and_summarizes_latencies():
+    async def call(i):
+        await asyncio.sleep(0)
+        if i == 3:
+            raise httpx.ConnectError("refused")
+        return i % 2 == 0
+
+    report = asyncio.run(drive(call, list(range(10)), concurrency=3))
+    assert report["requests"] == 10
+    assert report["errors"] == 5
+    assert report["concurrency"] == 3
@@ -0,0 +1,73 @@
+import pytest
+
+from command_router import COMMAND_PATTERNS, CommandRouter
+
+
+class FakeTool:
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture(scope="module")
+def router():
+    return CommandRouter([FakeTool(name) for name, _ in COMMAND_PATTERNS])
+
+
+def route(router, command):
+    match = router.match(command)
+    return (match[0].name, match[1]) if match else None
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("next tab", ("next_tab", {})),
+    ("Please go to the previous tab.", ("previous_tab", {})),
+    ("close tabs to the right", ("close_tabs_to_right", {})),
+    ("close all tabs", ("close_all_tabs", {})),
+    ("close this tab", ("close_tab", {})),
+    ("go to line 42", ("go_to_line", {"line": "42"})),
+    ("switch to tab app.py", ("go_to_tab", {"name": "app.py"})),
+    ("switch to window api - Visual Studio Code", ("switch_window", {"title": "api - Visual Studio Code"})),
+    ("show me my open tabs", ("list_open_tabs", {})),
+    ("is the extension running", ("check_status", {})),
+])
+def test_simple_commands_route_to_their_tool(router, command, expected):
+    assert route(router, command) == expected
+
+
+@pytest.mark.parametrize("command, path", [
+    ("open app.py", "app.py"),
+    ("open up the file app dot py", "app dot py"),
+    ("open src/components/Button.tsx", "src/components/Button.tsx"),
+    ("open the readme file", "readme"),
+    ("open the user config file", "user config"),
+    ("open file main controller", "main controller"),
+    ("open readme", "readme"),
+])
+def test_file_like_open_commands_take_the_fast_path(router, command, path):
+    assert route(router, command) == ("open_file", {"path": path})
+
+
+@pytest.mark.parametrize("command", [
+    "open a terminal",
+    "open the settings for python",
+    "open the file",
+    "open the file for login",
+    "open a new window",
+    "open the file in src that handles auth",
+    "open the thing where we parse arguments",
+    "open app.py and go to line 3",
+    "close this tab, then the next one",
+    "what does this function do",
+])
+def test_everything_else_goes_to_the_agent(router, command):
+    assert router.match(command) is None
+
+
+def test_only_patterns_for_present_tools_are_used():
+    router = CommandRouter([FakeTool("next_tab")])
+    assert router.match("close all tabs") is None
+    assert router.match("next tab")[0].name == "next_tab"
+
+
+def test_normalize_strips_politeness_and_noise():
+    assert CommandRouter.normalize("  Could you please   next tab please?! ") == "next tab"
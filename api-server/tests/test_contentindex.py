@@ -0,0 +1,120 @@
+import sqlite3
+import time
+
+from contentindex import ContentIndex, content_terms
+from fileindex import FileIndex
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def open_index(tmp_path, name="content.sqlite"):
+    return ContentIndex(str(tmp_path / "src"), str(tmp_path / name))
+
+
+def doc_rows(db_path):
+    with sqlite3.connect(db_path) as db:
+        return db.execute("SELECT path, COUNT(*) FROM docs GROUP BY path").fetchall()
+
+
+def test_content_terms_drop_request_words():
+    assert content_terms("the file where login is defined") == ["login"]
+
+
+def test_search_finds_file_by_contents(tmp_path):
+    auth = write(tmp_path / "src" / "auth.py", "import os\n\ndef check_password(user):\n    return user\n")
+    write(tmp_path / "src" / "other.py", "print('hello')\n")
+    index = open_index(tmp_path)
+    index.sync([auth, str(tmp_path / "src" / "other.py")])
+
+    results = index.search("where check_password is defined")
+
+    assert [r["full_path"] for r in results] == [auth]
+    assert results[0]["line"] == 3
+    assert results[0]["snippet"] == "def check_password(user):"
+    index.close()
+
+
+def test_sync_drops_removed_and_reindexes_edited_files(tmp_path):
+    path = write(tmp_path / "src" / "notes.md", "alpha bravo\n")
+    index = open_index(tmp_path)
+    index.sync([path])
+    assert index.search("bravo")
+
+    write(tmp_path / "src" / "notes.md", "charlie delta, now longer\n")
+    index.sync([path])
+    assert not index.search("bravo")
+    assert index.search("charlie")
+
+    index.sync([])
+    assert len(index) == 0
+    assert not index.search("charlie")
+    index.close()
+
+
+def test_two_processes_share_one_database(tmp_path):
+    paths = [write(tmp_path / "src" / f"m{i}.py", f"value_{i} = {i}\n") for i in range(20)]
+    first, second = open_index(tmp_path), open_index(tmp_path)
+
+    first.sync(paths)
+    second.sync(paths)
+    write(tmp_path / "src" / "m0.py", "renamed_value = 0  # edited\n")
+    second.sync(paths)
+    first.sync(paths)
+
+    assert len(doc_rows(first.db_path)) == 20
+    assert all(count == 1 for _, count in doc_rows(first.db_path))
+    assert [r["full_path"] for r in first.search("renamed_value")] == [paths[0]]
+    assert not first.search("value_0")
+    first.close()
+    second.close()
+
+
+def test_follow_applies_watcher_changes(tmp_path):
+    write(tmp_path / "src" / "a.py", "first_symbol = 1\n")
+    files = FileIndex(str(tmp_path / "src"), ["py"])
+    files.build()
+    index = open_index(tmp_path).follow(files)
+    assert index.ready.wait(5)
+    assert index.search("first_symbol")
+
+    files.add(write(tmp_path / "src" / "b.py", "second_symbol = 2\n"))
+    assert wait_for(lambda: index.search("second_symbol"))
+    files.discard(str(tmp_path / "src" / "a.py"))
+    assert wait_for(lambda: not index.search("first_symbol"))
+    index.close()
+
+
+class _BrokenIndex:
+    """A FileIndex whose first listing fails."""
+
+    def __init__(self, files):
+        self.files = files
+
+    def subscribe(self, listener):
+        self.files.subscribe(listener)
+
+    def paths(self):
+        raise OSError("listing failed")
+
+
+def test_follower_survives_a_failed_initial_sync(tmp_path):
+    files = FileIndex(str(tmp_path / "src"), ["py"])
+    (tmp_path / "src").mkdir()
+    files.build()
+    index = open_index(tmp_path).follow(_BrokenIndex(files))
+    assert index.ready.wait(5)
+
+    files.add(write(tmp_path / "src" / "late.py", "late_symbol = 1\n"))
+    assert wait_for(lambda: index.search("late_symbol"))
+    index.close()
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from langchain_core.agents import AgentActionMessageLog, AgentFinish
+
+import control_agent
+from control_agent import VSCodeControlAgent, summarize_steps
+from plan_cache import PlanCache
+
+OK = {"status": "success"}
+
+
+class FakePlanner:
+    """Answers every tool-calling turn with the same decision, counting the turns."""
+
+    def __init__(self, decision):
+        self.decision = decision
+        self.turns = 0
+
+    async def ainvoke(self, inputs):
+        self.turns += 1
+        return self.decision
+
+
+class FakeTool:
+    def __init__(self, name, result, params=()):
+        self.name = name
+        self.result = result
+        self.params = list(params)
+        self.calls = []
+
+    async def _arun(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.result
+
+
+def action(tool, tool_input):
+    return AgentActionMessageLog(tool=tool, tool_input=tool_input, log="", message_log=[])
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = VSCodeControlAgent("test")
+    monkeypatch.setattr(control_agent, "plan_cache", PlanCache())
+
+    async def no_context(kinds):
+        return {kind: "t1" for kind in kinds}
+
+    monkeypatch.setattr(agent, "_context", no_context)
+    return agent
+
+
+def run_direct(agent, command, decisions, tools):
+    agent.planners = {tier: FakePlanner(decision) for tier, decision in decisions.items()}
+    agent.tools_by_name = {tool.name: tool for tool in tools}
+
+    async def main():
+        return [event async for event in agent.direct(command)]
+
+    return asyncio.run(main())
+
+
+def test_summary_uses_messages_then_tool_status():
+    assert summarize_steps([
+        {"tool": "open_file", "result": {"status": "success", "message": "Opened app.py"}},
+        {"tool": "next_tab", "result": {"status": "success"}},
+        {"tool": "get_vscode_windows", "result": ["a", "b"]},
+    ]) == "Opened app.py; next_tab: success; get_vscode_windows: success"
+
+
+def test_direct_mode_takes_one_model_turn_and_returns_tool_results(agent):
+    go_to_line = FakeTool("go_to_line", {"status": "success", "message": "Moved to line 3"}, params=["line"])
+    events = run_direct(agent, "go to line 3", {"small": [action("go_to_line", "3")]}, [go_to_line])
+
+    assert [event for event, _ in events] == ["intent", "tool_start", "tool_end", "done"]
+    assert go_to_line.calls == [{"line": "3"}]
+    assert agent.planners["small"].turns == 1
+    done = events[-1][1]
+    assert done["output"] == "Moved to line 3"
+    assert done["steps"] == [{"tool": "go_to_line", "args": "3", "result": go_to_line.result}]
+    assert done["tier"] == "small"
+    assert control_agent.plan_cache.get("go to line 3", {})["output"] == "Moved to line 3"
+
+
+def test_a_reply_without_tools_is_the_output(agent):
+    # Chained, so it starts on the large model
+    events = run_direct(agent, "hi, what can you do", {"large": AgentFinish({"output": "Hi!"}, "")}, [])
+
+    assert events == [("done", {"status": "success", "output": "Hi!", "steps": [], "handled_by": "agent", "tier": "large"})]
+
+
+def test_small_model_that_does_nothing_is_escalated(agent):
+    close_tab = FakeTool("close_tab", OK)
+    events = run_direct(agent, "shut it", {
+        "small": AgentFinish({"output": "What?"}, ""),
+        "large": [action("close_tab", {})],
+    }, [close_tab])
+
+    assert ("escalate", {"from": "small", "to": "large", "reason": "no_action"}) in events
+    assert events[-1][1]["tier"] == "large"
+    assert events[-1][1]["output"] == "close_tab: success"
+    assert len(close_tab.calls) == 1
+
+
+def test_unknown_tool_is_reported_as_an_error(agent):
+    events = run_direct(agent, "do the thing", {"small": [action("summon", {})], "large": [action("summon", {})]}, [])
+
+    done = events[-1][1]
+    assert done["status"] == "error"
+    assert done["output"] == "Unknown tool: summon"
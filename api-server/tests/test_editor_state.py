@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from bench.stub_extension import running_stub
+from conftest import STUB_PORT
+from editor_state import EditorStateMirror, _mirrors, parse_sse
+from shortcuts import app
+from vscode_client import VSCODE_SERVER, close_client
+
+
+def test_default_mirror_listens_after_startup():
+    # Other tests' apps may have run (and stopped) the same mirror before
+    connects = _mirrors[VSCODE_SERVER].connects if VSCODE_SERVER in _mirrors else 0
+    with running_stub(STUB_PORT), TestClient(app):
+        mirror = _mirrors[VSCODE_SERVER]
+        assert mirror.listening
+        deadline = time.monotonic() + 5
+        while not mirror.live and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert mirror.live
+        assert mirror.connects == connects + 1
+
+
+TABS = [
+    {"label": "App.py", "path": "/w/App.py"},
+    {"label": "app.py", "path": "/w/lib/app.py"},
+    {"label": "README.md", "path": "/w/README.md"},
+]
+
+
+def test_parse_sse_joins_data_lines_and_skips_comments():
+    assert parse_sse([": keep-alive"]) is None
+    assert parse_sse(["event: state", "data: {", "data:}"]) == {"event": "state", "data": "{\n}"}
+    assert parse_sse(["data: x"]) == {"event": "message", "data": "x"}
+
+
+def test_tab_names_resolve_exact_then_case_then_stem():
+    assert EditorStateMirror.resolve_tab("app.py", TABS)["path"] == "/w/lib/app.py"
+    assert EditorStateMirror.resolve_tab("APP.PY", TABS)["path"] == "/w/App.py"
+    assert EditorStateMirror.resolve_tab("readme", TABS)["path"] == "/w/README.md"
+    assert EditorStateMirror.resolve_tab("setup", TABS) is None
+
+
+def run_with_mirror(scenario):
+    """Run `scenario(mirror)` on the event loop against the stub; the mirror only listens if asked to."""
+    async def main():
+        mirror = EditorStateMirror(VSCODE_SERVER)
+        try:
+            return await scenario(mirror)
+        finally:
+            await mirror.stop()
+            await close_client()
+    return asyncio.run(main())
+
+
+async def wait_live(mirror, condition=lambda mirror: True):
+    deadline = time.monotonic() + 5
+    while not (mirror.live and condition(mirror)) and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+    assert mirror.live and condition(mirror)
+
+
+def test_without_the_event_channel_reads_poll_the_extension():
+    with running_stub(STUB_PORT) as stub:
+        stub.state.editor.open("/w/a.py")
+
+        async def scenario(mirror):
+            tabs = await mirror.list_open_tabs()
+            return tabs, await mirror.go_to_tab("nothing")
+
+        tabs, missing = run_with_mirror(scenario)
+
+    assert [tab["path"] for tab in tabs["tabs"]] == ["/w/a.py"]
+    assert missing["status"] == "error"
+    assert stub.state.requests == 2
+
+
+def test_live_mirror_follows_pushed_snapshots_without_round_trips():
+    with running_stub(STUB_PORT) as stub:
+        stub.state.editor.open("/w/a.py")
+
+        async def scenario(mirror):
+            mirror.start()
+            await wait_live(mirror)
+            stub.state.editor.open("/w/b.py")
+            stub.state.editor.publish()
+            await wait_live(mirror, lambda mirror: mirror.active_path == "/w/b.py")
+            requests = stub.state.requests
+            tabs = await mirror.list_open_tabs()
+            recent = await mirror.get_recent_files()
+            missing = await mirror.go_to_tab("c.py")
+            return tabs, recent, missing, stub.state.requests - requests
+
+        tabs, recent, missing, requests = run_with_mirror(scenario)
+
+    assert [tab["path"] for tab in tabs["tabs"]] == ["/w/a.py", "/w/b.py"]
+    assert [f["path"] for f in recent["files"]] == ["/w/a.py", "/w/b.py"]
+    assert missing["status"] == "error"
+    assert requests == 0
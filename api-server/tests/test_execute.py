@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.stub_extension import create_stub_app, running_stub
+from conftest import STUB_PORT
+from shortcuts import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    stub = create_stub_app(latency=0.2)
+    stub.state.editor.tabs = ["/w/a.py", "/w/b.py", "/w/c.py"]
+    stub.state.editor.active = 0
+    with running_stub(STUB_PORT, app=stub), TestClient(app) as client:
+        client.stub = stub
+        yield client
+
+
+def send_at_once(client, command, count):
+    """POST `command` to /execute `count` times concurrently; (responses, extension requests)."""
+    before = client.stub.state.requests
+    with ThreadPoolExecutor(count) as pool:
+        responses = list(pool.map(lambda _: client.post("/execute", json={"command": command}), range(count)))
+    return responses, client.stub.state.requests - before
+
+
+def test_cumulative_commands_sent_at_once_all_reach_the_extension(client):
+    responses, requests = send_at_once(client, "next tab", 4)
+
+    assert all(r.json()["status"] == "success" for r in responses)
+    assert requests == 4
+    assert client.stub.state.editor.active == 1
+
+
+def test_identical_commands_sent_at_once_run_once(client):
+    responses, requests = send_at_once(client, "close all tabs", 4)
+
+    assert all(r.json()["status"] == "success" for r in responses)
+    assert requests == 1
+
+
+def test_command_sent_again_after_it_finished_runs_again(client):
+    before = client.stub.state.requests
+    for _ in range(2):
+        assert client.post("/execute", json={"command": "close all tabs"}).json()["status"] == "success"
+    assert client.stub.state.requests - before == 2
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+import fileindex
+from fileindex import FileIndex, path_hash
+
+
+def write(path, text=""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ("app.py", "README.md", "data.csv", "pkg/util.py", "node_modules/x/index.py"):
+        write(tmp_path / name)
+    return tmp_path
+
+
+def test_build_lists_matching_files(tree):
+    index = FileIndex(str(tree), ["py", "md"])
+    index.build()
+
+    assert sorted(os.path.relpath(p, tree) for p in index.paths()) == ["README.md", "app.py", "pkg/util.py"]
+    assert str(tree / "app.py") in index
+    assert index.generation == 1
+
+
+def test_fingerprint_depends_only_on_the_files(tree):
+    index = FileIndex(str(tree), ["py"])
+    index.build()
+    built = index.fingerprint
+    assert built == path_hash(str(tree / "app.py")) ^ path_hash(str(tree / "pkg" / "util.py"))
+
+    index.add(write(tree / "new.py"))
+    index.discard(str(tree / "new.py"))
+
+    assert index.fingerprint == built
+    assert index.generation == 3
+
+
+def test_changes_are_filtered_and_reported_to_listeners(tree):
+    index = FileIndex(str(tree), ["py"])
+    index.build()
+    events = []
+    index.subscribe(lambda changed, removed: events.append((changed, removed)))
+
+    index.add(write(tree / "notes.txt"))
+    index.add(write(tree / "node_modules" / "y.py"))
+    index.add(write(tree / "b.py"))
+    index.modified(str(tree / "app.py"))
+    index.discard_tree(str(tree / "pkg"))
+
+    assert events == [
+        ({str(tree / "b.py")}, set()),
+        ({str(tree / "app.py")}, set()),
+        (set(), {str(tree / "pkg" / "util.py")}),
+    ]
+
+
+def test_paths_list_is_reused_until_the_index_changes(tree):
+    index = FileIndex(str(tree), ["py"])
+    index.build()
+    first = index.paths()
+    assert index.paths() is first
+
+    index.add(write(tree / "c.py"))
+    assert index.paths() is not first
+
+
+@pytest.mark.parametrize("watcher", ["watchdog", "polling"])
+def test_watcher_applies_filesystem_changes(tree, monkeypatch, watcher):
+    if watcher == "polling":
+        monkeypatch.setattr(fileindex, "Observer", None)
+    elif fileindex.Observer is None:
+        pytest.skip("watchdog is not installed")
+    index = FileIndex(str(tree), ["py"], poll_interval=0.05).start()
+    try:
+        assert index.watcher == watcher
+        created = write(tree / "pkg" / "created.py")
+        assert wait_for(lambda: created in index)
+
+        os.rename(created, tree / "pkg" / "renamed.py")
+        assert wait_for(lambda: str(tree / "pkg" / "renamed.py") in index and created not in index)
+
+        write(tree / ".gitignore", "pkg/\n")
+        assert wait_for(lambda: not any(p.startswith(str(tree / "pkg")) for p in index.paths()))
+    finally:
+        index.stop()
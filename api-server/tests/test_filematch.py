@@ -0,0 +1,62 @@
+import pytest
+
+from filematch import confident_match, normalize_query, rank_files, score_name
+
+FILES = [
+    "/w/app.py",
+    "/w/app.md",
+    "/w/filesearch.py",
+    "/w/search.py",
+    "/w/config/user_config.yml",
+    "/w/src/components/UserProfile.tsx",
+    "/w/other/app.py",
+]
+
+
+@pytest.mark.parametrize("spoken, query", [
+    ("open app dot pi file", "app.pi"),
+    ("open the config file", "config"),
+    ("open the file config", "config"),
+    ("file search", "file search"),
+    ("the file", "file"),
+    ("user underscore config dot yml", "user_config.yml"),
+    ("Show me the README", "readme"),
+])
+def test_normalize_query(spoken, query):
+    assert normalize_query(spoken) == query
+
+
+@pytest.mark.parametrize("query, name, tier", [
+    ("app.py", "app.py", "exact"),
+    ("app.py", "App.py", "case-insensitive"),
+    ("app", "app.py", "stem"),
+    ("app.pi", "app.py", "phonetic"),
+    ("sealch", "search.py", "edit-distance"),
+    ("user profile", "UserProfile.tsx", "stem"),
+    ("config user", "user_config.yml", "token"),
+    ("usrcfg", "user_config.yml", "subsequence"),
+])
+def test_score_name_tiers(query, name, tier):
+    assert score_name(query, name)["tier"] == tier
+
+
+def test_unrelated_name_does_not_score():
+    assert score_name("app", "zebra.py") is None
+
+
+def test_file_is_part_of_the_name():
+    best = rank_files("file search", FILES)[0]
+    assert best["name"] == "filesearch.py"
+    assert confident_match(rank_files("file search", FILES)) == best
+
+
+def test_rank_collapses_duplicate_basenames_to_first_path():
+    ranked = rank_files("app.py", FILES)
+    assert [c["full_path"] for c in ranked if c["name"] == "app.py"] == ["/w/app.py"]
+
+
+def test_confident_match_needs_a_margin():
+    assert confident_match(rank_files("app dot py", FILES))["full_path"] == "/w/app.py"
+    # "app" matches app.py and app.md equally well
+    assert confident_match(rank_files("app", FILES)) is None
+    assert confident_match([]) is None
@@ -0,0 +1,63 @@
+import json
+import time
+
+from filesearch import SearchCache
+
+RESULT = {"name": "app.py", "full_path": "/w/app.py"}
+
+
+def test_hit_needs_same_normalized_term_and_file_set():
+    cache = SearchCache(path=None)
+    cache.put(cache.make_key("/w", "open app dot py", 1), RESULT)
+
+    assert cache.get(cache.make_key("/w", "App dot py file", 1)) == RESULT
+    assert cache.get(cache.make_key("/w", "app dot py", 2)) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_result_for_a_file_no_longer_indexed_is_invalidated():
+    cache = SearchCache(path=None)
+    key = cache.make_key("/w", "app", 1)
+    cache.put(key, RESULT)
+
+    assert cache.get(key, known_paths={"/w/other.py"}) is None
+    assert len(cache) == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_expired_entries_and_lru_eviction():
+    cache = SearchCache(max_entries=2, ttl=0.05, path=None)
+    keys = [cache.make_key("/w", name, 1) for name in ("a", "b", "c")]
+    for key in keys:
+        cache.put(key, RESULT)
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get(keys[2]) is None
+
+
+def test_puts_are_saved_in_the_background(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = SearchCache(path=str(path), save_delay=0.1)
+    for name in ("a", "b", "c"):
+        cache.put(cache.make_key("/w", name, 1), RESULT)
+    assert not path.exists()
+
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(json.loads(path.read_text())) == 3
+    assert cache.stats()["saves"] == 1
+
+
+def test_flush_saves_pending_changes_and_reload_restores_them(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SearchCache(path=path, save_delay=60)
+    key = cache.make_key("/w", "app", 1)
+    cache.put(key, RESULT)
+    cache.flush()
+    cache.flush()
+    assert cache.stats()["saves"] == 1
+
+    assert SearchCache(path=path).get(key) == RESULT
@@ -0,0 +1,97 @@
+import os
+import time
+
+import pytest
+
+from filesnapshot import RACY_WINDOW_NS, FileSnapshot
+from scanner import DirectoryScanner
+
+
+def write(path, text=""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def age(root):
+    """Move recently changed directories' mtimes out of the racy window, as if edited a while ago."""
+    now = time.time_ns()
+    past = now - 3600 * 10 ** 9
+    for directory, _, _ in os.walk(root):
+        if now - os.stat(directory).st_mtime_ns < RACY_WINDOW_NS:
+            os.utime(directory, ns=(past, past))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "ws"
+    for name in ("app.py", "pkg/util.py", "pkg/sub/deep.py", "docs/readme.md"):
+        write(root / name)
+    age(root)
+    return root
+
+
+def open_snapshot(tmp_path, root, extensions=("py",)):
+    return FileSnapshot(str(tmp_path / "snapshot.sqlite"), str(root), DirectoryScanner(list(extensions)))
+
+
+def relative(root, paths):
+    return sorted(os.path.relpath(path, root) for path in paths)
+
+
+def test_first_sync_walks_and_later_syncs_only_stat(tmp_path, tree):
+    snapshot = open_snapshot(tmp_path, tree)
+    assert relative(tree, snapshot.sync()) == ["app.py", "pkg/sub/deep.py", "pkg/util.py"]
+    assert snapshot.last_sync["rebuilt"]
+
+    assert relative(tree, snapshot.sync()) == ["app.py", "pkg/sub/deep.py", "pkg/util.py"]
+    assert snapshot.last_sync["directories_listed"] == 0
+    assert snapshot.sync(reload=False) is None
+
+
+def test_only_changed_directories_are_listed_again(tmp_path, tree):
+    snapshot = open_snapshot(tmp_path, tree)
+    snapshot.sync()
+
+    write(tree / "pkg" / "sub" / "new.py")
+    age(tree)
+
+    assert "pkg/sub/new.py" in relative(tree, snapshot.sync())
+    assert not snapshot.last_sync["rebuilt"]
+    assert snapshot.last_sync["directories_listed"] == 1
+
+
+def test_edited_ignore_file_relists_its_subtree(tmp_path, tree):
+    snapshot = open_snapshot(tmp_path, tree)
+    snapshot.sync()
+
+    write(tree / "pkg" / ".gitignore", "sub/\n")
+    age(tree)
+
+    assert relative(tree, snapshot.sync()) == ["app.py", "pkg/util.py"]
+    assert not snapshot.last_sync["rebuilt"]
+
+
+def test_another_process_starts_from_the_stored_table(tmp_path, tree):
+    open_snapshot(tmp_path, tree).sync()
+
+    other = open_snapshot(tmp_path, tree)
+    assert len(other.sync()) == 3
+    assert other.last_sync["directories_listed"] == 0
+
+
+def test_different_extensions_rebuild_the_table(tmp_path, tree):
+    open_snapshot(tmp_path, tree).sync()
+
+    snapshot = open_snapshot(tmp_path, tree, extensions=("md",))
+    assert relative(tree, snapshot.sync()) == ["docs/readme.md"]
+    assert snapshot.last_sync["rebuilt"]
+
+
+def test_recently_changed_directories_are_listed_again(tmp_path, tree):
+    snapshot = open_snapshot(tmp_path, tree)
+    write(tree / "late.py")
+    snapshot.sync()
+
+    # The root changed within the racy window, so it is not trusted yet
+    assert "late.py" in relative(tree, snapshot.sync())
+    assert snapshot.last_sync["directories_listed"] >= 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import health
+from bench.stub_extension import running_stub
+from conftest import STUB_PORT
+from health import ExtensionHealth, health_for
+from vscode_client import VSCODE_SERVER, close_client, routed_to
+
+
+def test_circuit_opens_after_repeated_failures_and_lets_one_trial_through(monkeypatch):
+    monkeypatch.setattr(health, "FAILURE_THRESHOLD", 2)
+    monitor = ExtensionHealth("http://127.0.0.1:1")
+    monitor.record_failure(ConnectionError("refused"))
+    assert monitor.allow_request()
+
+    monitor.record_failure(ConnectionError("refused"))
+    assert monitor.circuit_open and monitor.known_down()
+    assert not monitor.allow_request()
+
+    monitor.circuit_open_until = 0.0
+    assert monitor.allow_request()
+    assert not monitor.allow_request()
+
+    monitor.record_success()
+    assert monitor.allow_request() and not monitor.circuit_open
+    assert monitor.status()["status"] == "connected"
+
+
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(health, "HEARTBEAT_INTERVAL", 1.0)
+    monkeypatch.setattr(health, "HEARTBEAT_MAX_BACKOFF", 5.0)
+    monitor = ExtensionHealth()
+    backoffs = []
+    for _ in range(5):
+        backoffs.append(monitor.backoff)
+        monitor.record_failure(TimeoutError())
+
+    assert backoffs == [1.0, 1.0, 2.0, 4.0, 5.0]
+    assert monitor.last_error == "TimeoutError"
+
+
+@pytest.mark.parametrize("server, up", [(VSCODE_SERVER, True), ("http://127.0.0.1:1", False)])
+def test_probe_records_whether_the_extension_answers(server, up):
+    async def main():
+        monitor = ExtensionHealth(server)
+        result = await monitor.probe()
+        await close_client()
+        return monitor, result
+
+    with running_stub(STUB_PORT):
+        monitor, result = asyncio.run(main())
+
+    assert result is up
+    assert monitor.state == ("connected" if up else "disconnected")
+
+
+def test_each_server_has_its_own_state():
+    with routed_to("http://127.0.0.1:3999"):
+        other = health_for()
+    assert other is health_for("http://127.0.0.1:3999")
+    assert other is not health.extension_health
+    assert health_for() is health.extension_health
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from instances import DEFAULT_INSTANCE, InstanceRegistry, current_instance, use_instance
+from vscode_client import current_server
+
+DEAD_PID = 2 ** 22 + 12345
+
+
+def register(directory, port, name, roots, focused_at=0.0, pid=None):
+    record = {"port": port, "name": name, "roots": roots, "focusedAt": focused_at, "pid": pid or os.getpid()}
+    (directory / f"{port}.json").write_text(json.dumps(record))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    register(tmp_path, 3001, "api", ["/w/api", "/w/shared"], focused_at=1.0)
+    register(tmp_path, 3002, "web", ["/w/web", "/w/api/frontend"], focused_at=2.0)
+    register(tmp_path, 3003, "gone", ["/w/gone"], focused_at=3.0, pid=DEAD_PID)
+    (tmp_path / "notes.txt").write_text("")
+    (tmp_path / "broken.json").write_text("{")
+    return InstanceRegistry(str(tmp_path))
+
+
+def test_live_instances_most_recently_focused_first(registry):
+    assert [instance.name for instance in registry.instances()] == ["web", "api"]
+    assert registry.focused().server == "http://localhost:3002"
+    assert registry.select().name == "web"
+
+
+@pytest.mark.parametrize("window, name", [
+    ("API", "api"),
+    ("3001", "api"),
+    ("shared", "api"),
+    ("/w/api/src/app.py", "api"),
+    ("/w/api/frontend/index.md", "web"),
+])
+def test_windows_are_found_by_name_port_root_or_path(registry, window, name):
+    assert registry.select(window).name == name
+
+
+def test_unknown_window_is_a_404(registry):
+    with pytest.raises(HTTPException) as raised:
+        registry.select("gone")
+    assert raised.value.status_code == 404
+
+
+def test_records_are_reread_when_the_directory_changes(registry, tmp_path):
+    assert registry.roots() == ["/w/web", "/w/api/frontend", "/w/api", "/w/shared"]
+    register(tmp_path, 3004, "docs", ["/w/docs"], focused_at=4.0)
+    stat = os.stat(tmp_path)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert registry.focused().name == "docs"
+
+
+def test_default_instance_without_registrations(tmp_path):
+    registry = InstanceRegistry(str(tmp_path / "missing"))
+    assert registry.instances() == [DEFAULT_INSTANCE]
+    assert registry.find("default") is DEFAULT_INSTANCE
+    assert registry.find("api") is None
+
+
+def test_use_instance_routes_the_current_context(registry):
+    instance = registry.select("api")
+    use_instance(instance)
+    try:
+        assert current_instance() is instance
+        assert current_server() == "http://localhost:3001"
+    finally:
+        use_instance(DEFAULT_INSTANCE)
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Histogram, ServerTimingMiddleware, format_server_timing, render_metrics, timed
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+
+
+def test_counter_series_per_label_with_escaping():
+    calls = Counter("calls_total", "Calls", ["tool"])
+    calls.inc(tool="open_file")
+    calls.inc(2, tool='say "hi"\n')
+
+    assert render_metrics().splitlines() == [
+        "# HELP calls_total Calls",
+        "# TYPE calls_total counter",
+        'calls_total{tool="open_file"} 1.0',
+        'calls_total{tool="say \\"hi\\"\\n"} 2.0',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    lines = latency.render()
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_timed_counts_stages_that_raise(monkeypatch):
+    errors = Counter("errors_total", "Errors", ["stage"])
+    monkeypatch.setattr(metrics, "STAGE_ERRORS", errors)
+    with pytest.raises(ValueError), timed("file_rank"):
+        raise ValueError
+
+    assert errors.render()[-1] == 'errors_total{stage="file_rank"} 1.0'
+
+
+def test_server_timing_sums_repeated_stages():
+    header = format_server_timing([("agent_llm", 0.2), ("tool", 0.01), ("agent_llm", 0.3)], 0.6)
+    assert header == 'agent_llm;dur=500.0;desc="2 calls", tool;dur=10.0, total;dur=600.0'
+
+
+def test_middleware_reports_the_request_stages(monkeypatch):
+    durations = Histogram("http_seconds", "HTTP", ["method", "route", "status"])
+    monkeypatch.setattr(metrics, "HTTP_DURATION", durations)
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/items/{item}")
+    def item(item: str):
+        with timed("file_walk"):
+            time.sleep(0.01)
+        return {"item": item}
+
+    with TestClient(app) as client:
+        response = client.get("/items/1")
+
+    stages = [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+    assert stages == ["file_walk", "total"]
+    assert 'http_seconds_count{method="GET",route="/items/{item}",status="200"} 1' in durations.render()
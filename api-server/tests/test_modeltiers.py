@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+import modeltiers
+from control_agent import VSCodeControlAgent
+from filesearch import build_match_request, fit_names
+from modeltiers import (MODEL_TIERS, TierStats, candidates_tier, command_tier, estimate_tokens, model_call,
+                        tier_of, usage_tokens)
+
+
+@pytest.mark.parametrize("command, tier", [
+    ("go to the readme", "small"),
+    ("close this tab and open app.py", "large"),
+    ("open app.py, then go to line 3", "large"),
+    ("please find the file where we configure logging for the background worker processes at startup", "large"),
+])
+def test_command_tier(command, tier):
+    assert command_tier(command) == tier
+
+
+def test_candidate_count_and_model_name_tiers():
+    assert candidates_tier(modeltiers.SMALL_MAX_CANDIDATES) == "small"
+    assert candidates_tier(modeltiers.SMALL_MAX_CANDIDATES + 1) == "large"
+    assert tier_of(MODEL_TIERS["large"]) == "large"
+    assert tier_of(MODEL_TIERS["small"]) == "small"
+
+
+def test_usage_from_openai_and_langchain_shapes():
+    assert usage_tokens(SimpleNamespace(prompt_tokens=10, completion_tokens=2)) == (10, 2)
+    assert usage_tokens({"input_tokens": 7, "output_tokens": 1}) == (7, 1)
+    assert usage_tokens(None) == (0, 0)
+
+
+def test_model_calls_are_recorded_per_scope_and_tier(monkeypatch):
+    stats = TierStats()
+    monkeypatch.setattr(modeltiers, "tier_stats", stats)
+    with model_call("file_match", "small") as call:
+        call.usage = SimpleNamespace(prompt_tokens=100, completion_tokens=5)
+    stats.escalate("file_match", "low_confidence")
+
+    report = stats.stats()
+    assert report["tiers"]["file_match.small"]["calls"] == 1
+    assert report["tiers"]["file_match.small"]["prompt_tokens"] == 100
+    assert report["escalations"] == {"file_match.low_confidence": 1}
+
+
+def test_names_are_cut_to_the_prompt_budget():
+    names = [f"module_{i:04d}.py" for i in range(100)]
+    fitted = fit_names(names, max_tokens=50)
+
+    assert fitted == names[:len(fitted)]
+    assert 0 < len(fitted) < len(names)
+    assert estimate_tokens(str(fitted)) <= 50
+
+
+def test_long_candidate_lists_go_to_the_large_model(monkeypatch):
+    monkeypatch.setattr(modeltiers, "SMALL_MAX_CANDIDATES", 5)
+    few = [f"/w/notes_{i}.md" for i in range(3)]
+    many = [f"/w/notes_{i}.md" for i in range(30)]
+
+    assert build_match_request("quarterly report", few)[1]["model"] == MODEL_TIERS["small"]
+    assert build_match_request("quarterly report", many)[1]["model"] == MODEL_TIERS["large"]
+
+
+@pytest.fixture(scope="module")
+def agent():
+    return VSCodeControlAgent("test")
+
+
+@pytest.mark.parametrize("tier, steps, reason", [
+    ("small", [], "no_action"),
+    ("small", [("list_open_tabs", {"status": "success"}), ("go_to_tab", {"status": "error"})], "tool_failure"),
+    ("small", [("close_tab", {"status": "success"}), ("go_to_tab", {"status": "error"})], None),
+    ("large", [], None),
+])
+def test_small_agent_runs_are_redone_only_before_the_editor_changed(agent, tier, steps, reason):
+    assert agent.escalation_reason(tier, steps) == reason
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+
+import pytest
+
+from pathvectors import Embedder, HashingEmbedder, PathVectorIndex, numpy_available, path_words
+
+pytestmark = pytest.mark.skipif(not numpy_available(), reason="numpy is not installed")
+
+PATHS = [
+    "/w/src/auth/login_handler.py",
+    "/w/src/auth/logout.py",
+    "/w/src/billing/invoice.py",
+    "/w/docs/userConfig.md",
+    "/w/tests/test_invoice.py",
+]
+
+
+def open_index(tmp_path, embedder=None):
+    return PathVectorIndex("/w", embedder or HashingEmbedder(64), str(tmp_path / "vectors"))
+
+
+def rows(index):
+    """{path: row} with the row's vector checked against a fresh embedding."""
+    import numpy as np
+    for path, row in index._row_of.items():
+        assert np.allclose(index._vectors[row], index.embedder.embed_path([path])[0]), path
+    return dict(index._row_of)
+
+
+def test_path_words_split_case_and_separators():
+    assert path_words("userConfig_v2.yml") == ["user", "config", "v2", "yml"]
+
+
+def test_embedder_is_abstract():
+    with pytest.raises(TypeError):
+        Embedder()
+
+
+def test_hashing_vectors_are_normalized():
+    import numpy as np
+    vectors = HashingEmbedder(64).embed(["login handler", "invoice"])
+    assert vectors.shape == (2, 64)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+
+def test_search_finds_paths_by_similar_words(tmp_path):
+    index = open_index(tmp_path)
+    index.sync(PATHS, generation=1)
+
+    assert index.search("login handler", k=1)[0]["full_path"] == "/w/src/auth/login_handler.py"
+    assert index.search("user config")[0]["full_path"] == "/w/docs/userConfig.md"
+    assert all(result["tier"] == "semantic" for result in index.search("invoice"))
+
+
+def test_sync_only_applies_changes_and_reuses_freed_rows(tmp_path):
+    index = open_index(tmp_path)
+    index.sync(PATHS, generation=1)
+    before = rows(index)
+
+    index.sync(PATHS[1:] + ["/w/src/new_module.py"], generation=2)
+    after = rows(index)
+
+    assert "/w/src/auth/login_handler.py" not in after
+    assert after["/w/src/new_module.py"] == before["/w/src/auth/login_handler.py"]
+    assert all(after[path] == before[path] for path in PATHS[1:])
+
+
+def test_store_is_reloaded_from_disk(tmp_path):
+    index = open_index(tmp_path)
+    index.sync(PATHS, generation=1)
+    index.sync(PATHS[:3], generation=2)
+
+    reopened = open_index(tmp_path)
+
+    assert rows(reopened) == rows(index)
+
+
+def test_changing_the_embedder_starts_over(tmp_path):
+    open_index(tmp_path).sync(PATHS, generation=1)
+    assert len(open_index(tmp_path, HashingEmbedder(32))) == 0
+
+
+def test_two_processes_see_each_others_changes(tmp_path):
+    first, second = open_index(tmp_path), open_index(tmp_path)
+    first.sync(PATHS[:2], generation=1)
+    second.sync(PATHS, generation=1)
+    first.sync(PATHS[2:], generation=2)
+
+    # Searching catches up with the other process's changes
+    second.search("invoice")
+    assert rows(first) == rows(second)
+    assert sorted(rows(second)) == sorted(PATHS[2:])
+
+
+def _sync_worker(storage_dir, rounds):
+    index = PathVectorIndex("/w", HashingEmbedder(64), storage_dir)
+    for generation, paths in enumerate(rounds, 1):
+        index.sync(paths, generation)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_concurrent_processes_keep_one_row_per_path(tmp_path):
+    paths = [f"/w/pkg{i % 7}/module_{i}.py" for i in range(2000)]
+    rounds = [paths[:1500], paths[500:], paths[::2], paths[1::2], paths[:1000], paths]
+    storage_dir = str(tmp_path / "vectors")
+    open_index(tmp_path)
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_sync_worker, args=(storage_dir, rounds)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    index = open_index(tmp_path)
+    assert sorted(rows(index)) == sorted(paths)
+    assert len(set(index._row_of.values())) == len(paths)
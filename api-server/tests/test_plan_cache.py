@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from control_agent import VSCodeControlAgent
+from plan_cache import PlanCache
+
+OK = {"status": "success"}
+FAILED = {"status": "error", "message": "No such tab"}
+
+
+def step(tool, result=OK, **args):
+    return {"tool": tool, "args": args, "result": result}
+
+
+def test_put_and_get_by_normalized_command():
+    cache = PlanCache()
+    assert cache.put("Open app.py", [step("open_file", path="app.py")], "Opened", {})
+
+    plan = cache.get("open app.py", {})
+
+    assert plan["steps"] == [{"tool": "open_file", "args": {"path": "app.py"}}]
+    assert plan["output"] == "Opened"
+    assert cache.stats()["hits"] == 1
+
+
+def test_plans_without_actions_or_with_failures_are_not_cached():
+    cache = PlanCache()
+    assert not cache.put("what tabs are open", [step("list_open_tabs")], "a.py, b.py", {})
+    assert not cache.put("close foo", [step("close_tab", FAILED)], "Failed", {})
+    assert not cache.put("say hi", [], "hi", {})
+    assert len(cache) == 0
+
+
+def test_context_dependent_plan_misses_when_state_changed():
+    cache = PlanCache()
+    steps = [step("list_open_tabs"), step("go_to_tab", name="app.py")]
+    assert not cache.put("switch to app", steps, "Switched", {"tabs": None})
+    assert cache.put("switch to app", steps, "Switched", {"tabs": "t1"})
+
+    assert cache.context_kinds("switch to app") == ["tabs"]
+    assert cache.get("switch to app", {"tabs": "t1"}) is not None
+    assert cache.get("switch to app", {"tabs": "t2"}) is None
+
+
+def test_lru_eviction_and_invalidation():
+    cache = PlanCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put(f"open {name}", [step("open_file", path=name)], "", {})
+
+    assert cache.get("open a", {}) is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.invalidate("open b")
+    assert cache.get("open b", {}) is None
+
+
+class FakeTool:
+    def __init__(self, name, result, calls):
+        self.name = name
+        self.result = result
+        self.calls = calls
+
+    async def _arun(self, **kwargs):
+        self.calls.append(self.name)
+        return self.result
+
+
+@pytest.fixture(scope="module")
+def agent():
+    return VSCodeControlAgent("test")
+
+
+def replay(agent, results, steps):
+    """Replay `steps` with fake tools returning `results`; (events, tool calls)."""
+    calls = []
+    agent.tools_by_name = {name: FakeTool(name, result, calls) for name, result in results.items()}
+
+    async def run():
+        return [event async for event in agent.replay("cmd", {"steps": steps, "output": "Done"})]
+
+    return asyncio.run(run()), calls
+
+
+def test_replay_succeeds(agent):
+    events, calls = replay(agent, {"close_tab": OK, "next_tab": OK},
+                           [{"tool": "close_tab", "args": {}}, {"tool": "next_tab", "args": {}}])
+
+    assert calls == ["close_tab", "next_tab"]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["handled_by"] == "plan_cache"
+
+
+def test_replay_failing_first_step_hands_over_to_agent(agent):
+    events, _ = replay(agent, {"list_open_tabs": OK, "go_to_tab": FAILED},
+                       [{"tool": "list_open_tabs", "args": {}}, {"tool": "go_to_tab", "args": {"name": "x"}}])
+
+    assert events[-1][0] == "plan_invalidated"
+    assert "done" not in [event for event, _ in events]
+
+
+def test_replay_failing_after_an_action_does_not_run_again(agent):
+    events, calls = replay(agent, {"close_tab": OK, "go_to_tab": FAILED},
+                           [{"tool": "close_tab", "args": {}}, {"tool": "go_to_tab", "args": {"name": "x"}}])
+
+    assert calls == ["close_tab", "go_to_tab"]
+    event, data = events[-1]
+    assert event == "done"
+    assert data["status"] == "error"
+    assert [s["tool"] for s in data["steps"]] == ["close_tab", "go_to_tab"]
+    assert "No such tab" in data["output"]
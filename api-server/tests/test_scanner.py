@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from scanner import DirectoryScanner, IgnoreRule
+
+
+@pytest.mark.parametrize("pattern, path, is_dir, matches", [
+    ("*.log", "debug.log", False, True),
+    ("*.log", "logs/debug.log", False, True),
+    ("/build", "build", True, True),
+    ("/build", "src/build", True, False),
+    ("docs/*.md", "docs/a.md", False, True),
+    ("docs/*.md", "docs/sub/a.md", False, False),
+    ("out/", "out", True, True),
+    ("out/", "out", False, False),
+    ("**/tmp", "a/b/tmp", True, True),
+    ("a/**/z.py", "a/b/c/z.py", False, True),
+    ("a/**/z.py", "a/z.py", False, True),
+    ("file?.txt", "file1.txt", False, True),
+    ("[!a]*.py", "b.py", False, True),
+    ("[!a]*.py", "a.py", False, False),
+    ("\\#hash", "#hash", False, True),
+])
+def test_ignore_patterns(pattern, path, is_dir, matches):
+    assert IgnoreRule.parse(pattern).matches(path, is_dir) is matches
+
+
+@pytest.mark.parametrize("line", ["", "   ", "# comment", "/"])
+def test_lines_without_a_pattern_are_skipped(line):
+    assert IgnoreRule.parse(line) is None
+
+
+def make_tree(root, files):
+    for relative, text in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    make_tree(tmp_path, {
+        ".gitignore": "*.log\n/generated/\nsecret*\n!secret_ok.py\n",
+        ".git/info/exclude": "scratch.py\n",
+        "app.py": "",
+        "scratch.py": "",
+        "debug.log": "",
+        "secret_key.py": "",
+        "secret_ok.py": "",
+        "generated/schema.py": "",
+        "node_modules/pkg/index.py": "",
+        "src/main.py": "",
+        "src/generated/keep.py": "",
+        "src/.gitignore": "local_*.py\n",
+        "src/local_settings.py": "",
+        "src/deep/local_dev.py": "",
+        "src/deep/real.py": "",
+        "other/local_x.py": "",
+        "notes.md": "",
+    })
+    return tmp_path
+
+
+def relative(root, paths):
+    return sorted(os.path.relpath(p, root) for p in paths)
+
+
+def test_scan_applies_gitignore_excludes_and_extensions(workspace):
+    scanner = DirectoryScanner(["py"], workers=4)
+
+    assert relative(workspace, scanner.scan(str(workspace))) == [
+        "app.py",
+        "other/local_x.py",
+        "secret_ok.py",
+        "src/deep/real.py",
+        "src/generated/keep.py",
+        "src/main.py",
+    ]
+
+
+def test_subtree_scan_inherits_rules_from_above(workspace):
+    scanner = DirectoryScanner(["py"])
+
+    assert relative(workspace, scanner.scan(str(workspace / "src"), root=str(workspace))) == [
+        "src/deep/real.py",
+        "src/generated/keep.py",
+        "src/main.py",
+    ]
+    assert scanner.scan(str(workspace / "generated"), root=str(workspace)) == []
+
+
+def test_ignored_matches_what_a_scan_skips(workspace):
+    scanner = DirectoryScanner(["py"])
+    root = str(workspace)
+    scanned = set(scanner.scan(root))
+    for path in [os.path.join(d, f) for d, _, files in os.walk(root) for f in files if f.endswith(".py")]:
+        assert scanner.ignored(path, root) is (path not in scanned), path
+    assert scanner.ignored(os.path.join(os.path.dirname(root), "outside.py"), root)
+
+
+def test_forget_rules_picks_up_edited_ignore_files(workspace):
+    scanner = DirectoryScanner(["py"])
+    root = str(workspace)
+    assert not scanner.ignored(str(workspace / "app.py"), root)
+
+    (workspace / ".gitignore").write_text("app.py\n")
+    scanner.forget_rules()
+
+    assert scanner.ignored(str(workspace / "app.py"), root)
+
+
+def test_listings_cover_every_directory_entered(workspace):
+    scanner = DirectoryScanner(["py"])
+    listings = {os.path.relpath(l.directory, workspace): l for l in scanner.iter_listings(str(workspace))}
+
+    assert set(listings) == {".", "other", "src", "src/deep", "src/generated"}
+    assert listings["."].ignore_sig.startswith(".gitignore:")
+    assert listings["other"].ignore_sig == ""
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from command_router import CommandRouter
+from scheduler import CommandScheduler, mark_touched
+from shortcuts import supersede_key
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def job(log, name, delay=0.0, touch=False):
+    log.append(f"start {name}")
+    if touch:
+        mark_touched()
+    await asyncio.sleep(delay)
+    log.append(f"end {name}")
+    return name
+
+
+async def started(scheduler, lane, count):
+    """Yield until `count` jobs are queued or running on `lane`."""
+    while scheduler.stats()["queued"].get(lane, 0) < count:
+        await asyncio.sleep(0)
+
+
+def test_lane_runs_jobs_one_at_a_time_in_arrival_order():
+    async def main():
+        scheduler, log = CommandScheduler(), []
+        tasks = [asyncio.create_task(scheduler.run("w1", lambda n=n: job(log, n, 0.01))) for n in "abc"]
+        return await asyncio.gather(*tasks), log, scheduler
+
+    results, log, scheduler = run(main())
+    assert results == ["a", "b", "c"]
+    assert log == ["start a", "end a", "start b", "end b", "start c", "end c"]
+    assert scheduler.stats()["completed"] == 3
+    assert scheduler.stats()["queued"] == {}
+
+
+def test_lanes_run_in_parallel():
+    async def main():
+        scheduler, log = CommandScheduler(), []
+        await asyncio.gather(scheduler.run("w1", lambda: job(log, "a", 0.05)),
+                             scheduler.run("w2", lambda: job(log, "b", 0.05)))
+        return log
+
+    assert run(main())[:2] == ["start a", "start b"]
+
+
+def test_full_lane_rejects_with_429():
+    async def main():
+        scheduler, log = CommandScheduler(max_depth=2), []
+        tasks = [asyncio.create_task(scheduler.run("w1", lambda n=n: job(log, n, 0.05))) for n in "ab"]
+        await started(scheduler, "w1", 2)
+        with pytest.raises(HTTPException) as rejected:
+            await scheduler.run("w1", lambda: job(log, "c"))
+        await asyncio.gather(*tasks)
+        return rejected.value, scheduler
+
+    rejected, scheduler = run(main())
+    assert rejected.status_code == 429
+    assert rejected.headers == {"Retry-After": "1"}
+    assert scheduler.stats()["dropped"]["rejected"] == 1
+
+
+def test_job_that_waited_too_long_is_dropped_as_stale():
+    async def main():
+        scheduler, log = CommandScheduler(), []
+        first = asyncio.create_task(scheduler.run("w1", lambda: job(log, "slow", 0.1)))
+        await started(scheduler, "w1", 1)
+        late = await scheduler.run("w1", lambda: job(log, "late"), max_wait=0.02)
+        await first
+        return late, log, scheduler
+
+    late, log, scheduler = run(main())
+    assert late["status"] == "cancelled"
+    assert late["reason"] == "stale"
+    assert "start late" not in log
+    assert scheduler.stats()["dropped"]["stale"] == 1
+
+
+def test_last_wins_supersedes_queued_and_untouched_running_jobs():
+    async def main():
+        scheduler, log = CommandScheduler(), []
+        running = asyncio.create_task(scheduler.run("w1", lambda: job(log, "line 1", 0.1), "go_to_line"))
+        await started(scheduler, "w1", 1)
+        queued = asyncio.create_task(scheduler.run("w1", lambda: job(log, "line 2"), "go_to_line"))
+        other = asyncio.create_task(scheduler.run("w1", lambda: job(log, "next tab")))
+        await started(scheduler, "w1", 3)
+        last = await scheduler.run("w1", lambda: job(log, "line 3"), "go_to_line")
+        return await running, await queued, await other, last, log, scheduler
+
+    running, queued, other, last, log, scheduler = run(main())
+    assert running["reason"] == queued["reason"] == "superseded"
+    assert other == "next tab"
+    assert last == "line 3"
+    assert "start line 2" not in log and "end line 1" not in log
+    assert scheduler.stats()["dropped"]["superseded"] == 2
+
+
+def test_running_job_that_reached_the_extension_is_not_cancelled():
+    async def main():
+        scheduler, log = CommandScheduler(), []
+        running = asyncio.create_task(scheduler.run("w1", lambda: job(log, "line 1", 0.05, touch=True), "go_to_line"))
+        await started(scheduler, "w1", 1)
+        await asyncio.sleep(0)
+        last = await scheduler.run("w1", lambda: job(log, "line 2"), "go_to_line")
+        return await running, last
+
+    assert run(main()) == ("line 1", "line 2")
+
+
+def test_calls_from_inside_a_running_job_skip_the_queue():
+    async def main():
+        scheduler, log = CommandScheduler(max_depth=1), []
+
+        async def outer():
+            return await scheduler.run("w1", lambda: job(log, "inner"))
+
+        return await scheduler.run("w1", outer)
+
+    assert run(main()) == "inner"
+
+
+class FakeTool:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeAgent:
+    router = CommandRouter([FakeTool(name) for name in ("go_to_line", "next_tab", "open_file")])
+
+
+@pytest.mark.parametrize("command, key", [
+    ("go to line 42", "go_to_line"),
+    ("next tab", None),
+    ("open app.py", None),
+    ("open foo.py and go to line 10", None),
+    ("find where the login handler is", None),
+])
+def test_only_last_wins_fast_path_commands_supersede(command, key):
+    assert supersede_key(FakeAgent(), command) == key
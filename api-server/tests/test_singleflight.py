@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run_and_get_copies():
+    async def main():
+        flights, runs = SingleFlight("test", window=0), []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.02)
+            return {"value": [1]}
+
+        results = await asyncio.gather(*(flights.run("k", work) for _ in range(5)))
+        return results, runs, flights
+
+    results, runs, flights = asyncio.run(main())
+    assert len(runs) == 1
+    assert all(result == {"value": [1]} for result in results)
+    results[0]["value"].append(2)
+    assert results[1] == {"value": [1]}
+    assert flights.stats()["coalesced"] == 4
+
+
+def test_window_reuses_a_finished_result_only_when_set():
+    async def main(window):
+        flights, runs = SingleFlight("test", window=window), []
+
+        async def work():
+            runs.append(1)
+            return len(runs)
+
+        await flights.run("k", work)
+        await flights.run("k", work)
+        await flights.run("other", work)
+        return len(runs)
+
+    assert asyncio.run(main(0)) == 3
+    assert asyncio.run(main(60)) == 2
+
+
+def test_failures_reach_waiters_but_are_not_reused():
+    async def main():
+        flights, runs = SingleFlight("test", window=60), []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flights.run("k", work), flights.run("k", work), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await flights.run("k", work)
+        return results, len(runs)
+
+    results, runs = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert runs == 2
+
+
+def test_work_is_cancelled_only_with_its_last_waiter():
+    async def main():
+        flights, finished = SingleFlight("test", window=0), []
+
+        async def work():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "done"
+
+        first = asyncio.create_task(flights.run("k", work))
+        second = asyncio.create_task(flights.run("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "done"
+
+        third = asyncio.create_task(flights.run("k", work))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.sleep(0.08)
+        return len(finished), flights.stats()["in_flight"]
+
+    assert asyncio.run(main()) == (1, 0)
+
+
+def test_run_sync_coalesces_threads():
+    flights, runs, results = SingleFlight("test", window=0), [], []
+
+    def work():
+        runs.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    threads = [threading.Thread(target=lambda: results.append(flights.run_sync("k", work))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(runs) == 1
+    assert results == ["value"] * 4
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+import speculation
+from speculation import SpeculationStats, file_references, resolve_file, settle, speculate
+
+
+@pytest.mark.parametrize("command, terms", [
+    ("open the config file", ["config"]),
+    ("show me app dot py please", ["app dot py"]),
+    ("edit utils.py and go to line 3", ["utils.py"]),
+    ("open main.py, then open routes.py", ["main.py", "routes.py"]),
+    ("go to line 40", []),
+    ("switch to the next tab", []),
+    ("open a terminal", []),
+])
+def test_file_references(command, terms):
+    assert file_references(command) == terms
+
+
+def test_references_are_deduplicated_and_limited():
+    assert file_references("open a.py then open A.py then open b.py then open c.py", limit=2) == ["a.py", "b.py"]
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Slow fake search_file recording the terms searched, with fresh stats."""
+    searched = []
+
+    async def search_file(term):
+        searched.append(term)
+        await asyncio.sleep(0.05)
+        return {"full_path": f"/w/{term}"}
+
+    monkeypatch.setattr(speculation, "search_file", search_file)
+    monkeypatch.setattr(speculation, "speculation_stats", SpeculationStats())
+    return searched
+
+
+def test_open_file_uses_the_search_started_before_planning(searches):
+    async def main():
+        with speculate("open app.py"):
+            await asyncio.sleep(0)
+            assert searches == ["app.py"]
+            return await resolve_file("app.py")
+
+    assert asyncio.run(main()) == {"full_path": "/w/app.py"}
+    assert searches == ["app.py"]
+    assert speculation.speculation_stats.stats()["hit"] == 1
+
+
+def test_searches_the_plan_does_not_need_are_cancelled(searches):
+    async def main():
+        with speculate("open a.py and open b.py"):
+            await asyncio.sleep(0)
+            settle([{"name": "list_open_tabs", "args": {}}])
+            settle([{"name": "open_file", "args": {"path": "b.py"}}])
+            return await resolve_file("b.py"), await resolve_file("c.py")
+
+    hit, miss = asyncio.run(main())
+    assert (hit, miss) == ({"full_path": "/w/b.py"}, {"full_path": "/w/c.py"})
+    stats = speculation.speculation_stats.stats()
+    assert (stats["started"], stats["hit"], stats["cancelled"], stats["miss"]) == (2, 1, 1, 1)
+
+
+def test_unused_searches_end_with_the_command(searches):
+    async def main():
+        with speculate("open a.py"):
+            await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert speculation.speculation_stats.stats()["unused"] == 1
+
+
+def test_disabled_or_nested_speculation_starts_nothing(searches, monkeypatch):
+    async def main():
+        with speculate("open a.py"):
+            with speculate("open b.py"):
+                await asyncio.sleep(0)
+        monkeypatch.setattr(speculation, "SPECULATIVE_SEARCHES", 0)
+        with speculate("open c.py"):
+            await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert searches == ["a.py"]
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import shortcuts
+import startup
+from startup import format_startup_report, record_startup, startup_report, timed_import
+
+
+def test_importing_the_server_leaves_the_agent_stack_unloaded():
+    modules = shortcuts.HEAVY_MODULES + ["control_agent"]
+    code = f"import shortcuts, sys; print([m for m in {modules!r} if m in sys.modules])"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(shortcuts.__file__)).stdout
+    assert output.strip() == "[]"
+
+
+def test_imports_and_steps_are_recorded_once(monkeypatch):
+    monkeypatch.setattr(startup, "STARTUP_COSTS", {})
+    timed_import("json")
+    record_startup("warm_up", 0.5)
+    record_startup("warm_up", 9.0)
+
+    assert "json" not in startup.STARTUP_COSTS
+    assert startup_report() == {"steps_ms": {"warm_up": 500.0}}
+    assert "warm_up" in format_startup_report()
+
+
+def test_agent_is_not_built_without_an_api_key(monkeypatch):
+    monkeypatch.setattr(shortcuts, "_agent", None)
+    monkeypatch.delenv("OPENAI_API_KEY")
+    assert shortcuts.get_agent() is None
+
+
+def test_concurrent_first_requests_build_one_agent(monkeypatch):
+    built = []
+
+    class SlowAgent:
+        def __init__(self, openai_api_key):
+            time.sleep(0.1)
+            built.append(threading.get_ident())
+
+    fake_module = SimpleNamespace(VSCodeControlAgent=SlowAgent)
+    monkeypatch.setattr(shortcuts, "_agent", None)
+    monkeypatch.setattr(shortcuts, "HEAVY_MODULES", [])
+    monkeypatch.setattr(shortcuts, "timed_import", lambda module: fake_module)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        agents = await asyncio.gather(*(shortcuts.aget_agent() for _ in range(5)))
+        return agents, loop_thread
+
+    agents, loop_thread = asyncio.run(main())
+    assert len(built) == 1 and built[0] != loop_thread
+    assert all(agent is agents[0] for agent in agents)
+    assert shortcuts.get_agent() is agents[0]
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.stub_extension import create_stub_app, running_stub
+from conftest import STUB_PORT
+from shortcuts import app, sse_event
+
+
+def parse_events(body: str):
+    """[(event, data), ...] from a Server-Sent Events body."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture(scope="module")
+def client():
+    stub = create_stub_app()
+    stub.state.editor.tabs = ["/w/a.py", "/w/b.py"]
+    stub.state.editor.active = 0
+    with running_stub(STUB_PORT, app=stub), TestClient(app) as client:
+        client.stub = stub
+        yield client
+
+
+def test_sse_event_format():
+    assert sse_event("route", {"handled_by": "agent"}) == 'event: route\ndata: {"handled_by": "agent"}\n\n'
+
+
+def test_fast_path_command_streams_each_step(client):
+    with client.stream("POST", "/execute/stream", json={"command": "next tab"}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.read().decode())
+
+    assert [event for event, _ in events] == ["route", "intent", "tool_start", "tool_end", "done"]
+    assert events[0][1] == {"handled_by": "fast_path"}
+    assert events[1][1]["tools"] == [{"tool": "next_tab", "args": {}}]
+    assert events[-1][1]["status"] == "success"
+    assert client.stub.state.editor.active == 1
@@ -0,0 +1,38 @@
+import asyncio
+
+from vscode_client import VSCODE_SERVER, close_client, current_server, get_client, routed_to, timeout_for
+
+
+def test_one_pooled_client_per_server():
+    async def main():
+        default = get_client()
+        assert get_client() is default
+        assert get_client(VSCODE_SERVER) is default
+        with routed_to("http://127.0.0.1:3999"):
+            assert current_server() == "http://127.0.0.1:3999"
+            other = get_client()
+        assert other is not default
+        assert str(other.base_url).startswith("http://127.0.0.1:3999")
+        assert current_server() == VSCODE_SERVER
+        await close_client()
+        return default, other
+
+    default, other = asyncio.run(main())
+    assert default.is_closed and other.is_closed
+
+
+def test_closed_client_is_replaced_on_next_use():
+    async def main():
+        first = get_client()
+        await close_client()
+        second = get_client()
+        await close_client()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first is not second
+
+
+def test_slow_commands_get_longer_timeouts():
+    assert timeout_for("openFile").read > timeout_for("nextTab").read
+    assert timeout_for("status").read < timeout_for("nextTab").read
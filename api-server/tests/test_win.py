@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+
+import win
+from win import FakeWindowBackend, MacOSWindowBackend
+
+# Stand-ins for `osascript -i`: one answers each line like the JXA REPL, one never answers
+ANSWERING_REPL = (
+    "import json, sys\n"
+    "for line in sys.stdin:\n"
+    "    print('>> ' + line.strip())\n"
+    "    print('=> ' + json.dumps(json.dumps(['main.py - project - Visual Studio Code'])), flush=True)\n"
+)
+HUNG_REPL = "import time\ntime.sleep(60)\n"
+
+
+class FakeReplBackend(MacOSWindowBackend):
+    def __init__(self, script):
+        super().__init__()
+        self.COMMAND = [sys.executable, "-c", script]
+        self.fallbacks = 0
+
+    def _evaluate_once(self, expression):
+        self.fallbacks += 1
+        return ["fallback"]
+
+
+def test_persistent_process_answers():
+    backend = FakeReplBackend(ANSWERING_REPL)
+    try:
+        assert backend.fetch_windows() == ["main.py - project - Visual Studio Code"]
+        process = backend._process
+        backend.invalidate()
+        backend.fetch_windows()
+        assert backend._process is process
+        assert backend.fallbacks == 0
+    finally:
+        backend.close()
+
+
+def test_hung_process_is_killed_and_falls_back(monkeypatch):
+    monkeypatch.setattr(win, "SCRIPT_TIMEOUT", 0.3)
+    backend = FakeReplBackend(HUNG_REPL)
+    started = time.monotonic()
+
+    assert backend.fetch_windows() == ["fallback"]
+
+    assert time.monotonic() - started < 2
+    assert backend._process is None
+    assert backend.fallbacks == 1
+
+
+def test_hung_process_does_not_block_later_calls(monkeypatch):
+    monkeypatch.setattr(win, "SCRIPT_TIMEOUT", 0.3)
+    backend = FakeReplBackend(HUNG_REPL)
+    threads = [threading.Thread(target=backend.focus_window, args=("x",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert backend.fallbacks == 3
+
+
+def test_window_list_is_cached_until_a_switch():
+    backend = FakeWindowBackend(["a - Visual Studio Code", "b - Visual Studio Code"], ttl=60)
+    assert backend.list_windows() == ["a - Visual Studio Code", "b - Visual Studio Code"]
+    backend.windows.append("c - Visual Studio Code")
+    assert len(backend.list_windows()) == 2
+
+    assert backend.switch_to("b")
+    assert backend.active == "b - Visual Studio Code"
+    assert len(backend.list_windows()) == 3
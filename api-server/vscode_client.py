@@ -0,0 +1,125 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import httpx
+
+# VS Code extension server URL
+VSCODE_SERVER = os.getenv("VSCODE_SERVER", "http://localhost:3068")
+
+# The extension is a single local process, so a handful of keep-alive
+# sockets covers every concurrent command we realistically send.
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+
+DEFAULT_TIMEOUT = httpx.Timeout(5.0, connect=1.0)
+ENDPOINT_TIMEOUTS: Dict[str, httpx.Timeout] = {
+    # A liveness probe should answer immediately or count as down.
+    "status": httpx.Timeout(1.0, connect=0.5),
+    # Opening a large file can take the editor a moment.
+    "openFile": httpx.Timeout(10.0, connect=1.0),
+    "goToTabName": httpx.Timeout(10.0, connect=1.0),
+    "batch": httpx.Timeout(30.0, connect=1.0),
+}
+
+# Extension server the current request's commands go to; see instances.py
+_server: ContextVar[str] = ContextVar("vscode_server", default=VSCODE_SERVER)
+# One pooled client per extension server
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def timeout_for(command: str) -> httpx.Timeout:
+    return ENDPOINT_TIMEOUTS.get(command, DEFAULT_TIMEOUT)
+
+
+def current_server() -> str:
+    return _server.get()
+
+
+def set_server(server: str):
+    """Route the rest of the current request (or task) to `server`."""
+    _server.set(server)
+
+
+@contextmanager
+def routed_to(server: str):
+    token = _server.set(server)
+    try:
+        yield
+    finally:
+        _server.reset(token)
+
+
+def get_client(server: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    The application-wide client for talking to an extension server, by
+    default the one the current request is routed to.
+
+    The default server's client is normally opened on startup by
+    start_client(); the others, and any client after close_client(), are
+    created on first use so scripts that never run the FastAPI lifecycle work.
+    """
+    server = server or _server.get()
+    client = _clients.get(server)
+    if client is None or client.is_closed:
+        client = _clients[server] = httpx.AsyncClient(
+            base_url=server,
+            limits=POOL_LIMITS,
+            timeout=DEFAULT_TIMEOUT,
+        )
+    return client
+
+
+async def start_client():
+    get_client(VSCODE_SERVER)
+
+
+async def close_client():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+async def send_batch(steps: List[Dict], stop_on_error: bool = True) -> Dict:
+    """
+    Run several commands in one POST /batch round-trip.
+
+    Args:
+        steps (List[Dict]): Ordered {"command": ..., "params": {...}} entries
+        stop_on_error (bool): Skip the remaining steps after the first failure
+
+    Returns:
+        Dict: {"status", "command": "batch", "results": [...]} with one result per step
+
+    Extension builds without /batch answer "Command not found" (or reject the
+    POST outright); the steps are
+    then sent one GET at a time so callers see the same result shape.
+    httpx errors are left to the caller, including an httpx.HTTPStatusError
+    when the extension rejects the batch as a whole.
+    """
+    client = get_client()
+    response = await client.post(
+        "/batch",
+        json={"steps": steps, "stopOnError": stop_on_error},
+        timeout=timeout_for("batch"),
+    )
+    data = response.json() if response.status_code != 405 else {}
+    if "results" in data:
+        return data
+    if data.get("message") not in (None, "Command not found"):
+        response.raise_for_status()
+        return data
+
+    results = []
+    failed = False
+    for step in steps:
+        if failed and stop_on_error:
+            results.append({"status": "skipped", "command": step["command"]})
+            continue
+        response = await client.get(f"/{step['command']}", params=step.get("params"),
+                                    timeout=timeout_for(step["command"]))
+        result = response.json()
+        failed = failed or result.get("status") == "error"
+        results.append(result)
+    return {"status": "error" if failed else "success", "command": "batch", "results": results}
@@ -0,0 +1,70 @@
+from typing import Dict, List
+
+import httpx
+from fastapi import HTTPException
+
+from health import EXTENSION_DOWN_DETAIL, UNREACHABLE_ERRORS, health_for
+from metrics import timed
+from scheduler import command_scheduler, mark_touched
+from vscode_client import current_server, get_client, send_batch, timeout_for
+
+# Commands that only read editor state; running them doesn't stop a
+# superseded command from being cancelled
+READ_COMMANDS = {"status", "listOpenTabs", "recentFiles"}
+
+
+async def forward_to_vscode(command: str, params: Dict = None) -> dict:
+    """
+    Forward command to the VS Code extension server the current request is
+    routed to, in order with the other commands for that window.
+    """
+    return await command_scheduler.run(current_server(), lambda: _forward(command, params))
+
+
+async def _forward(command: str, params: Dict = None) -> dict:
+    extension_health = health_for()
+    if not extension_health.allow_request():
+        raise HTTPException(status_code=503, detail=EXTENSION_DOWN_DETAIL)
+    try:
+        if command not in READ_COMMANDS:
+            mark_touched()
+        with timed("extension"):
+            response = await get_client().get(f"/{command}", params=params, timeout=timeout_for(command))
+        extension_health.record_success()
+        data = response.json()
+
+        # If the response indicates an error, ensure it includes the command
+        if data.get("status") == "error":
+            data["command"] = command
+
+        return data
+    except httpx.RequestError as exc:
+        if isinstance(exc, UNREACHABLE_ERRORS):
+            extension_health.record_failure(exc)
+        raise HTTPException(status_code=503, detail=EXTENSION_DOWN_DETAIL)
+
+
+async def forward_batch_to_vscode(steps: List[Dict], stop_on_error: bool = True) -> dict:
+    """Forward an ordered list of commands to VS Code in a single request."""
+    return await command_scheduler.run(current_server(), lambda: _forward_batch(steps, stop_on_error))
+
+
+async def _forward_batch(steps: List[Dict], stop_on_error: bool = True) -> dict:
+    extension_health = health_for()
+    if not extension_health.allow_request():
+        raise HTTPException(status_code=503, detail=EXTENSION_DOWN_DETAIL)
+    try:
+        if any(step["command"] not in READ_COMMANDS for step in steps):
+            mark_touched()
+        with timed("extension"):
+            data = await send_batch(steps, stop_on_error)
+        extension_health.record_success()
+        return data
+    except httpx.HTTPStatusError as exc:
+        # The extension answered, but rejected the batch itself; keep its status
+        extension_health.record_success()
+        raise HTTPException(status_code=exc.response.status_code, detail=exc.response.json().get("message"))
+    except httpx.RequestError as exc:
+        if isinstance(exc, UNREACHABLE_ERRORS):
+            extension_health.record_failure(exc)
+        raise HTTPException(status_code=503, detail=EXTENSION_DOWN_DETAIL)
@@ -1,39 +1,271 @@
+import json
+import os
+import queue
+import shutil
 import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+WINDOW_CACHE_TTL = float(os.getenv("WINDOW_CACHE_TTL", "2.0"))
+SCRIPT_TIMEOUT = 5.0
+
+
+class WindowBackend:
+    """
+    Lists and focuses VS Code windows on one platform.
+
+    Subclasses implement fetch_windows() and focus_window(). The window list
+    is cached for WINDOW_CACHE_TTL seconds and dropped whenever something
+    (a switch, or a caller via invalidate()) may have changed it.
+    """
+
+    name = "base"
+
+    def __init__(self, ttl: float = WINDOW_CACHE_TTL):
+        self.ttl = ttl
+        self._windows: Optional[List[str]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def fetch_windows(self) -> List[str]:
+        raise NotImplementedError
+
+    def focus_window(self, window_name: str) -> bool:
+        raise NotImplementedError
+
+    def list_windows(self) -> List[str]:
+        with self._lock:
+            if self._windows is None or time.monotonic() - self._fetched_at > self.ttl:
+                self._windows = self.fetch_windows()
+                self._fetched_at = time.monotonic()
+            return list(self._windows)
+
+    def switch_to(self, window_name: str) -> bool:
+        switched = self.focus_window(window_name)
+        self.invalidate()
+        return switched
+
+    def invalidate(self):
+        with self._lock:
+            self._windows = None
+
+    def close(self):
+        pass
+
+
+class MacOSWindowBackend(WindowBackend):
+    """
+    AppleScript/JXA through one long-lived `osascript -i` process instead of
+    forking osascript for every call. A reader thread queues its output so
+    waiting for an answer is bounded by SCRIPT_TIMEOUT; if the process dies
+    or stops answering (e.g. behind an Accessibility prompt) it is killed,
+    the call falls back to a one-off osascript and the next call starts a
+    new process.
+    """
+
+    name = "macos"
+    COMMAND = ['osascript', '-l', 'JavaScript', '-i']
+
+    LIST_SCRIPT = (
+        'JSON.stringify(Application("System Events").processes.whose({name: "Code"}).length'
+        ' ? Application("System Events").processes.byName("Code").windows.name() : [])'
+    )
+    SWITCH_SCRIPT = (
+        '(function (target) {{'
+        ' var code = Application("System Events").processes.byName("Code");'
+        ' var windows = code.windows();'
+        ' for (var i = 0; i < windows.length; i++) {{'
+        '  if (windows[i].name().indexOf(target) >= 0) {{'
+        '   Application("Visual Studio Code").activate();'
+        '   code.frontmost = true;'
+        '   windows[i].actions.byName("AXRaise").perform();'
+        '   return JSON.stringify(true);'
+        '  }}'
+        ' }}'
+        ' return JSON.stringify(false);'
+        '}})({target})'
+    )
+
+    def __init__(self, ttl: float = WINDOW_CACHE_TTL):
+        super().__init__(ttl)
+        self._process: Optional[subprocess.Popen] = None
+        # Output lines of the current process; None once it has exited
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._process_lock = threading.Lock()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                self.COMMAND,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+            )
+            self._lines = queue.Queue()
+            threading.Thread(target=self._read_lines, args=(self._process, self._lines),
+                             name="osascript-reader", daemon=True).start()
+        return self._process
+
+    @staticmethod
+    def _read_lines(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def _evaluate(self, expression: str):
+        """Run one JXA expression in the persistent process and decode its JSON result."""
+        with self._process_lock:
+            process = self._ensure_process()
+            process.stdin.write(expression + "\n")
+            process.stdin.flush()
+            deadline = time.monotonic() + SCRIPT_TIMEOUT
+            while True:
+                try:
+                    line = self._lines.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self._kill()
+                    raise RuntimeError("osascript did not answer")
+                if line is None:
+                    self._kill()
+                    raise RuntimeError("osascript exited")
+                # The REPL prints ">> " prompts and "=> <value>" results
+                line = line.strip().lstrip(">").strip()
+                if line.startswith("=>"):
+                    return self._decode(line[2:].strip())
+                if "error" in line.lower():
+                    raise RuntimeError(line)
+
+    @staticmethod
+    def _decode(output: str):
+        # JSON.stringify results may be echoed as a JS string literal
+        try:
+            output = json.loads(output)
+        except ValueError:
+            pass
+        return json.loads(output) if isinstance(output, str) else output
+
+    def _evaluate_once(self, expression: str):
+        """Fallback: a one-off osascript process, as before the persistent one."""
+        result = subprocess.run(['osascript', '-l', 'JavaScript', '-e', expression],
+                                capture_output=True, text=True, timeout=SCRIPT_TIMEOUT)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+        return self._decode(result.stdout.strip())
+
+    def _run(self, expression: str):
+        try:
+            return self._evaluate(expression)
+        except (OSError, RuntimeError, ValueError):
+            self.close()
+            return self._evaluate_once(expression)
+
+    def fetch_windows(self) -> List[str]:
+        try:
+            return [title.strip() for title in self._run(self.LIST_SCRIPT) if title.strip()]
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return []
+
+    def focus_window(self, window_name: str) -> bool:
+        try:
+            return bool(self._run(self.SWITCH_SCRIPT.format(target=json.dumps(window_name))))
+        except Exception as e:
+            print(f"Error switching to window: {str(e)}")
+            return False
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process = None
+
+    def close(self):
+        with self._process_lock:
+            self._kill()
+
+
+class X11WindowBackend(WindowBackend):
+    """EWMH window list and activation through wmctrl, for Linux/X11 hosts."""
+
+    name = "x11"
+
+    def fetch_windows(self) -> List[str]:
+        try:
+            result = subprocess.run(['wmctrl', '-l'], capture_output=True, text=True, timeout=SCRIPT_TIMEOUT)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return []
+        if result.returncode != 0:
+            print(f"Error: {result.stderr}")
+            return []
+        # "<id> <desktop> <host> <title...>"
+        titles = [line.split(None, 3)[3] for line in result.stdout.splitlines() if len(line.split(None, 3)) == 4]
+        return [title for title in titles if "Visual Studio Code" in title]
+
+    def focus_window(self, window_name: str) -> bool:
+        try:
+            result = subprocess.run(['wmctrl', '-a', window_name], capture_output=True, text=True, timeout=SCRIPT_TIMEOUT)
+        except Exception as e:
+            print(f"Error switching to window: {str(e)}")
+            return False
+        if result.returncode != 0:
+            print(f"Error switching to window: {result.stderr}")
+            return False
+        return True
+
+
+class FakeWindowBackend(WindowBackend):
+    """In-memory windows for tests and for hosts without a window system."""
+
+    name = "fake"
+
+    def __init__(self, windows: Optional[List[str]] = None, ttl: float = WINDOW_CACHE_TTL):
+        super().__init__(ttl)
+        self.windows = list(windows or [])
+        self.active: Optional[str] = self.windows[0] if self.windows else None
+
+    def fetch_windows(self) -> List[str]:
+        return list(self.windows)
+
+    def focus_window(self, window_name: str) -> bool:
+        match = next((w for w in self.windows if window_name in w), None)
+        if match is None:
+            return False
+        self.active = match
+        return True
+
+
+def create_window_backend(name: Optional[str] = None) -> WindowBackend:
+    """
+    Pick a backend by name ("macos", "x11", "fake") or, by default, from
+    WINDOW_BACKEND and the current platform.
+    """
+    name = name or os.getenv("WINDOW_BACKEND")
+    if name is None:
+        if sys.platform == "darwin":
+            name = "macos"
+        elif os.getenv("DISPLAY") and shutil.which("wmctrl"):
+            name = "x11"
+        else:
+            name = "fake"
+    backends = {cls.name: cls for cls in (MacOSWindowBackend, X11WindowBackend, FakeWindowBackend)}
+    if name not in backends:
+        raise ValueError(f"Unknown window backend: {name}")
+    return backends[name]()
+
+
+window_backend = create_window_backend()
+
 
 def get_vscode_windows():
     """
-    Get all open VSCode windows and their titles on MacOS using AppleScript.
+    Get all open VSCode windows and their titles.
     Returns a list of window titles.
     """
-    applescript = '''
-    tell application "Visual Studio Code"
-        if it is running then
-            set windowList to {}
-            tell application "System Events"
-                tell process "Code"
-                    set windowList to name of every window
-                end tell
-            end tell
-            return windowList
-        end if
-    end tell
-    '''
-    
-    try:
-        result = subprocess.run(['osascript', '-e', applescript], 
-                              capture_output=True, 
-                              text=True)
-        
-        if result.returncode == 0 and result.stdout.strip():
-            window_titles = result.stdout.strip().split(', ')
-            return [title.strip() for title in window_titles if title.strip()]
-        else:
-            print(f"Error: {result.stderr if result.stderr else 'No windows found'}")
-            return []
-            
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return []
+    return window_backend.list_windows()
 
 def switch_to_window(window_name):
     """
@@ -43,52 +275,17 @@ def switch_to_window(window_name):
     Returns:
         bool: True if successful, False otherwise
     """
-    applescript = f'''
-    tell application "Visual Studio Code"
-        activate
-        tell application "System Events"
-            tell process "Code"
-                set targetWindow to null
-                repeat with w in windows
-                    if name of w contains "{window_name}" then
-                        set targetWindow to w
-                        exit repeat
-                    end if
-                end repeat
-                if targetWindow is not null then
-                    set frontmost to true
-                    perform action "AXRaise" of targetWindow
-                    return true
-                end if
-            end tell
-        end tell
-    end tell
-    '''
-    
-    try:
-        result = subprocess.run(['osascript', '-e', applescript], 
-                              capture_output=True, 
-                              text=True)
-        
-        if result.returncode == 0:
-            return True
-        else:
-            print(f"Error switching to window: {result.stderr}")
-            return False
-            
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return False
+    return window_backend.switch_to(window_name)
 
 if __name__ == "__main__":
     # Example usage
     windows = get_vscode_windows()
-    
+
     if windows:
         print("Open VSCode windows:")
         for i, title in enumerate(windows, 1):
             print(f"{i}. {title}")
-            
+
         # Example: Switch to the first window
         if windows:
             target_window = windows[1]
@@ -98,4 +295,4 @@ if __name__ == "__main__":
             else:
                 print("Failed to switch windows")
     else:
-        print("No VSCode windows found or VSCode is not running")
\ No newline at end of file
+        print("No VSCode windows found or VSCode is not running")
@@ -2,11 +2,252 @@ import * as vscode from "vscode";
 import * as http from "http";
 import * as url from "url";
 import * as path from "path";
+import * as os from "os";
+import * as fs from "fs";
+
+type CommandParams = { [key: string]: any };
+
+interface BatchStep {
+  command: string;
+  params?: CommandParams;
+}
+
+// How long to wait for a burst of tab events to settle before pushing state
+const STATE_DEBOUNCE_MS = 20;
+// Comment lines keep idle event streams from being dropped as dead
+const EVENTS_KEEPALIVE_MS = 15000;
+// Each window's extension takes the first free port from here on
+const BASE_PORT = 3068;
+const MAX_PORT = BASE_PORT + 50;
+// Where each window tells the API server its port and workspace roots
+const INSTANCES_DIR =
+  process.env.FIXFLOW_INSTANCES_DIR ||
+  path.join(os.homedir(), ".fixflow", "instances");
+
+function tabPath(tab: vscode.Tab): string | undefined {
+  return tab.input instanceof vscode.TabInputText
+    ? tab.input.uri.fsPath
+    : undefined;
+}
+
+function listTabs() {
+  return vscode.window.tabGroups.all.flatMap((group, index) =>
+    group.tabs.map((tab) => ({
+      groupIndex: index,
+      isActive: tab.isActive,
+      label: tab.label,
+      path: tabPath(tab),
+    }))
+  );
+}
+
+function recentFiles() {
+  return vscode.window.tabGroups.all
+    .flatMap((group) => group.tabs)
+    .slice(0, 100)
+    .map((tab) => ({ path: tabPath(tab), label: tab.label }))
+    .filter((file) => file.path);
+}
+
+// Clients of GET /events, each sent a full snapshot whenever tabs or the
+// active editor change, so the API server can answer tab queries itself.
+const eventClients = new Set<http.ServerResponse>();
+let stateVersion = 0;
+let stateTimer: NodeJS.Timeout | undefined;
+
+function stateEvent(): string {
+  const state = {
+    version: stateVersion,
+    tabs: listTabs(),
+    recentFiles: recentFiles(),
+    activePath: vscode.window.activeTextEditor?.document.uri.fsPath,
+  };
+  return `event: state\ndata: ${JSON.stringify(state)}\n\n`;
+}
+
+function scheduleStatePush() {
+  if (stateTimer) {
+    return;
+  }
+  stateTimer = setTimeout(() => {
+    stateTimer = undefined;
+    stateVersion++;
+    if (eventClients.size === 0) {
+      return;
+    }
+    const event = stateEvent();
+    for (const client of eventClients) {
+      client.write(event);
+    }
+  }, STATE_DEBOUNCE_MS);
+}
+
+function openEventStream(req: http.IncomingMessage, res: http.ServerResponse) {
+  res.writeHead(200, {
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache",
+    Connection: "keep-alive",
+  });
+  res.write(stateEvent());
+  eventClients.add(res);
+  req.on("close", () => eventClients.delete(res));
+}
+
+// Runs one command and returns the JSON body to send back. Throws on failure.
+async function runCommand(
+  command: string | undefined,
+  queryParams: CommandParams
+): Promise<object> {
+  switch (command) {
+    case "nexttab":
+      await vscode.commands.executeCommand("workbench.action.nextEditor");
+      break;
+
+    case "previoustab":
+      await vscode.commands.executeCommand("workbench.action.previousEditor");
+      break;
+
+    case "closetab":
+      await vscode.commands.executeCommand(
+        "workbench.action.closeActiveEditor"
+      );
+      break;
+
+    case "closealltabs":
+      await vscode.commands.executeCommand("workbench.action.closeAllEditors");
+      break;
+
+    case "closetabstoright":
+      await vscode.commands.executeCommand(
+        "workbench.action.closeEditorsToTheRight"
+      );
+      break;
+
+    case "openfile":
+      console.log("Processing openFile command...");
+      const filePath = queryParams.path as string;
+      if (!filePath) {
+        throw new Error("File path must be provided as a query parameter");
+      }
+
+      console.log("Attempting to open file:", filePath);
+      // Handle both absolute and workspace-relative paths
+      let fileUri;
+      if (path.isAbsolute(filePath)) {
+        fileUri = vscode.Uri.file(filePath);
+      } else {
+        const workspaceFolders = vscode.workspace.workspaceFolders;
+        if (!workspaceFolders) {
+          throw new Error("No workspace folder is open");
+        }
+        fileUri = vscode.Uri.joinPath(workspaceFolders[0].uri, filePath);
+      }
+
+      console.log("Opening file with URI:", fileUri.fsPath);
+      const document = await vscode.workspace.openTextDocument(fileUri);
+      await vscode.window.showTextDocument(document);
+      break;
+
+    case "listopentabs":
+      return { status: "success", command, tabs: listTabs() };
+
+    case "gototabname":
+      const tabName = queryParams.name as string;
+      if (!tabName) {
+        throw new Error("Tab name must be provided as a query parameter");
+      }
+
+      const allTabs = vscode.window.tabGroups.all.flatMap(
+        (group) => group.tabs
+      );
+      const targetTab = allTabs.find((tab) => tab.label === tabName);
+
+      if (!targetTab) {
+        throw new Error(`No tab found with name: ${tabName}`);
+      }
+
+      if (targetTab.input instanceof vscode.TabInputText) {
+        const doc = await vscode.workspace.openTextDocument(
+          targetTab.input.uri
+        );
+        await vscode.window.showTextDocument(doc);
+      }
+      break;
+
+    case "gotoline":
+      const line = parseInt(queryParams.line as string);
+      if (isNaN(line)) {
+        throw new Error("Line number must be provided as a query parameter");
+      }
+      const editor = vscode.window.activeTextEditor;
+      if (editor) {
+        const position = new vscode.Position(line - 1, 0);
+        editor.selection = new vscode.Selection(position, position);
+        await editor.revealRange(
+          new vscode.Range(position, position),
+          vscode.TextEditorRevealType.InCenter
+        );
+      }
+      break;
+
+    case "recentfiles":
+      return { status: "success", command, files: recentFiles() };
+
+    default:
+      console.log("Command not recognized:", command);
+      throw new Error("Command not found");
+  }
+
+  return { status: "success", command };
+}
+
+// Runs steps in order within one request. With stopOnError the remaining
+// steps are skipped after the first failure.
+async function runBatch(
+  steps: BatchStep[],
+  stopOnError: boolean
+): Promise<object> {
+  const results: object[] = [];
+  let failed = false;
+
+  for (const step of steps) {
+    const command = (step.command || "").toLowerCase();
+    if (failed && stopOnError) {
+      results.push({ status: "skipped", command });
+      continue;
+    }
+    try {
+      results.push(await runCommand(command, step.params || {}));
+    } catch (error: any) {
+      failed = true;
+      results.push({
+        status: "error",
+        command,
+        message: error.message || "Failed to execute command",
+      });
+    }
+  }
+
+  return {
+    status: failed ? "error" : "success",
+    command: "batch",
+    results,
+  };
+}
+
+function readBody(req: http.IncomingMessage): Promise<string> {
+  return new Promise((resolve, reject) => {
+    let body = "";
+    req.on("data", (chunk) => (body += chunk));
+    req.on("end", () => resolve(body));
+    req.on("error", reject);
+  });
+}
 
 export function activate(context: vscode.ExtensionContext) {
   const server = http.createServer(async (req, res) => {
     res.setHeader("Access-Control-Allow-Origin", "*");
-    res.setHeader("Access-Control-Allow-Methods", "GET, OPTIONS");
+    res.setHeader("Access-Control-Allow-Methods", "GET, POST, OPTIONS");
 
     if (req.method === "OPTIONS") {
       res.writeHead(200);
@@ -19,157 +260,24 @@ export function activate(context: vscode.ExtensionContext) {
     const command = parsedUrl.pathname?.substring(1).toLowerCase();
     const queryParams = parsedUrl.query;
 
+    if (command === "events") {
+      openEventStream(req, res);
+      return;
+    }
+
     console.log("Received command:", command, "with params:", queryParams);
 
     try {
-      switch (command) {
-        case "nexttab":
-          await vscode.commands.executeCommand("workbench.action.nextEditor");
-          break;
-
-        case "previoustab":
-          await vscode.commands.executeCommand(
-            "workbench.action.previousEditor"
-          );
-          break;
-
-        case "closetab":
-          await vscode.commands.executeCommand(
-            "workbench.action.closeActiveEditor"
-          );
-          break;
-
-        case "closealltabs":
-          await vscode.commands.executeCommand(
-            "workbench.action.closeAllEditors"
-          );
-          break;
-
-        case "closetabstoright":
-          await vscode.commands.executeCommand(
-            "workbench.action.closeEditorsToTheRight"
-          );
-          break;
-
-        case "openfile":
-          console.log("Processing openFile command...");
-          const filePath = queryParams.path as string;
-          if (!filePath) {
-            throw new Error("File path must be provided as a query parameter");
-          }
-
-          console.log("Attempting to open file:", filePath);
-          // Handle both absolute and workspace-relative paths
-          let fileUri;
-          if (path.isAbsolute(filePath)) {
-            fileUri = vscode.Uri.file(filePath);
-          } else {
-            const workspaceFolders = vscode.workspace.workspaceFolders;
-            if (!workspaceFolders) {
-              throw new Error("No workspace folder is open");
-            }
-            fileUri = vscode.Uri.joinPath(workspaceFolders[0].uri, filePath);
-          }
-
-          console.log("Opening file with URI:", fileUri.fsPath);
-          const document = await vscode.workspace.openTextDocument(fileUri);
-          await vscode.window.showTextDocument(document);
-          break;
-
-        case "listopentabs":
-          const tabs = vscode.window.tabGroups.all.flatMap((group, index) =>
-            group.tabs.map((tab) => ({
-              groupIndex: index,
-              isActive: tab.isActive,
-              label: tab.label,
-              path:
-                tab.input instanceof vscode.TabInputText
-                  ? tab.input.uri.fsPath
-                  : undefined,
-            }))
-          );
-
-          res.writeHead(200, { "Content-Type": "application/json" });
-          return res.end(
-            JSON.stringify({
-              status: "success",
-              command,
-              tabs,
-            })
-          );
-
-        case "gototabname":
-          const tabName = queryParams.name as string;
-          if (!tabName) {
-            throw new Error("Tab name must be provided as a query parameter");
-          }
-
-          const allTabs = vscode.window.tabGroups.all.flatMap(
-            (group) => group.tabs
-          );
-          const targetTab = allTabs.find((tab) => tab.label === tabName);
-
-          if (!targetTab) {
-            throw new Error(`No tab found with name: ${tabName}`);
-          }
-
-          if (targetTab.input instanceof vscode.TabInputText) {
-            const doc = await vscode.workspace.openTextDocument(
-              targetTab.input.uri
-            );
-            await vscode.window.showTextDocument(doc);
-          }
-          break;
-
-        case "gotoline":
-          const line = parseInt(queryParams.line as string);
-          if (isNaN(line)) {
-            throw new Error(
-              "Line number must be provided as a query parameter"
-            );
-          }
-          const editor = vscode.window.activeTextEditor;
-          if (editor) {
-            const position = new vscode.Position(line - 1, 0);
-            editor.selection = new vscode.Selection(position, position);
-            await editor.revealRange(
-              new vscode.Range(position, position),
-              vscode.TextEditorRevealType.InCenter
-            );
-          }
-          break;
-
-        case "recentfiles":
-          const tabGroups = vscode.window.tabGroups;
-          const allRecentTabs = tabGroups.all.flatMap((group) => group.tabs);
-
-          const fileList = allRecentTabs
-            .slice(0, 100)
-            .map((tab) => ({
-              path:
-                tab.input instanceof vscode.TabInputText
-                  ? tab.input.uri.fsPath
-                  : undefined,
-              label: tab.label,
-            }))
-            .filter((file) => file.path);
-
-          res.writeHead(200, { "Content-Type": "application/json" });
-          return res.end(
-            JSON.stringify({
-              status: "success",
-              command,
-              files: fileList,
-            })
-          );
-
-        default:
-          console.log("Command not recognized:", command);
-          throw new Error("Command not found");
+      let result;
+      if (command === "batch") {
+        const payload = JSON.parse((await readBody(req)) || "{}");
+        result = await runBatch(payload.steps || [], !!payload.stopOnError);
+      } else {
+        result = await runCommand(command, queryParams);
       }
 
       res.writeHead(200, { "Content-Type": "application/json" });
-      res.end(JSON.stringify({ status: "success", command }));
+      res.end(JSON.stringify(result));
     } catch (error: any) {
       console.error("Error processing command:", error);
       res.writeHead(500, { "Content-Type": "application/json" });
@@ -183,15 +291,78 @@ export function activate(context: vscode.ExtensionContext) {
     }
   });
 
-  server.listen(3068, "localhost", () => {
-    console.log("VS Code extension server is running on http://localhost:3068");
-  });
+  const instanceFile = path.join(INSTANCES_DIR, `${process.pid}.json`);
+  let port = BASE_PORT;
+  let focusedAt = vscode.window.state.focused ? Date.now() : 0;
+
+  // Written to a temporary file and renamed, so readers never see half a
+  // record and the directory's mtime tells them something changed
+  const writeInstance = () => {
+    const record = {
+      pid: process.pid,
+      port,
+      name: vscode.workspace.name || "",
+      roots: (vscode.workspace.workspaceFolders || []).map(
+        (folder) => folder.uri.fsPath
+      ),
+      focusedAt,
+    };
+    try {
+      fs.mkdirSync(INSTANCES_DIR, { recursive: true });
+      fs.writeFileSync(`${instanceFile}.tmp`, JSON.stringify(record));
+      fs.renameSync(`${instanceFile}.tmp`, instanceFile);
+    } catch (error) {
+      console.error("Could not register extension instance:", error);
+    }
+  };
 
-  context.subscriptions.push({
-    dispose: () => {
-      server.close();
-    },
+  server.on("error", (error: NodeJS.ErrnoException) => {
+    if (error.code === "EADDRINUSE" && port < MAX_PORT) {
+      port++;
+      server.listen(port, "localhost");
+    } else {
+      console.error("VS Code extension server failed to start:", error);
+    }
+  });
+  server.on("listening", () => {
+    console.log(`VS Code extension server is running on http://localhost:${port}`);
+    writeInstance();
   });
+  server.listen(port, "localhost");
+
+  const keepalive = setInterval(() => {
+    for (const client of eventClients) {
+      client.write(": keepalive\n\n");
+    }
+  }, EVENTS_KEEPALIVE_MS);
+
+  context.subscriptions.push(
+    vscode.window.onDidChangeWindowState((state) => {
+      if (state.focused && server.listening) {
+        focusedAt = Date.now();
+        writeInstance();
+      }
+    }),
+    vscode.workspace.onDidChangeWorkspaceFolders(() => {
+      if (server.listening) {
+        writeInstance();
+      }
+    }),
+    vscode.window.tabGroups.onDidChangeTabs(scheduleStatePush),
+    vscode.window.tabGroups.onDidChangeTabGroups(scheduleStatePush),
+    vscode.window.onDidChangeActiveTextEditor(scheduleStatePush),
+    {
+      dispose: () => {
+        clearInterval(keepalive);
+        for (const client of eventClients) {
+          client.end();
+        }
+        eventClients.clear();
+        server.close();
+        fs.rmSync(instanceFile, { force: true });
+      },
+    }
+  );
 }
 
 export function deactivate() {}